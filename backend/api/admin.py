@@ -57,6 +57,8 @@ class GameAdmin(admin.ModelAdmin):
 class PlayerAdmin(admin.ModelAdmin):
     """Settings for Player model on admin page."""
 
+    list_select_related = ("user",)
+
     list_display = (
         "id",
         "name",
@@ -81,6 +83,10 @@ class PlayerAdmin(admin.ModelAdmin):
             list_display[:8] + ("rating_volatility",) + list_display[8:]
         )
 
+    def get_queryset(self, request):
+        """Pull in players' current stats and ratings in one query."""
+        return super().get_queryset(request).with_current_values()
+
 
 @admin.register(PlayerStatsNode)
 class PlayerStatsNodeAdmin(ReadOnlyModelAdminMixin, admin.ModelAdmin):
@@ -109,17 +115,29 @@ class PlayerRatingNodeAdmin(ReadOnlyModelAdminMixin, admin.ModelAdmin):
         "ranking",
         "ranking_delta",
         "rating_period",
+        "algorithm",
         "rating",
         "rating_deviation",
         "inactivity",
     )
 
-    # Only show rating volatility if rating algorithm is Glicko-2
-    if settings.RATING_ALGORITHM == "glicko2":
+    # Only show rating volatility if nodes are calculated with Glicko-2
+    if "glicko2" in settings.RATING_ALGORITHMS:
         list_display = (
-            list_display[:7] + ("rating_volatility",) + list_display[7:]
+            list_display[:8] + ("rating_volatility",) + list_display[8:]
         )
 
+    list_filter = ("algorithm",)
+
+    def rating_volatility(self, obj):
+        """Returns a node's rating volatility if it's a Glicko-2 node."""
+        if obj.algorithm != "glicko2":
+            return None
+
+        return obj.rating_volatility
+
+    rating_volatility.admin_order_field = "rating_volatility"
+
 
 @admin.register(MatchupStatsNode)
 class MatchupStatsNodeAdmin(ReadOnlyModelAdminMixin, admin.ModelAdmin):
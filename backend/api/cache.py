@@ -0,0 +1,113 @@
+"""Contains response caching for read-only API requests.
+
+Responses are cached and validated using a league-wide "data version",
+which is bumped whenever data that API responses depend on changes.
+Cached responses are keyed by the data version, so stale responses are
+never served and cached responses never need to expire on a timer. The
+data version also serves as the ETag for conditional requests, so
+clients polling for changes get a 304 response without the database
+being queried at all. There's no Last-Modified validator, since HTTP
+dates only have a resolution of a second, and data can change more
+than once a second.
+"""
+
+from functools import partial
+import hashlib
+import time
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+# Cache keys
+DATA_VERSION_KEY = "fooskill:data_version"
+RESPONSE_KEY_TEMPLATE = "fooskill:response:%s:%s"
+
+
+def get_data_version():
+    """Returns the current data version.
+
+    The data version is the time, in microseconds since the epoch, at
+    which data last changed. If the data version isn't in the cache
+    (because it was never set or because it was evicted), the current
+    time is used, so a data version is never reused for different data.
+    """
+    data_version = cache.get(DATA_VERSION_KEY)
+
+    if data_version is None:
+        cache.add(DATA_VERSION_KEY, int(time.time() * 1e6), timeout=None)
+        data_version = cache.get(DATA_VERSION_KEY)
+
+    return data_version
+
+
+def bump_data_version():
+    """Invalidate all cached responses by bumping the data version.
+
+    Call this after committing any change to data served by the API.
+    """
+    data_version = max(
+        int(time.time() * 1e6), (cache.get(DATA_VERSION_KEY) or 0) + 1
+    )
+
+    cache.set(DATA_VERSION_KEY, data_version, timeout=None)
+
+
+def get_cached_response(request, get_response):
+    """Returns a cached response for a request, caching it if necessary.
+
+    If the request's If-None-Match header shows the client already has
+    the current response, a 304 response is
+    returned straight away. Otherwise the response data is read from
+    the cache, keyed by the data version and the request's path and
+    query string. Only successful responses are cached.
+
+    Args:
+        request: The request to respond to.
+        get_response: A function which takes no arguments and returns
+            an uncached response for the request.
+
+    Returns:
+        A Response, or an HttpResponseNotModified.
+    """
+    data_version = get_data_version()
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+    # Validator for conditional requests
+    etag = 'W/"%s-%s"' % (data_version, path_hash)
+
+    not_modified_response = get_conditional_response(request, etag=etag)
+
+    if not_modified_response is not None:
+        return not_modified_response
+
+    # Use the cached response data if it exists
+    key = RESPONSE_KEY_TEMPLATE % (data_version, path_hash)
+    data = cache.get(key)
+
+    if data is not None:
+        response = Response(data)
+    else:
+        response = get_response()
+
+        if response.status_code != 200:
+            return response
+
+        cache.set(key, response.data, timeout=None)
+
+    response["ETag"] = etag
+
+    return response
+
+
+class CachedResponseMixin:
+    """Mixin to cache responses of viewsets' read-only actions."""
+
+    def list(self, request, *args, **kwargs):
+        return get_cached_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return get_cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
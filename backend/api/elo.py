@@ -0,0 +1,242 @@
+"""Contains functions for calculating player Elo ratings.
+
+Unlike Glicko ratings, which are calculated in batches when rating
+periods are processed, Elo ratings are updated after every game. They
+give players immediate feedback, but are less accurate.
+
+See https://en.wikipedia.org/wiki/Elo_rating_system for details.
+"""
+
+import itertools
+from operator import attrgetter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from . import models
+
+# Elo parameters
+ELO_BASE_RATING = settings.ELO_BASE_RATING
+ELO_K_FACTOR = settings.ELO_K_FACTOR
+
+# How many rows to update per query when updating players' states
+BULK_UPDATE_BATCH_SIZE = 1000
+
+
+def _E(r, r_j):
+    return 1 / (1 + 10 ** ((r_j - r) / 400))
+
+
+def calculate_elo_ratings(games, elo_ratings):
+    """Update Elo ratings with games in the order they were played.
+
+    This does all of its work in memory and doesn't touch the database.
+
+    Args:
+        games: An iterable of games, each with winner_id and loser_id
+            attributes, in the order they were played.
+        elo_ratings: A dictionary containing player IDs as keys and
+            each player's Elo rating as values, which is updated in
+            place. Players absent from it start at the base rating.
+    """
+    for game in games:
+        winner_rating = elo_ratings.get(game.winner_id, ELO_BASE_RATING)
+        loser_rating = elo_ratings.get(game.loser_id, ELO_BASE_RATING)
+
+        # The winner gains exactly what the loser loses
+        delta = ELO_K_FACTOR * (1 - _E(winner_rating, loser_rating))
+
+        elo_ratings[game.winner_id] = winner_rating + delta
+        elo_ratings[game.loser_id] = loser_rating - delta
+
+
+def update_elo_ratings(games):
+    """Update players' Elo ratings with new games.
+
+    Only the states of the games' players and the games' player stats
+    nodes are read and written, so a single game takes a constant
+    number of queries. The games' stats must already be processed. The
+    states are locked while they're updated, so games submitted at the
+    same time don't overwrite each other's changes.
+
+    Args:
+        games: A list of Game model instances, in the order they were
+            played.
+    """
+    player_ids = {game.winner_id for game in games} | {
+        game.loser_id for game in games
+    }
+
+    with transaction.atomic():
+        states = models.PlayerState.objects.select_for_update().in_bulk(
+            list(player_ids)
+        )
+        elo_ratings = {
+            player_id: state.elo_rating
+            for player_id, state in states.items()
+            if state.elo_rating is not None
+        }
+
+        # Record each player's Elo rating after each of their games
+        game_elo_ratings = {}
+
+        for game in track_elo_ratings(games, elo_ratings):
+            for player_id in (game.winner_id, game.loser_id):
+                game_elo_ratings[(game.id, player_id)] = elo_ratings[player_id]
+
+        nodes = list(
+            models.PlayerStatsNode.objects.filter(game__in=games).only(
+                "id", "game", "player"
+            )
+        )
+
+        for node in nodes:
+            node.elo_rating = game_elo_ratings[(node.game_id, node.player_id)]
+
+        models.PlayerStatsNode.objects.bulk_update(
+            nodes, ["elo_rating"], batch_size=BULK_UPDATE_BATCH_SIZE
+        )
+
+        for player_id, state in states.items():
+            state.elo_rating = elo_ratings[player_id]
+
+        models.PlayerState.objects.bulk_update(
+            states.values(), ["elo_rating"], batch_size=BULK_UPDATE_BATCH_SIZE
+        )
+
+
+def track_elo_ratings(games, elo_ratings):
+    """Update Elo ratings with games as they're iterated over.
+
+    This lets Elo ratings be calculated in the same pass over a stream
+    of games as something else.
+
+    Args:
+        games: An iterable of games, each with winner_id and loser_id
+            attributes, in the order they were played.
+        elo_ratings: A dictionary of players' Elo ratings, which is
+            updated in place. See calculate_elo_ratings.
+
+    Yields:
+        Each game, after its players' Elo ratings have been updated.
+    """
+    for game in games:
+        calculate_elo_ratings((game,), elo_ratings)
+
+        yield game
+
+
+def save_elo_ratings(elo_ratings):
+    """Replace all players' Elo ratings.
+
+    Args:
+        elo_ratings: A dictionary containing player IDs as keys and
+            each player's Elo rating as values. Players absent from it
+            haven't played any games, so they don't have an Elo rating.
+    """
+    states = models.PlayerState.objects.all()
+
+    for state in states:
+        state.elo_rating = elo_ratings.get(state.player_id)
+
+    models.PlayerState.objects.bulk_update(
+        states, ["elo_rating"], batch_size=BULK_UPDATE_BATCH_SIZE
+    )
+
+
+def replay_elo_ratings(from_datetime=None, player_ids=()):
+    """Recalculate players' Elo ratings from a datetime on.
+
+    Each player's Elo rating after each game is kept on their player
+    stats node for it. Players' Elo ratings before the datetime are
+    read from their latest stats nodes before it, and only the games
+    played from the datetime on are replayed, so this costs as much as
+    the number of games played since rather than a full rebuild. Games
+    are read through their stats nodes, so stats must be up to date.
+
+    The states of the players whose Elo ratings are recalculated are
+    locked while this runs, so games submitted at the same time don't
+    overwrite the replayed ratings.
+
+    Args:
+        from_datetime: An optional datetime to replay games from. If
+            this isn't provided, all games are replayed.
+        player_ids: An optional iterable of IDs of players whose Elo
+            ratings need recalculating even if they haven't played
+            since the datetime, like the players of a deleted game.
+    """
+    nodes = (
+        models.PlayerStatsNode.objects.annotate(
+            winner_id=F("game__winner"), loser_id=F("game__loser")
+        )
+        .order_by("game__datetime_played", "game", "id")
+        .values_list(
+            "id", "player_id", "game_id", "winner_id", "loser_id", named=True
+        )
+    )
+
+    with transaction.atomic():
+        if from_datetime is None:
+            # Lock the states before reading any games, so games
+            # submitted meanwhile wait for the replay rather than being
+            # overwritten
+            states = list(models.PlayerState.objects.select_for_update())
+            nodes = nodes.iterator()
+            elo_ratings = {}
+        else:
+            nodes = list(
+                nodes.filter(game__datetime_played__gte=from_datetime)
+            )
+            previous_nodes = models.PlayerStatsNode.objects.filter(
+                player=OuterRef("player"),
+                game__datetime_played__lt=from_datetime,
+            ).order_by("-id")
+            states = list(
+                models.PlayerState.objects.select_for_update()
+                .filter(
+                    player__in=set(player_ids)
+                    | {node.player_id for node in nodes}
+                )
+                .annotate(
+                    previous_elo_rating=Subquery(
+                        previous_nodes.values("elo_rating")[:1]
+                    )
+                )
+            )
+            elo_ratings = {
+                state.player_id: state.previous_elo_rating
+                for state in states
+                if state.previous_elo_rating is not None
+            }
+
+        updated_nodes = []
+
+        for _, game_nodes in itertools.groupby(
+            nodes, key=attrgetter("game_id")
+        ):
+            game_nodes = list(game_nodes)
+
+            calculate_elo_ratings(game_nodes[:1], elo_ratings)
+
+            for node in game_nodes:
+                updated_nodes.append(
+                    models.PlayerStatsNode(
+                        id=node.id, elo_rating=elo_ratings[node.player_id]
+                    )
+                )
+
+            if len(updated_nodes) >= BULK_UPDATE_BATCH_SIZE:
+                models.PlayerStatsNode.objects.bulk_update(
+                    updated_nodes, ["elo_rating"]
+                )
+                updated_nodes = []
+
+        models.PlayerStatsNode.objects.bulk_update(
+            updated_nodes, ["elo_rating"]
+        )
+
+        for state in states:
+            state.elo_rating = elo_ratings.get(state.player_id)
+
+        models.PlayerState.objects.bulk_update(
+            states, ["elo_rating"], batch_size=BULK_UPDATE_BATCH_SIZE
+        )
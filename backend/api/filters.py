@@ -94,6 +94,7 @@ class PlayerRatingNodeFilter(filters.FilterSet):
             "id": ID_FIELD_LOOKUPS,
             "player": FOREIGN_KEY_FIELD_LOOKUPS,
             "rating_period": FOREIGN_KEY_FIELD_LOOKUPS,
+            "algorithm": CHAR_FIELD_LOOKUPS,
         }
 
 
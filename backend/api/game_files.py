@@ -0,0 +1,86 @@
+"""Contains functions for reading games from files.
+
+Game files are read by the import_games command and the rate_games
+command line interface. Like rate_games, nothing here needs Django
+settings or a database.
+"""
+
+import csv
+import json
+import sys
+import numpy as np
+
+# The file extensions recognized for each format
+FORMAT_EXTENSIONS = {
+    "csv": (".csv",),
+    "ndjson": (".ndjson", ".jsonl"),
+    "npz": (".npz",),
+}
+
+
+def get_format(path, format_=None):
+    """Returns the format of a game file.
+
+    Args:
+        path: The path of the game file.
+        format_: An optional format to use instead of inferring one
+            from the file extension.
+
+    Raises:
+        ValueError: The format couldn't be inferred.
+    """
+    if format_ is not None:
+        return format_
+
+    for format_, extensions in FORMAT_EXTENSIONS.items():
+        if path.lower().endswith(extensions):
+            return format_
+
+    raise ValueError("Couldn't infer the file format; pass --format")
+
+
+def read_rows(path, format_):
+    """Yield each game in a game file as a dictionary.
+
+    CSV and NDJSON files can have any fields. NumPy .npz files have
+    datetime_played, winner, and loser arrays; their datetimes are
+    naive.
+
+    Args:
+        path: The path of the game file, or - for standard input.
+        format_: The format of the game file.
+
+    Raises:
+        ValueError: A line of an NDJSON file isn't valid JSON.
+    """
+    if format_ == "npz":
+        arrays = np.load(sys.stdin.buffer if path == "-" else path)
+
+        # Converting NumPy datetimes to Python datetimes needs a
+        # resolution Python supports
+        datetimes = arrays["datetime_played"].astype("datetime64[us]").tolist()
+
+        for datetime_played, winner, loser in zip(
+            datetimes, arrays["winner"].tolist(), arrays["loser"].tolist()
+        ):
+            yield dict(
+                datetime_played=datetime_played, winner=winner, loser=loser
+            )
+
+        return
+
+    file = sys.stdin if path == "-" else open(path, newline="")
+
+    with file:
+        if format_ == "csv":
+            yield from csv.DictReader(file)
+            return
+
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError("Line %d: %s" % (line_number, e))
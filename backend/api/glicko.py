@@ -1,15 +1,22 @@
 """Contains functions for calculating player Glicko ratings.
 
 See http://www.glicko.net/glicko/glicko.pdf implementation details.
+Nothing here depends on Django: configurable parameters are passed in
+as arguments.
 """
 
 from math import pi, sqrt
-from django.conf import settings
+import numpy as np
 
 # Glicko parameters
 _c = 55
 _q = 0.0057565
 
+# Default rating parameters for a player without any ratings. The base
+# rating deviation is also the largest a rating deviation can get.
+BASE_RATING = 1500
+BASE_RD = 350
+
 
 # Functions used in Glicko-2 calculations
 def _g(RD):
@@ -32,9 +39,29 @@ def _d_squared(r, r_js, RD_js):
     return 1 / (_q ** 2 * sum(summands))
 
 
+def win_probability(r, RD, r_j, RD_j):
+    """Returns the probability that a player beats an opponent.
+
+    Both players' rating deviations count towards the uncertainty of
+    the outcome. Glicko-2 ratings are on the same scale as Glicko
+    ratings, so this works for either. The arguments can be NumPy
+    arrays, in which case they're broadcast against each other.
+
+    Args:
+        r: The player's rating.
+        RD: The player's rating deviation.
+        r_j: The opponent's rating.
+        RD_j: The opponent's rating deviation.
+    """
+    combined_RD = np.sqrt(np.square(RD) + np.square(RD_j))
+    g = 1 / np.sqrt(1 + 3 * _q ** 2 * np.square(combined_RD) / pi ** 2)
+
+    return 1 / (1 + 10 ** (-g * np.subtract(r, r_j) / 400))
+
+
 # The "main" rating calculating function
 def calculate_player_rating(
-    r, RD, opponent_rs=None, opponent_RDs=None, scores=None
+    r, RD, opponent_rs=None, opponent_RDs=None, scores=None, base_RD=BASE_RD
 ):
     """Calculates a players rating given a set of games in a rating period.
 
@@ -55,13 +82,15 @@ def calculate_player_rating(
         scores: A list of floats representing the scores of each game.
             The scores are either 0 or 1, corresponding to a win by the
             opponent and a win by the player, respectively.
+        base_RD: An optional float representing the rating deviation of
+            a player without any ratings, which caps rating deviations.
 
     Returns:
         A two-tuple containing the player's new rating and rating
         deviation.
     """
     # Intermediate RD value
-    RD_int = min(sqrt(RD ** 2 + _c ** 2), settings.GLICKO_BASE_RD)
+    RD_int = min(sqrt(RD ** 2 + _c ** 2), base_RD)
 
     # Deal with degenerate case first when no games have been played by
     # the player
@@ -85,3 +114,75 @@ def calculate_player_rating(
 
     # Return the new ratings
     return (r_prime, RD_prime)
+
+
+# The batch rating calculating function
+def calculate_player_ratings(
+    rs, RDs, players, opponents, scores, base_RD=BASE_RD
+):
+    """Calculates all players' ratings for a rating period at once.
+
+    This is a vectorized equivalent of calling calculate_player_rating
+    once per player. Players are referred to by their index into the rs
+    and RDs arrays. The ith index of the players, opponents, and scores
+    arrays represents data from the perspective of one player in one
+    game, so each game should appear twice: once from the perspective
+    of the winner and once from the perspective of the loser.
+
+    Args:
+        rs: An array of floats representing each player's rating.
+        RDs: An array of floats representing each player's rating
+            deviation.
+        players: An array of ints containing the index of the player
+            whose perspective is taken for each game.
+        opponents: An array of ints containing the index of the
+            opponent for each game.
+        scores: An array of floats representing the scores of each game.
+            The scores are either 0 or 1, corresponding to a win by the
+            opponent and a win by the player, respectively.
+        base_RD: An optional float representing the rating deviation of
+            a player without any ratings, which caps rating deviations.
+
+    Returns:
+        A two-tuple containing arrays of each player's new rating and
+        rating deviation.
+    """
+    rs = np.asarray(rs, dtype=float)
+    RDs = np.asarray(RDs, dtype=float)
+    players = np.asarray(players, dtype=int)
+    opponents = np.asarray(opponents, dtype=int)
+    scores = np.asarray(scores, dtype=float)
+
+    num_players = len(rs)
+
+    # Intermediate RD values. For players who haven't played, this is
+    # their new RD.
+    RD_ints = np.minimum(np.sqrt(RDs ** 2 + _c ** 2), base_RD)
+
+    # Compute g and E once per game, then sum per player
+    g_js = 1 / np.sqrt(1 + 3 * _q ** 2 * RDs[opponents] ** 2 / pi ** 2)
+    E_js = 1 / (1 + 10 ** (-g_js * (rs[players] - rs[opponents]) / 400))
+
+    played = np.bincount(players, minlength=num_players) > 0
+
+    d_squared_sums = np.bincount(
+        players, weights=g_js ** 2 * E_js * (1 - E_js), minlength=num_players
+    )
+    r_sums = np.bincount(
+        players, weights=g_js * (scores - E_js), minlength=num_players
+    )
+
+    # Calculate r_prime and RD_prime for players who have played
+    RD_int = RD_ints[played]
+    d_squared = 1 / (_q ** 2 * d_squared_sums[played])
+
+    new_rs = rs.copy()
+    new_RDs = RD_ints.copy()
+
+    new_rs[played] = (
+        rs[played] + _q / (1 / RD_int ** 2 + 1 / d_squared) * r_sums[played]
+    )
+    new_RDs[played] = 1 / np.sqrt(1 / RD_int ** 2 + 1 / d_squared)
+
+    # Return the new ratings
+    return (new_rs, new_RDs)
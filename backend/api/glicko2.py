@@ -1,25 +1,32 @@
 """Contains functions for calculating player Glicko-2 ratings.
 
 See http://www.glicko.net/glicko/glicko2.pdf for Glicko-2 implementation
-details.
+details. Configurable parameters, like the system constant, are passed
+in as arguments rather than read from Django's settings.
 """
 
 from math import exp, log, pi, sqrt
-from django.conf import settings
+import numpy as np
 
 # Glicko-2 parameters
 SCALE_FACTOR = 173.7178
 EPSILON = 1e-6
-TAU = settings.GLICKO2_SYSTEM_CONSTANT
+
+# Default rating parameters for a player without any ratings, and the
+# default system constant
+BASE_RATING = 1500
+BASE_RD = 350
+BASE_VOLATILITY = 0.06
+TAU = 0.6
 
 
 # Functions to convert between Glicko and Glicko-2 ratings
-def r_to_mu(r):
-    return (r - settings.GLICKO2_BASE_RATING) / SCALE_FACTOR
+def r_to_mu(r, base_rating=BASE_RATING):
+    return (r - base_rating) / SCALE_FACTOR
 
 
-def mu_to_r(mu):
-    return mu * SCALE_FACTOR + settings.GLICKO2_BASE_RATING
+def mu_to_r(mu, base_rating=BASE_RATING):
+    return mu * SCALE_FACTOR + base_rating
 
 
 def RD_to_phi(RD):
@@ -60,13 +67,13 @@ def _delta(v, mu, s_js, mu_js, phi_js):
     return v * sum(summands)
 
 
-def f_closure(delta, v, sigma, phi):
+def f_closure(delta, v, sigma, phi, tau=TAU):
     def f(x):
         return (
             exp(x)
             * (delta ** 2 - phi ** 2 - v - exp(x))
             / (2 * (phi ** 2 + v + exp(x)) ** 2)
-            - (x - log(sigma ** 2)) / TAU ** 2
+            - (x - log(sigma ** 2)) / tau ** 2
         )
 
     return f
@@ -74,7 +81,14 @@ def f_closure(delta, v, sigma, phi):
 
 # The "main" rating calculating function
 def calculate_player_rating(
-    r, RD, sigma, opponent_rs=None, opponent_RDs=None, scores=None
+    r,
+    RD,
+    sigma,
+    opponent_rs=None,
+    opponent_RDs=None,
+    scores=None,
+    tau=TAU,
+    base_rating=BASE_RATING,
 ):
     """Calculates a players rating given a set of games in a rating period.
 
@@ -96,6 +110,11 @@ def calculate_player_rating(
         scores: A list of floats representing the scores of each game.
             The scores are either 0 or 1, corresponding to a win by the
             opponent and a win by the player, respectively.
+        tau: An optional float representing the system constant, which
+            constrains how much rating volatilities change.
+        base_rating: An optional float representing the rating of a
+            player without any ratings, which is the centre of the
+            Glicko-2 scale.
 
     Returns:
         A three-tuple containing the player's new rating, rating
@@ -109,10 +128,12 @@ def calculate_player_rating(
         return (r, RD_prime, sigma)
 
     # Calculate all ratings to Glicko-2 scale
-    mu = r_to_mu(r)
+    mu = r_to_mu(r, base_rating)
     phi = RD_to_phi(RD)
 
-    opponent_mus = [r_to_mu(opponent_r) for opponent_r in opponent_rs]
+    opponent_mus = [
+        r_to_mu(opponent_r, base_rating) for opponent_r in opponent_rs
+    ]
     opponent_phis = [RD_to_phi(opponent_RD) for opponent_RD in opponent_RDs]
 
     # Compute v and delta
@@ -121,7 +142,7 @@ def calculate_player_rating(
     delta = _delta(v, mu, scores, opponent_mus, opponent_phis)
 
     # Compute new sigma value (Step 5 of Glicko-2 algorithm)
-    f = f_closure(delta, v, sigma, phi)
+    f = f_closure(delta, v, sigma, phi, tau)
 
     a = log(sigma ** 2)
     A = a
@@ -131,10 +152,10 @@ def calculate_player_rating(
     else:
         k = 1
 
-        while f(a - k * TAU) < 0:
+        while f(a - k * tau) < 0:
             k += 1
 
-        B = a - k * TAU
+        B = a - k * tau
 
     fA = f(A)
     fB = f(B)
@@ -143,7 +164,7 @@ def calculate_player_rating(
         C = A + (A - B) * fA / (fB - fA)
         fC = f(C)
 
-        if fC * fB < 0:
+        if fC * fB <= 0:
             A = B
             fA = fB
         else:
@@ -163,8 +184,164 @@ def calculate_player_rating(
     )
 
     # Convert back to Glicko scale
-    r_prime = mu_to_r(mu_prime)
+    r_prime = mu_to_r(mu_prime, base_rating)
     RD_prime = phi_to_RD(phi_prime)
 
     # Return the new ratings
     return (r_prime, RD_prime, sigma_prime)
+
+
+# The batch rating calculating function
+def calculate_player_ratings(
+    rs,
+    RDs,
+    sigmas,
+    players,
+    opponents,
+    scores,
+    tau=TAU,
+    base_rating=BASE_RATING,
+):
+    """Calculates all players' ratings for a rating period at once.
+
+    This is a vectorized equivalent of calling calculate_player_rating
+    once per player. Players are referred to by their index into the
+    rs, RDs, and sigmas arrays. The ith index of the players,
+    opponents, and scores arrays represents data from the perspective
+    of one player in one game, so each game should appear twice: once
+    from the perspective of the winner and once from the perspective of
+    the loser.
+
+    Args:
+        rs: An array of floats representing each player's rating.
+        RDs: An array of floats representing each player's rating
+            deviation.
+        sigmas: An array of floats representing each player's rating
+            volatility.
+        players: An array of ints containing the index of the player
+            whose perspective is taken for each game.
+        opponents: An array of ints containing the index of the
+            opponent for each game.
+        scores: An array of floats representing the scores of each game.
+            The scores are either 0 or 1, corresponding to a win by the
+            opponent and a win by the player, respectively.
+        tau: An optional float representing the system constant, which
+            constrains how much rating volatilities change.
+        base_rating: An optional float representing the rating of a
+            player without any ratings, which is the centre of the
+            Glicko-2 scale.
+
+    Returns:
+        A three-tuple containing arrays of each player's new rating,
+        rating deviation, and rating volatility.
+    """
+    rs = np.asarray(rs, dtype=float)
+    RDs = np.asarray(RDs, dtype=float)
+    sigmas = np.asarray(sigmas, dtype=float)
+    players = np.asarray(players, dtype=int)
+    opponents = np.asarray(opponents, dtype=int)
+    scores = np.asarray(scores, dtype=float)
+
+    num_players = len(rs)
+
+    # Calculate all ratings to Glicko-2 scale
+    mus = (rs - base_rating) / SCALE_FACTOR
+    phis = RDs / SCALE_FACTOR
+
+    # Compute g and E once per game, then sum per player to get v and
+    # delta
+    g_js = 1 / np.sqrt(1 + 3 * phis[opponents] ** 2 / pi ** 2)
+    E_js = 1 / (1 + np.exp(-g_js * (mus[players] - mus[opponents])))
+
+    games_played = np.bincount(players, minlength=num_players)
+    played = games_played > 0
+
+    v_sums = np.bincount(
+        players, weights=g_js ** 2 * E_js * (1 - E_js), minlength=num_players
+    )
+    delta_sums = np.bincount(
+        players, weights=g_js * (scores - E_js), minlength=num_players
+    )
+
+    # Players who haven't played only have their rating deviation
+    # increased, so only solve for the players who have played
+    mu = mus[played]
+    phi = phis[played]
+    sigma = sigmas[played]
+    delta_sum = delta_sums[played]
+    v = 1 / v_sums[played]
+    delta = v * delta_sum
+
+    # Compute new sigma values (Step 5 of Glicko-2 algorithm). This is
+    # the Illinois algorithm run for all players at once, where each
+    # player drops out of the iteration once their own convergence
+    # criterion is met.
+    def f(x, idx):
+        return (
+            np.exp(x)
+            * (delta[idx] ** 2 - phi[idx] ** 2 - v[idx] - np.exp(x))
+            / (2 * (phi[idx] ** 2 + v[idx] + np.exp(x)) ** 2)
+            - (x - np.log(sigma[idx] ** 2)) / tau ** 2
+        )
+
+    a = np.log(sigma ** 2)
+    A = a.copy()
+    B = np.empty_like(a)
+
+    big_delta = delta ** 2 > phi ** 2 + v
+    B[big_delta] = np.log(
+        delta[big_delta] ** 2 - phi[big_delta] ** 2 - v[big_delta]
+    )
+
+    idx = np.flatnonzero(~big_delta)
+    k = np.ones(len(idx))
+
+    while len(idx):
+        searching = f(a[idx] - k * tau, idx) < 0
+        B[idx[~searching]] = a[idx[~searching]] - k[~searching] * tau
+
+        idx = idx[searching]
+        k = k[searching] + 1
+
+    all_idx = np.arange(len(a))
+    fA = f(A, all_idx)
+    fB = f(B, all_idx)
+
+    idx = np.flatnonzero(np.abs(B - A) > EPSILON)
+
+    while len(idx):
+        C = A[idx] + (A[idx] - B[idx]) * fA[idx] / (fB[idx] - fA[idx])
+        fC = f(C, idx)
+
+        # Landing exactly on the root (fC == 0) also swaps, or else the
+        # bracket would never shrink
+        swap = fC * fB[idx] <= 0
+        A[idx[swap]] = B[idx[swap]]
+        fA[idx[swap]] = fB[idx[swap]]
+        fA[idx[~swap]] = fA[idx[~swap]] / 2
+
+        B[idx] = C
+        fB[idx] = fC
+
+        idx = idx[np.abs(B[idx] - A[idx]) > EPSILON]
+
+    sigma_prime = np.exp(A / 2)
+
+    # Compute new rating and rating deviation
+    phi_star = np.sqrt(phi ** 2 + sigma_prime ** 2)
+
+    phi_prime = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+    mu_prime = mu + phi_prime ** 2 * delta_sum
+
+    # Put the results for players who played alongside those who
+    # didn't, and convert back to Glicko scale
+    new_rs = rs.copy()
+    new_RDs = np.sqrt(phis ** 2 + sigmas ** 2) * SCALE_FACTOR
+    new_sigmas = sigmas.copy()
+
+    new_rs[played] = mu_prime * SCALE_FACTOR + base_rating
+    new_RDs[played] = phi_prime * SCALE_FACTOR
+    new_sigmas[played] = sigma_prime
+
+    # Return the new ratings
+    return (new_rs, new_RDs, new_sigmas)
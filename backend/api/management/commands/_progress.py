@@ -0,0 +1,26 @@
+"""Contains progress reporting shared by custom commands.
+
+Django doesn't register modules starting with an underscore as
+commands.
+"""
+
+
+class RatingsProgressMixin:
+    """Mixin for commands which process rating periods."""
+
+    def report_ratings_progress(
+        self, periods_done, periods_remaining, seconds
+    ):
+        """Write how many rating periods have been processed.
+
+        This can be passed as the progress callback of
+        process_new_ratings and reprocess_all_ratings.
+        """
+        self.stdout.write(
+            "Processed %d rating periods, %d remaining (%.1f periods/s)"
+            % (
+                periods_done,
+                periods_remaining,
+                periods_done / max(seconds, 1e-6),
+            )
+        )
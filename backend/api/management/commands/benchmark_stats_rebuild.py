@@ -0,0 +1,67 @@
+"""Custom command to benchmark ways of rebuilding stats."""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from api.models import Game
+from api.util import reprocess_all_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Times rebuilding all stats nodes in Python and, on PostgreSQL,"
+        " with SQL window functions. Each rebuild is rolled back, so the"
+        " stats are left as they were, but the stats tables stay locked"
+        " while a rebuild runs, so don't run this against a live site."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of times to rebuild stats with each method.",
+        )
+
+    def handle(self, *args, **options):
+        num_games = Game.objects.count()
+        methods = [("python", False)]
+
+        if connection.vendor == "postgresql":
+            methods.append(("sql", True))
+        else:
+            self.stdout.write(
+                "Skipping the SQL method, which needs PostgreSQL (using %s)"
+                % connection.vendor
+            )
+
+        self.stdout.write(
+            "Rebuilding stats over %d games, %d times per method"
+            % (num_games, options["repeat"])
+        )
+
+        for name, use_sql in methods:
+            timings = []
+
+            for _ in range(options["repeat"]):
+                with transaction.atomic():
+                    start_time = time.monotonic()
+                    reprocess_all_stats(
+                        reset_id_counter=False, use_sql=use_sql
+                    )
+                    timings.append(time.monotonic() - start_time)
+
+                    # Leave the stats as they were
+                    transaction.set_rollback(True)
+
+            best = min(timings)
+
+            self.stdout.write(
+                "%-6s best %8.2f s  mean %8.2f s  %10.1f games/s"
+                % (
+                    name,
+                    best,
+                    sum(timings) / len(timings),
+                    num_games / max(best, 1e-6),
+                )
+            )
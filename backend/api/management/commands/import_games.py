@@ -0,0 +1,187 @@
+"""Custom command to import past games from a file."""
+
+import resource
+import sys
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from api.game_files import FORMAT_EXTENSIONS, get_format, read_rows
+from api.management.commands._progress import RatingsProgressMixin
+from api.models import Game, RatingPeriod
+from api.ratings import update_provisional_ratings
+from api.util import (
+    import_games,
+    process_new_ratings,
+    reprocess_all_ratings,
+    reprocess_all_stats,
+)
+
+
+class Command(RatingsProgressMixin, BaseCommand):
+    help = (
+        "Imports past games from a CSV, NDJSON, or NumPy .npz file, then"
+        " rebuilds stats over all games"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            help=(
+                "Path of the file to import, or - to read from standard"
+                " input. Each game needs winner, loser, and"
+                " datetime_played fields, and optionally winner_score,"
+                " loser_score, and submitted_by fields. Players are"
+                " referred to by name and are created if they don't exist."
+            ),
+        )
+        parser.add_argument(
+            "--format",
+            choices=list(FORMAT_EXTENSIONS),
+            help="Format of the file. Inferred from the file extension if"
+            " not given.",
+        )
+        parser.add_argument(
+            "--submitted-by",
+            help="Username of the user to record as having submitted games"
+            " without a submitted_by field.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of games to insert at a time.",
+        )
+        parser.add_argument(
+            "--process-ratings",
+            action="store_true",
+            help="Catch up on ratings after importing. If any imported"
+            " games are older than the latest rating period, all ratings"
+            " are reprocessed.",
+        )
+
+    def report_progress(self, games_done, seconds):
+        self.stdout.write(
+            "Imported %d games (%.1f games/s)"
+            % (games_done, games_done / max(seconds, 1e-6))
+        )
+
+    def get_score(self, row, field):
+        """Returns a score from a row, falling back to the default score."""
+        if row.get(field) in (None, ""):
+            return Game._meta.get_field(field).default
+
+        return int(row[field])
+
+    def read_rows(self, path, format_):
+        """Yield each row of the file as a dictionary."""
+        try:
+            yield from read_rows(path, format_)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+    def read_games(self, path, format_, submitted_by):
+        """Yield each game in the file, ready to import."""
+        for row_number, row in enumerate(self.read_rows(path, format_), 1):
+            try:
+                winner = str(row["winner"])
+                loser = str(row["loser"])
+                datetime_played = parse_datetime(str(row["datetime_played"]))
+                winner_score = self.get_score(row, "winner_score")
+                loser_score = self.get_score(row, "loser_score")
+            except KeyError as e:
+                raise CommandError("Game %d: missing %s" % (row_number, e))
+            except ValueError as e:
+                raise CommandError("Game %d: %s" % (row_number, e))
+
+            if not (row.get("submitted_by") or submitted_by):
+                raise CommandError(
+                    "Game %d: missing submitted_by; pass --submitted-by"
+                    % row_number
+                )
+
+            if datetime_played is None:
+                raise CommandError(
+                    "Game %d: invalid datetime_played" % row_number
+                )
+
+            if timezone.is_naive(datetime_played):
+                datetime_played = timezone.make_aware(datetime_played)
+
+            yield dict(
+                winner=winner,
+                loser=loser,
+                winner_score=winner_score,
+                loser_score=loser_score,
+                datetime_played=datetime_played,
+                submitted_by=row.get("submitted_by") or submitted_by,
+            )
+
+    def handle(self, *args, **options):
+        try:
+            format_ = get_format(options["file"], options["format"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        start_time = time.monotonic()
+
+        # Load the games. This doesn't process any stats.
+        try:
+            num_games, earliest_datetime_played = import_games(
+                self.read_games(
+                    options["file"], format_, options["submitted_by"]
+                ),
+                batch_size=options["batch_size"],
+                progress_callback=self.report_progress,
+            )
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        # Rebuild stats once over all games
+        self.stdout.write("Rebuilding stats")
+        reprocess_all_stats(reset_id_counter=False)
+
+        # Catch up on ratings
+        if options["process_ratings"] and num_games:
+            latest_rating_period = RatingPeriod.objects.first()
+
+            if (
+                latest_rating_period is not None
+                and earliest_datetime_played
+                <= latest_rating_period.end_datetime
+            ):
+                self.stdout.write("Reprocessing all ratings")
+                reprocess_all_ratings(
+                    reset_id_counter=False,
+                    progress_callback=self.report_ratings_progress,
+                )
+            else:
+                self.stdout.write("Processing new ratings")
+                process_new_ratings(
+                    progress_callback=self.report_ratings_progress
+                )
+        else:
+            self.stdout.write("Updating provisional ratings")
+            update_provisional_ratings()
+
+        # Report throughput and peak memory use. Peak resident set size
+        # is reported in kilobytes on Linux and in bytes on macOS.
+        seconds = time.monotonic() - start_time
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        if sys.platform != "darwin":
+            peak_memory *= 1024
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported %d games in %.1f s (%.1f games/s); peak memory"
+                " %.1f MiB"
+                % (
+                    num_games,
+                    seconds,
+                    num_games / max(seconds, 1e-6),
+                    peak_memory / 2 ** 20,
+                )
+            )
+        )
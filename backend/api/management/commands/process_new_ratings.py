@@ -1,11 +1,23 @@
 """Custom command to process new ratings."""
 
 from django.core.management.base import BaseCommand
+from api.management.commands._progress import RatingsProgressMixin
 from api.util import process_new_ratings
 
 
-class Command(BaseCommand):
+class Command(RatingsProgressMixin, BaseCommand):
     help = "Calculates and creates new rating nodes and rating periods"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--periods-per-checkpoint",
+            type=int,
+            default=1,
+            help="Number of rating periods to commit at a time.",
+        )
+
     def handle(self, *args, **options):
-        process_new_ratings()
+        process_new_ratings(
+            periods_per_checkpoint=options["periods_per_checkpoint"],
+            progress_callback=self.report_ratings_progress,
+        )
@@ -0,0 +1,32 @@
+"""Custom command to recompute existing rating periods."""
+
+from django.core.management.base import BaseCommand, CommandError
+from api.models import RatingPeriod
+from api.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the rating nodes of existing rating periods from a"
+        " rating period on, updating them in place"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from-period",
+            type=int,
+            required=True,
+            help="ID of the first rating period to recompute.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rating_period = RatingPeriod.objects.get(pk=options["from_period"])
+        except RatingPeriod.DoesNotExist:
+            raise CommandError(
+                "Rating period %d doesn't exist" % options["from_period"]
+            )
+
+        num_rating_periods = recompute_ratings(rating_period)
+
+        self.stdout.write("Recomputed %d rating periods" % num_rating_periods)
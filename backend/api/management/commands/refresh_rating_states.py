@@ -0,0 +1,25 @@
+"""Custom command to start serving another rating algorithm's ratings."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.ratings import refresh_player_states
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the latest ratings of the rating algorithm set by"
+        " RATING_ALGORITHM into players' current states. Run this after"
+        " switching RATING_ALGORITHM to another algorithm in"
+        " RATING_ALGORITHMS."
+    )
+
+    def handle(self, *args, **options):
+        if not refresh_player_states():
+            raise CommandError(
+                "No ratings have been calculated with %s; run"
+                " reprocess_all_ratings instead" % settings.RATING_ALGORITHM
+            )
+
+        self.stdout.write(
+            "Players are now rated with %s" % settings.RATING_ALGORITHM
+        )
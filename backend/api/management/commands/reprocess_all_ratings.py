@@ -1,10 +1,11 @@
 """Custom command to reprocess all ratings."""
 
 from django.core.management.base import BaseCommand
+from api.management.commands._progress import RatingsProgressMixin
 from api.util import reprocess_all_ratings
 
 
-class Command(BaseCommand):
+class Command(RatingsProgressMixin, BaseCommand):
     help = "Wipes all rating nodes and rating periods and recreates/recalculates them"
 
     def add_arguments(self, parser):
@@ -15,4 +16,7 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        reprocess_all_ratings(reset_id_counter=options["reset_id_counter"])
+        reprocess_all_ratings(
+            reset_id_counter=options["reset_id_counter"],
+            progress_callback=self.report_ratings_progress,
+        )
@@ -15,6 +15,24 @@ class Command(BaseCommand):
             action="store_true",
             help="Reset ID counter back to 1 before recreating stats nodes.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes to recreate stats nodes with. Using"
+            " more than one always resets the ID counter.",
+        )
+        parser.add_argument(
+            "--sql",
+            action="store_true",
+            help="Calculate stats nodes inside the database with window"
+            " functions. Only supported on PostgreSQL; other databases"
+            " fall back to calculating them in Python.",
+        )
 
     def handle(self, *args, **options):
-        reprocess_all_stats(reset_id_counter=options["reset_id_counter"])
+        reprocess_all_stats(
+            reset_id_counter=options["reset_id_counter"],
+            workers=options["workers"],
+            use_sql=options["sql"],
+        )
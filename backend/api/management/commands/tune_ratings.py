@@ -0,0 +1,203 @@
+"""Custom command to tune rating settings."""
+
+from datetime import timedelta
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.models import Game, Player
+from api.rating_engines import RATING_ENGINES
+from api.tuning import (
+    RATING_SETTINGS,
+    get_parameter_grid,
+    tune_parameters,
+)
+
+# The table columns for each setting that can be tuned
+SETTING_COLUMNS = (
+    ("GLICKO2_SYSTEM_CONSTANT", "system constant"),
+    ("BASE_RD", "base RD"),
+    ("GLICKO2_RATING_PERIOD_DAYS", "period days"),
+    ("NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE", "periods missed"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Scores a grid of rating settings by how well they predict games,"
+        " without touching stored ratings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--algorithm",
+            choices=sorted(RATING_ENGINES),
+            default=settings.RATING_ALGORITHM,
+            help="Rating algorithm to tune. Defaults to RATING_ALGORITHM.",
+        )
+        parser.add_argument(
+            "--system-constant",
+            type=float,
+            nargs="+",
+            help="Values of GLICKO2_SYSTEM_CONSTANT to try (Glicko-2"
+            " only).",
+        )
+        parser.add_argument(
+            "--base-rd",
+            type=float,
+            nargs="+",
+            help="Values of the algorithm's base rating deviation to try.",
+        )
+        parser.add_argument(
+            "--rating-period-days",
+            type=int,
+            nargs="+",
+            help="Values of GLICKO2_RATING_PERIOD_DAYS to try.",
+        )
+        parser.add_argument(
+            "--periods-missed-to-be-inactive",
+            type=int,
+            nargs="+",
+            help="Values of NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE"
+            " to try. These only affect who is ranked, so only the"
+            " ranking accuracy depends on them.",
+        )
+        parser.add_argument(
+            "--burn-in-days",
+            type=int,
+            help="Number of days after the first game before games are"
+            " scored. Defaults to the longest rating period being tried,"
+            " so every parameter set has ratings when scoring starts.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of processes to use. Defaults to the number of"
+            " CPUs.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            help="Only show this many of the best parameter sets.",
+        )
+
+    def get_parameter_values(self, options):
+        """Returns the values to try for each setting being tuned."""
+        setting_options = []
+
+        if options["algorithm"] == "glicko2":
+            setting_options += [
+                ("GLICKO2_SYSTEM_CONSTANT", "system_constant"),
+                ("GLICKO2_BASE_RD", "base_rd"),
+            ]
+        elif options["system_constant"]:
+            raise CommandError("Only Glicko-2 has a system constant")
+        else:
+            setting_options += [("GLICKO_BASE_RD", "base_rd")]
+
+        setting_options += [
+            ("GLICKO2_RATING_PERIOD_DAYS", "rating_period_days"),
+            (
+                "NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE",
+                "periods_missed_to_be_inactive",
+            ),
+        ]
+
+        # Settings not being tuned keep their current value
+        return {
+            setting: options[option] or [getattr(settings, setting)]
+            for setting, option in setting_options
+        }
+
+    def handle(self, *args, **options):
+        parameter_values = self.get_parameter_values(options)
+        parameter_grid = get_parameter_grid(parameter_values)
+
+        # Load the game history once
+        games = list(
+            Game.objects.order_by("datetime_played").values_list(
+                "datetime_played", "winner", "loser"
+            )
+        )
+        player_ids = list(Player.objects.values_list("id", flat=True))
+
+        if not games:
+            raise CommandError("There are no games to tune ratings with")
+
+        burn_in_days = options["burn_in_days"]
+
+        if burn_in_days is None:
+            burn_in_days = max(parameter_values["GLICKO2_RATING_PERIOD_DAYS"])
+
+        score_from = games[0][0] + timedelta(days=burn_in_days)
+
+        if games[-1][0] < score_from:
+            raise CommandError("No games were played after the burn-in period")
+
+        start_time = time.monotonic()
+
+        results = tune_parameters(
+            games=games,
+            player_ids=player_ids,
+            algorithm=options["algorithm"],
+            settings={
+                setting: getattr(settings, setting)
+                for setting in RATING_SETTINGS
+            },
+            parameter_grid=parameter_grid,
+            score_from=score_from,
+            now=timezone.now(),
+            workers=options["workers"],
+        )
+
+        self.stdout.write(
+            "Scored %d parameter sets on %d games in %.1f s"
+            % (
+                len(results),
+                results[0][1]["games"],
+                time.monotonic() - start_time,
+            )
+        )
+
+        self.write_table(results[: options["top"]])
+
+    def write_table(self, results):
+        """Write a table of parameter sets and their scores."""
+        headers = ["rank"]
+        headers += [header for _, header in SETTING_COLUMNS]
+        headers += ["log-likelihood", "Brier score", "ranking accuracy"]
+
+        rows = []
+
+        for rank, (parameters, scores) in enumerate(results, 1):
+            row = [str(rank)]
+
+            for setting, _ in SETTING_COLUMNS:
+                value = next(
+                    (
+                        value
+                        for name, value in parameters.items()
+                        if name.endswith(setting)
+                    ),
+                    None,
+                )
+                row.append("-" if value is None else "%g" % value)
+
+            row += [
+                "%.4f" % scores["log_likelihood"],
+                "%.4f" % scores["brier_score"],
+                "%.4f" % scores["ranking_accuracy"],
+            ]
+            rows.append(row)
+
+        widths = [
+            max(len(row[column]) for row in [headers] + rows)
+            for column in range(len(headers))
+        ]
+
+        for row in [headers] + rows:
+            self.stdout.write(
+                "  ".join(
+                    value.rjust(width) for value, width in zip(row, widths)
+                )
+            )
@@ -0,0 +1,85 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+STATS_FIELDS = (
+    "games",
+    "wins",
+    "losses",
+    "win_rate",
+    "average_goals_per_game",
+    "average_goals_against_per_game",
+)
+RATING_FIELDS = (
+    "ranking",
+    "ranking_delta",
+    "rating",
+    "rating_deviation",
+    "rating_volatility",
+    "inactivity",
+    "is_active",
+)
+
+
+def create_player_states(apps, schema_editor):
+    """Create states for existing players from their latest nodes."""
+    Player = apps.get_model("api", "Player")
+    PlayerRatingNode = apps.get_model("api", "PlayerRatingNode")
+    PlayerState = apps.get_model("api", "PlayerState")
+    PlayerStatsNode = apps.get_model("api", "PlayerStatsNode")
+
+    for player in Player.objects.all():
+        state = PlayerState(player=player)
+
+        stats_node = (
+            PlayerStatsNode.objects.filter(player=player).order_by("-id").first()
+        )
+        rating_node = (
+            PlayerRatingNode.objects.filter(player=player)
+            .order_by("-id")
+            .first()
+        )
+
+        if stats_node is not None:
+            for field in STATS_FIELDS:
+                setattr(state, field, getattr(stats_node, field))
+
+        if rating_node is not None:
+            for field in RATING_FIELDS:
+                setattr(state, field, getattr(rating_node, field))
+
+        state.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_auto_20190603_2203'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerState',
+            fields=[
+                ('player', models.OneToOneField(help_text='The player whose state this is.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='state', serialize=False, to='api.Player')),
+                ('ranking', models.PositiveSmallIntegerField(help_text="The player's latest ranking.", null=True)),
+                ('ranking_delta', models.SmallIntegerField(help_text="The player's latest ranking change.", null=True)),
+                ('rating', models.FloatField(help_text="The player's latest rating. This is null if the player hasn't been rated.", null=True)),
+                ('rating_deviation', models.FloatField(help_text="The player's latest rating deviation. This is null if the player hasn't been rated.", null=True)),
+                ('rating_volatility', models.FloatField(help_text="The player's latest rating volatility. This is null if the player hasn't been rated or if the rating algorithm is Glicko.", null=True)),
+                ('inactivity', models.PositiveSmallIntegerField(default=0, help_text='How many rating periods the player has been inactive for.')),
+                ('is_active', models.BooleanField(default=False, help_text='Whether the player is considered active.')),
+                ('games', models.PositiveIntegerField(default=0, help_text='The number of games a player has played.')),
+                ('wins', models.PositiveIntegerField(default=0, help_text='The number of wins the player has.')),
+                ('losses', models.PositiveIntegerField(default=0, help_text='The number of losses the player has.')),
+                ('win_rate', models.FloatField(default=0, help_text="The player's win rate.")),
+                ('average_goals_per_game', models.FloatField(default=0, help_text='The average number of goals scored per game by the player.')),
+                ('average_goals_against_per_game', models.FloatField(default=0, help_text='The average number of goals scored against the player per game.')),
+            ],
+        ),
+        migrations.RunPython(
+            create_player_states, migrations.RunPython.noop
+        ),
+    ]
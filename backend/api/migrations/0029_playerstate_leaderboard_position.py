@@ -0,0 +1,34 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+def set_leaderboard_positions(apps, schema_editor):
+    """Set leaderboard positions for existing active players."""
+    PlayerState = apps.get_model("api", "PlayerState")
+
+    states = PlayerState.objects.filter(is_active=True).order_by(
+        "-rating", "player__name", "player_id"
+    )
+
+    for position, state in enumerate(states, 1):
+        state.leaderboard_position = position
+        state.save(update_fields=["leaderboard_position"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_playerstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstate',
+            name='leaderboard_position',
+            field=models.PositiveIntegerField(db_index=True, help_text="The player's position on the leaderboard, ordered by rating. This is null if the player isn't active.", null=True),
+        ),
+        migrations.RunPython(
+            set_leaderboard_positions, migrations.RunPython.noop
+        ),
+    ]
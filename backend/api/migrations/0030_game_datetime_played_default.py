@@ -0,0 +1,19 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_playerstate_leaderboard_position'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='datetime_played',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='The date and time when the game was played.'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_game_datetime_played_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstate',
+            name='provisional_rating',
+            field=models.FloatField(help_text="The player's rating as if the current rating period ended now. This is null if the player hasn't played any games.", null=True),
+        ),
+        migrations.AddField(
+            model_name='playerstate',
+            name='provisional_rating_deviation',
+            field=models.FloatField(help_text="The player's rating deviation as if the current rating period ended now. This is null if the player hasn't played any games.", null=True),
+        ),
+        migrations.AddField(
+            model_name='playerstate',
+            name='provisional_rating_volatility',
+            field=models.FloatField(help_text="The player's rating volatility as if the current rating period ended now. This is null if the player hasn't played any games or if the rating algorithm is Glicko.", null=True),
+        ),
+    ]
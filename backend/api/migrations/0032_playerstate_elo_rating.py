@@ -0,0 +1,39 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:17
+
+from django.db import migrations, models
+from api.elo import calculate_elo_ratings
+
+
+def set_elo_ratings(apps, schema_editor):
+    """Calculate existing players' Elo ratings from all games played."""
+    Game = apps.get_model("api", "Game")
+    PlayerState = apps.get_model("api", "PlayerState")
+
+    games = (
+        Game.objects.order_by("datetime_played", "id")
+        .values_list("winner_id", "loser_id", named=True)
+        .iterator()
+    )
+    elo_ratings = {}
+
+    calculate_elo_ratings(games, elo_ratings)
+
+    for state in PlayerState.objects.filter(player__in=list(elo_ratings)):
+        state.elo_rating = elo_ratings[state.player_id]
+        state.save(update_fields=["elo_rating"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_playerstate_provisional_ratings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstate',
+            name='elo_rating',
+            field=models.FloatField(help_text="The player's Elo rating, updated after every game. This is null if the player hasn't played any games.", null=True),
+        ),
+        migrations.RunPython(set_elo_ratings, migrations.RunPython.noop),
+    ]
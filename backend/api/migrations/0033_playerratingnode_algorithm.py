@@ -0,0 +1,33 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+def set_algorithms(apps, schema_editor):
+    """Tag existing rating nodes with the algorithm they were calculated with.
+
+    Only Glicko-2 nodes have rating volatilities, so nodes without one
+    were calculated with Glicko.
+    """
+    PlayerRatingNode = apps.get_model("api", "PlayerRatingNode")
+
+    PlayerRatingNode.objects.filter(rating_volatility__isnull=True).update(
+        algorithm="glicko"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_playerstate_elo_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerratingnode',
+            name='algorithm',
+            field=models.CharField(default='glicko2', help_text='The rating algorithm this rating was calculated with.', max_length=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_algorithms, migrations.RunPython.noop),
+    ]
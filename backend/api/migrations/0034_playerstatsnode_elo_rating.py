@@ -0,0 +1,55 @@
+# Generated by Django 2.2.4 on 2026-10-18 18:22
+
+import itertools
+from operator import attrgetter
+from django.db import migrations, models
+from api.elo import calculate_elo_ratings
+
+
+def set_elo_ratings(apps, schema_editor):
+    """Record players' Elo ratings on their existing stats nodes."""
+    PlayerStatsNode = apps.get_model("api", "PlayerStatsNode")
+
+    nodes = (
+        PlayerStatsNode.objects.annotate(
+            winner_id=models.F("game__winner"), loser_id=models.F("game__loser")
+        )
+        .order_by("game__datetime_played", "game", "id")
+        .values_list(
+            "id", "player_id", "game_id", "winner_id", "loser_id", named=True
+        )
+    )
+    elo_ratings = {}
+    updated_nodes = []
+
+    for _, game_nodes in itertools.groupby(nodes, key=attrgetter("game_id")):
+        game_nodes = list(game_nodes)
+
+        calculate_elo_ratings(game_nodes[:1], elo_ratings)
+
+        for node in game_nodes:
+            updated_nodes.append(
+                PlayerStatsNode(
+                    id=node.id, elo_rating=elo_ratings[node.player_id]
+                )
+            )
+
+    PlayerStatsNode.objects.bulk_update(
+        updated_nodes, ["elo_rating"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_playerratingnode_algorithm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstatsnode',
+            name='elo_rating',
+            field=models.FloatField(help_text="The player's Elo rating after the game.", null=True),
+        ),
+        migrations.RunPython(set_elo_ratings, migrations.RunPython.noop),
+    ]
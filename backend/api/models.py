@@ -3,11 +3,16 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
+from . import cache
+from . import elo
+from . import ratings
 from . import stats
 
 
@@ -42,6 +47,40 @@ class RatingPeriod(models.Model):
         return str(self.id)
 
 
+class PlayerQuerySet(models.QuerySet):
+    """A queryset for players."""
+
+    # The prefix for annotations made by with_current_values
+    CURRENT_VALUE_PREFIX = "current_"
+
+    def with_current_values(self):
+        """Annotate players with their current stats and ratings.
+
+        The fields of each player's state are pulled in with a join,
+        so the players' stats and ratings can be read without any
+        further queries. Each annotation is named after the field it's
+        for, prefixed with CURRENT_VALUE_PREFIX. Players without a
+        state get the values of a new state.
+        """
+        annotations = {}
+
+        for field in (
+            PlayerState.STATS_FIELDS
+            + PlayerState.RATING_FIELDS
+            + PlayerState.PROVISIONAL_RATING_FIELDS
+            + ("elo_rating",)
+        ):
+            default = PlayerState._meta.get_field(field).get_default()
+            annotation = F("state__" + field)
+
+            if default is not None:
+                annotation = Coalesce(annotation, Value(default))
+
+            annotations[self.CURRENT_VALUE_PREFIX + field] = annotation
+
+        return self.annotate(**annotations)
+
+
 class Player(models.Model):
     """A model of a player and their stats."""
 
@@ -56,6 +95,8 @@ class Player(models.Model):
         help_text="The user associated with the player.",
     )
 
+    objects = PlayerQuerySet.as_manager()
+
     class Meta:
         """Model metadata."""
 
@@ -69,48 +110,38 @@ class Player(models.Model):
     @property
     def ranking(self):
         """Returns the players ranking."""
-        node = self.get_latest_player_rating_node()
-
-        if node is None:
-            return None
-
-        return node.ranking
+        return self.get_current_value("ranking")
 
     @property
     def ranking_delta(self):
         """Returns the players ranking change."""
-        node = self.get_latest_player_rating_node()
-
-        if node is None:
-            return None
-
-        return node.ranking_delta
+        return self.get_current_value("ranking_delta")
 
     @property
     def rating(self):
         """Returns the players rating."""
-        node = self.get_latest_player_rating_node()
+        rating = self.get_current_value("rating")
 
-        if node is None:
+        if rating is None:
             if settings.RATING_ALGORITHM == "glicko":
                 return settings.GLICKO_BASE_RATING
 
             return settings.GLICKO2_BASE_RATING
 
-        return node.rating
+        return rating
 
     @property
     def rating_deviation(self):
         """Returns the players rating deviation."""
-        node = self.get_latest_player_rating_node()
+        rating_deviation = self.get_current_value("rating_deviation")
 
-        if node is None:
+        if rating_deviation is None:
             if settings.RATING_ALGORITHM == "glicko":
                 return settings.GLICKO_BASE_RD
 
             return settings.GLICKO2_BASE_RD
 
-        return node.rating_deviation
+        return rating_deviation
 
     @property
     def rating_volatility(self):
@@ -125,92 +156,146 @@ class Player(models.Model):
             return None
 
         # Rating algorithm is Glicko-2
-        node = self.get_latest_player_rating_node()
+        rating_volatility = self.get_current_value("rating_volatility")
 
-        if node is None:
+        if rating_volatility is None:
             return settings.GLICKO2_BASE_VOLATILITY
 
-        return node.rating_volatility
+        return rating_volatility
 
     @property
-    def inactivity(self):
-        """Returns the players rating period inactivity."""
-        node = self.get_latest_player_rating_node()
+    def provisional_rating(self):
+        """Returns the players rating as if the rating period ended now.
+
+        This falls back to the player's rating if they haven't played
+        any games.
+        """
+        provisional_rating = self.get_current_value("provisional_rating")
 
-        if node is None:
-            return 0
+        if provisional_rating is None:
+            return self.rating
 
-        return node.inactivity
+        return provisional_rating
 
     @property
-    def is_active(self):
-        """Returns whether the player is active."""
-        node = self.get_latest_player_rating_node()
+    def provisional_rating_deviation(self):
+        """Returns the players RD as if the rating period ended now.
 
-        if node is None:
-            return False
+        This falls back to the player's rating deviation if they haven't
+        played any games.
+        """
+        provisional_rating_deviation = self.get_current_value(
+            "provisional_rating_deviation"
+        )
 
-        return node.is_active
+        if provisional_rating_deviation is None:
+            return self.rating_deviation
+
+        return provisional_rating_deviation
 
     @property
-    def games(self):
-        """Returns the players game count."""
-        node = self.get_latest_player_stats_node()
+    def provisional_rating_volatility(self):
+        """Returns the players volatility as if the rating period ended now.
 
-        if node is None:
-            return 0
+        This falls back to the player's rating volatility if they
+        haven't played any games, and is always None if the rating
+        algorithm is Glicko.
+        """
+        provisional_rating_volatility = self.get_current_value(
+            "provisional_rating_volatility"
+        )
 
-        return node.games
+        if provisional_rating_volatility is None:
+            return self.rating_volatility
+
+        return provisional_rating_volatility
 
     @property
-    def wins(self):
-        """Returns the players win count."""
-        node = self.get_latest_player_stats_node()
+    def elo_rating(self):
+        """Returns the players Elo rating.
+
+        This falls back to the base Elo rating if they haven't played
+        any games.
+        """
+        elo_rating = self.get_current_value("elo_rating")
 
-        if node is None:
-            return 0
+        if elo_rating is None:
+            return elo.ELO_BASE_RATING
 
-        return node.wins
+        return elo_rating
 
     @property
-    def losses(self):
-        """Returns the players losses count."""
-        node = self.get_latest_player_stats_node()
+    def inactivity(self):
+        """Returns the players rating period inactivity."""
+        return self.get_current_value("inactivity")
 
-        if node is None:
-            return 0
+    @property
+    def is_active(self):
+        """Returns whether the player is active."""
+        return self.get_current_value("is_active")
 
-        return node.losses
+    @property
+    def games(self):
+        """Returns the players game count."""
+        return self.get_current_value("games")
 
     @property
-    def win_rate(self):
-        """Returns the players win rate."""
-        node = self.get_latest_player_stats_node()
+    def wins(self):
+        """Returns the players win count."""
+        return self.get_current_value("wins")
 
-        if node is None:
-            return 0
+    @property
+    def losses(self):
+        """Returns the players losses count."""
+        return self.get_current_value("losses")
 
-        return node.win_rate
+    @property
+    def win_rate(self):
+        """Returns the players win rate."""
+        return self.get_current_value("win_rate")
 
     @property
     def average_goals_per_game(self):
         """Returns the players average goals per game."""
-        node = self.get_latest_player_stats_node()
-
-        if node is None:
-            return 0
-
-        return node.average_goals_per_game
+        return self.get_current_value("average_goals_per_game")
 
     @property
     def average_goals_against_per_game(self):
         """Returns the players average goals against per game."""
-        node = self.get_latest_player_stats_node()
+        return self.get_current_value("average_goals_against_per_game")
+
+    def get_current_value(self, field):
+        """Returns one of the player's current stats or ratings.
+
+        Values annotated by PlayerQuerySet.with_current_values are used
+        if they're present; otherwise the value is read from the
+        player's state.
+
+        Args:
+            field: The name of a field of the PlayerState model.
+        """
+        annotation = PlayerQuerySet.CURRENT_VALUE_PREFIX + field
 
-        if node is None:
-            return 0
+        if hasattr(self, annotation):
+            return getattr(self, annotation)
 
-        return node.average_goals_against_per_game
+        return getattr(self.get_state(), field)
+
+    def get_state(self):
+        """Returns the player's current state.
+
+        The state is created from the player's latest nodes if it
+        doesn't exist yet.
+        """
+        try:
+            return self.state
+        except PlayerState.DoesNotExist:
+            state = PlayerState(player=self)
+            state.set_stats(self.get_latest_player_stats_node())
+            state.set_ratings(self.get_latest_player_rating_node())
+            state.save()
+
+            return state
 
     def get_all_player_stats_nodes(self):
         """Returns all of the player's stats nodes."""
@@ -221,12 +306,7 @@ class Player(models.Model):
 
         Returns None if no stats nodes exist for the player.
         """
-        nodes = self.get_all_player_stats_nodes()
-
-        if nodes:
-            return nodes.first()
-
-        return None
+        return self.get_all_player_stats_nodes().first()
 
     def get_all_matchup_stats_nodes(self, opponent):
         """Returns all of the player's matchup stats nodes against an opponent.
@@ -246,28 +326,28 @@ class Player(models.Model):
                 isn't provided, matchup nodes will be returned for all
                 opponents.
         """
-        nodes = self.get_all_matchup_stats_nodes(opponent)
-
-        if nodes:
-            return nodes.first()
-
-        return None
+        return self.get_all_matchup_stats_nodes(opponent).first()
 
     def get_all_player_rating_nodes(self):
-        """Returns all of the player's rating nodes."""
-        return PlayerRatingNode.objects.filter(player=self)
+        """Returns all of the player's rating nodes.
+
+        Only rating nodes from the rating algorithm players are rated
+        with are included.
+        """
+        return PlayerRatingNode.objects.filter(
+            player=self, algorithm=settings.RATING_ALGORITHM
+        )
 
     def get_latest_player_rating_node(self):
         """Returns the player's latest rating node.
 
         Returns None if no rating nodes exist for the player.
         """
-        nodes = self.get_all_player_rating_nodes()
-
-        if nodes:
-            return nodes.first()
-
-        return None
+        return (
+            self.get_all_player_rating_nodes()
+            .order_by(*PlayerRatingNode.LATEST_FIRST_ORDERING)
+            .first()
+        )
 
     def get_first_game_played(self):
         """Returns the first game played by the player.
@@ -285,6 +365,15 @@ class Player(models.Model):
 class Game(models.Model):
     """A model for a particular game."""
 
+    # The fields which stats are calculated from
+    STATS_RELATED_FIELDS = (
+        "winner_id",
+        "loser_id",
+        "winner_score",
+        "loser_score",
+        "datetime_played",
+    )
+
     winner = models.ForeignKey(
         Player,
         on_delete=models.PROTECT,
@@ -304,7 +393,7 @@ class Game(models.Model):
         default=0, help_text="The loser's score."
     )
     datetime_played = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         help_text="The date and time when the game was played.",
     )
     submitted_by = models.ForeignKey(
@@ -333,48 +422,79 @@ class Game(models.Model):
     @property
     def winner_player_stats_node(self):
         """Return the player stats node for the winner."""
-        node_queryset = self.playerstatsnode_set.filter(
-            player=self.winner, game=self
-        )
-
-        if node_queryset:
-            return node_queryset.first().id
-
-        return None
+        return self.get_player_stats_node_id(self.winner_id)
 
     @property
     def loser_player_stats_node(self):
         """Return the player stats node for the loser."""
-        node_queryset = self.playerstatsnode_set.filter(
-            player=self.loser, game=self
-        )
-
-        if node_queryset:
-            return node_queryset.first().id
-
-        return None
+        return self.get_player_stats_node_id(self.loser_id)
 
     @property
     def winner_matchup_stats_node(self):
         """Return the matchup stats node for the winner."""
-        node_queryset = self.matchupstatsnode_set.filter(
-            player1=self.winner, player2=self.loser, game=self
-        )
-
-        if node_queryset:
-            return node_queryset.first().id
-
-        return None
+        return self.get_matchup_stats_node_id(self.winner_id, self.loser_id)
 
     @property
     def loser_matchup_stats_node(self):
         """Return the matchup stats node for the loser."""
-        node_queryset = self.matchupstatsnode_set.filter(
-            player1=self.loser, player2=self.winner, game=self
-        )
+        return self.get_matchup_stats_node_id(self.loser_id, self.winner_id)
+
+    def get_player_stats_node_id(self, player_id):
+        """Return the ID of a player's stats node for this game.
 
-        if node_queryset:
-            return node_queryset.first().id
+        This reads from the game's prefetched player stats nodes if
+        they've been prefetched; otherwise it takes a single query.
+
+        Args:
+            player_id: The ID of the player whose node to find.
+
+        Returns:
+            The ID of the node, or None if the node doesn't exist.
+        """
+        if "playerstatsnode_set" not in getattr(
+            self, "_prefetched_objects_cache", {}
+        ):
+            return (
+                self.playerstatsnode_set.filter(player_id=player_id)
+                .order_by("-id")
+                .values_list("id", flat=True)
+                .first()
+            )
+
+        for node in self.playerstatsnode_set.all():
+            if node.player_id == player_id:
+                return node.id
+
+        return None
+
+    def get_matchup_stats_node_id(self, player1_id, player2_id):
+        """Return the ID of a matchup's stats node for this game.
+
+        This reads from the game's prefetched matchup stats nodes if
+        they've been prefetched; otherwise it takes a single query.
+
+        Args:
+            player1_id: The ID of the player whose perspective to take.
+            player2_id: The ID of the opponent player.
+
+        Returns:
+            The ID of the node, or None if the node doesn't exist.
+        """
+        if "matchupstatsnode_set" not in getattr(
+            self, "_prefetched_objects_cache", {}
+        ):
+            return (
+                self.matchupstatsnode_set.filter(
+                    player1_id=player1_id, player2_id=player2_id
+                )
+                .order_by("-id")
+                .values_list("id", flat=True)
+                .first()
+            )
+
+        for node in self.matchupstatsnode_set.all():
+            if node.player1_id == player1_id and node.player2_id == player2_id:
+                return node.id
 
         return None
 
@@ -390,42 +510,52 @@ class Game(models.Model):
         if self.winner == self.loser:
             raise ValidationError("Winner and loser must be distinct!")
 
-    def process_game(self):
-        """Update player and matchup stats based on game results."""
-        # Create stats nodes
-        if self.winner_player_stats_node is None:
-            stats.create_player_stats_node(
-                player=self.winner,
-                game=self,
-                previous_node=self.winner.get_latest_player_stats_node(),
-            )
-
-        if self.loser_player_stats_node is None:
-            stats.create_player_stats_node(
-                player=self.loser,
-                game=self,
-                previous_node=self.loser.get_latest_player_stats_node(),
-            )
+    def is_backdated(self):
+        """Returns whether either player has played a game after this one."""
+        player_ids = [self.winner_id, self.loser_id]
 
-        if self.winner_matchup_stats_node is None:
-            stats.create_matchup_stats_node(
-                player1=self.winner,
-                player2=self.loser,
-                game=self,
-                previous_node=self.winner.get_latest_matchup_stats_node(
-                    self.loser
-                ),
-            )
+        return Game.objects.filter(
+            Q(winner__in=player_ids) | Q(loser__in=player_ids),
+            datetime_played__gt=self.datetime_played,
+        ).exists()
 
-        if self.loser_matchup_stats_node is None:
-            stats.create_matchup_stats_node(
-                player1=self.loser,
-                player2=self.winner,
-                game=self,
-                previous_node=self.loser.get_latest_matchup_stats_node(
-                    self.winner
-                ),
-            )
+    def process_game(self):
+        """Update player and matchup stats based on game results."""
+        with transaction.atomic():
+            # Create stats nodes
+            if self.winner_player_stats_node is None:
+                stats.create_player_stats_node(
+                    player=self.winner,
+                    game=self,
+                    previous_node=self.winner.get_latest_player_stats_node(),
+                )
+
+            if self.loser_player_stats_node is None:
+                stats.create_player_stats_node(
+                    player=self.loser,
+                    game=self,
+                    previous_node=self.loser.get_latest_player_stats_node(),
+                )
+
+            if self.winner_matchup_stats_node is None:
+                stats.create_matchup_stats_node(
+                    player1=self.winner,
+                    player2=self.loser,
+                    game=self,
+                    previous_node=self.winner.get_latest_matchup_stats_node(
+                        self.loser
+                    ),
+                )
+
+            if self.loser_matchup_stats_node is None:
+                stats.create_matchup_stats_node(
+                    player1=self.loser,
+                    player2=self.winner,
+                    game=self,
+                    previous_node=self.loser.get_latest_matchup_stats_node(
+                        self.winner
+                    ),
+                )
 
 
 class PlayerStatsNode(models.Model):
@@ -460,6 +590,9 @@ class PlayerStatsNode(models.Model):
     average_goals_against_per_game = models.FloatField(
         help_text="The average number of goals scored against the player per game."
     )
+    elo_rating = models.FloatField(
+        null=True, help_text="The player's Elo rating after the game."
+    )
 
     class Meta:
         """Model metadata."""
@@ -548,6 +681,11 @@ class MatchupStatsNode(models.Model):
 class PlayerRatingNode(models.Model):
     """A player's rating for a given rating period."""
 
+    # Orders nodes from the latest rating period to the oldest. Nodes
+    # aren't created in rating period order, since correcting games can
+    # add nodes to old rating periods, so their IDs can't be used.
+    LATEST_FIRST_ORDERING = ("-rating_period__end_datetime", "-id")
+
     player = models.ForeignKey(
         Player,
         on_delete=models.CASCADE,
@@ -558,6 +696,10 @@ class PlayerRatingNode(models.Model):
         on_delete=models.CASCADE,
         help_text="The rating period this rating was calculated in.",
     )
+    algorithm = models.CharField(
+        max_length=32,
+        help_text="The rating algorithm this rating was calculated with.",
+    )
     ranking = models.PositiveSmallIntegerField(
         null=True, help_text="The player's rating for this rating period."
     )
@@ -591,10 +733,10 @@ class PlayerRatingNode(models.Model):
     def __str__(self):
         """String representation of a player rating node.
 
-        Only shows rating volatility if the rating algorithm is
+        Only shows rating volatility if the node was calculated with
         Glicko-2.
         """
-        if settings.RATING_ALGORITHM == "glicko":
+        if self.algorithm == "glicko":
             return "%s RP=%s r=%d, RD=%d" % (
                 self.player,
                 self.rating_period.id,
@@ -611,11 +753,292 @@ class PlayerRatingNode(models.Model):
         )
 
 
+class PlayerState(models.Model):
+    """A player's current ratings and stats.
+
+    This is a copy of the stats and ratings from the player's latest
+    player stats node and latest player rating node, kept up to date
+    whenever new nodes are created for the player. It exists so that
+    reading a player's current ratings and stats doesn't require
+    searching through their node history.
+    """
+
+    # The fields copied from player stats nodes and player rating nodes
+    STATS_FIELDS = (
+        "games",
+        "wins",
+        "losses",
+        "win_rate",
+        "average_goals_per_game",
+        "average_goals_against_per_game",
+    )
+    RATING_FIELDS = (
+        "ranking",
+        "ranking_delta",
+        "rating",
+        "rating_deviation",
+        "rating_volatility",
+        "inactivity",
+        "is_active",
+    )
+    PROVISIONAL_RATING_FIELDS = (
+        "provisional_rating",
+        "provisional_rating_deviation",
+        "provisional_rating_volatility",
+    )
+
+    player = models.OneToOneField(
+        Player,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="state",
+        help_text="The player whose state this is.",
+    )
+    ranking = models.PositiveSmallIntegerField(
+        null=True, help_text="The player's latest ranking."
+    )
+    ranking_delta = models.SmallIntegerField(
+        null=True, help_text="The player's latest ranking change."
+    )
+    rating = models.FloatField(
+        null=True,
+        help_text="The player's latest rating. This is null if the player hasn't been rated.",
+    )
+    rating_deviation = models.FloatField(
+        null=True,
+        help_text="The player's latest rating deviation. This is null if the player hasn't been rated.",
+    )
+    rating_volatility = models.FloatField(
+        null=True,
+        help_text="The player's latest rating volatility. This is null if the player hasn't been rated or if the rating algorithm is Glicko.",
+    )
+    provisional_rating = models.FloatField(
+        null=True,
+        help_text="The player's rating as if the current rating period ended now. This is null if the player hasn't played any games.",
+    )
+    provisional_rating_deviation = models.FloatField(
+        null=True,
+        help_text="The player's rating deviation as if the current rating period ended now. This is null if the player hasn't played any games.",
+    )
+    provisional_rating_volatility = models.FloatField(
+        null=True,
+        help_text="The player's rating volatility as if the current rating period ended now. This is null if the player hasn't played any games or if the rating algorithm is Glicko.",
+    )
+    inactivity = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="How many rating periods the player has been inactive for.",
+    )
+    is_active = models.BooleanField(
+        default=False, help_text="Whether the player is considered active."
+    )
+    elo_rating = models.FloatField(
+        null=True,
+        help_text="The player's Elo rating, updated after every game. This is null if the player hasn't played any games.",
+    )
+    leaderboard_position = models.PositiveIntegerField(
+        null=True,
+        db_index=True,
+        help_text="The player's position on the leaderboard, ordered by rating. This is null if the player isn't active.",
+    )
+    games = models.PositiveIntegerField(
+        default=0, help_text="The number of games a player has played."
+    )
+    wins = models.PositiveIntegerField(
+        default=0, help_text="The number of wins the player has."
+    )
+    losses = models.PositiveIntegerField(
+        default=0, help_text="The number of losses the player has."
+    )
+    win_rate = models.FloatField(default=0, help_text="The player's win rate.")
+    average_goals_per_game = models.FloatField(
+        default=0,
+        help_text="The average number of goals scored per game by the player.",
+    )
+    average_goals_against_per_game = models.FloatField(
+        default=0,
+        help_text="The average number of goals scored against the player per game.",
+    )
+
+    def __str__(self):
+        """String representation of a player state."""
+        return str(self.player)
+
+    def set_stats(self, node):
+        """Copy stats from a player stats node.
+
+        Args:
+            node: An instance of the PlayerStatsNode model, or None to
+                reset the stats.
+        """
+        for field in self.STATS_FIELDS:
+            if node is None:
+                setattr(self, field, 0)
+            else:
+                setattr(self, field, getattr(node, field))
+
+    def set_ratings(self, node):
+        """Copy ratings from a player rating node.
+
+        Args:
+            node: An instance of the PlayerRatingNode model, or None to
+                reset the ratings.
+        """
+        for field in self.RATING_FIELDS:
+            if node is not None:
+                setattr(self, field, getattr(node, field))
+            elif field == "inactivity":
+                setattr(self, field, 0)
+            elif field == "is_active":
+                setattr(self, field, False)
+            else:
+                setattr(self, field, None)
+
+
+@receiver(pre_save, sender=Game)
+def remember_previous_values_hook(instance, **_):
+    """Remember the saved values of a game that's about to be edited."""
+    instance.previous_values = None
+
+    if instance.pk is not None:
+        instance.previous_values = (
+            Game.objects.filter(pk=instance.pk)
+            .values(*Game.STATS_RELATED_FIELDS)
+            .first()
+        )
+
+
 @receiver(post_save, sender=Game)
 def process_game_hook(instance, created, **_):
-    """Process a game immediately after game creation."""
+    """Process a game immediately after game creation or edit.
+
+    A new game played after all of its players' other games is
+    processed directly. Otherwise, the stats of the players and
+    matchups involved are repaired from the earliest changed game on.
+    Any rating periods the game falls in are recomputed, and its
+    players' provisional ratings are updated. Likewise, a new game
+    played after all of its players' other games updates their Elo
+    ratings directly; otherwise, since Elo ratings depend on the order
+    games were played in, every game from the changed game on is
+    replayed.
+    """
+    previous_values = getattr(instance, "previous_values", None)
+
+    if created:
+        is_backdated = instance.is_backdated()
+
+        if is_backdated:
+            stats.repair_stats(
+                matchups=[(instance.winner_id, instance.loser_id)],
+                from_datetime=instance.datetime_played,
+            )
+        else:
+            instance.process_game()
+
+        ratings.recompute_ratings_after_change(
+            from_datetime=instance.datetime_played,
+            until_datetime=instance.datetime_played,
+        )
+        ratings.update_provisional_ratings(
+            [instance.winner_id, instance.loser_id]
+        )
+
+        if is_backdated:
+            elo.replay_elo_ratings(
+                from_datetime=instance.datetime_played,
+                player_ids=[instance.winner_id, instance.loser_id],
+            )
+        else:
+            elo.update_elo_ratings([instance])
+    elif previous_values is not None and any(
+        previous_values[field] != getattr(instance, field)
+        for field in Game.STATS_RELATED_FIELDS
+    ):
+        datetimes_played = (
+            instance.datetime_played,
+            previous_values["datetime_played"],
+        )
+
+        stats.repair_stats(
+            matchups=[
+                (instance.winner_id, instance.loser_id),
+                (previous_values["winner_id"], previous_values["loser_id"]),
+            ],
+            from_datetime=min(datetimes_played),
+        )
+        ratings.recompute_ratings_after_change(
+            from_datetime=min(datetimes_played),
+            until_datetime=max(datetimes_played),
+        )
+        ratings.update_provisional_ratings(
+            [
+                instance.winner_id,
+                instance.loser_id,
+                previous_values["winner_id"],
+                previous_values["loser_id"],
+            ]
+        )
+
+        # Elo ratings don't depend on scores
+        if any(
+            previous_values[field] != getattr(instance, field)
+            for field in ("winner_id", "loser_id", "datetime_played")
+        ):
+            elo.replay_elo_ratings(
+                from_datetime=min(datetimes_played),
+                player_ids=[
+                    instance.winner_id,
+                    instance.loser_id,
+                    previous_values["winner_id"],
+                    previous_values["loser_id"],
+                ],
+            )
+
+
+@receiver(post_delete, sender=Game)
+def repair_stats_hook(instance, **_):
+    """Repair the stats and ratings a deleted game contributed to.
+
+    Elo ratings depend on the order games were played in, so every game
+    played since the deleted game is replayed.
+    """
+    stats.repair_stats(
+        matchups=[(instance.winner_id, instance.loser_id)],
+        from_datetime=instance.datetime_played,
+    )
+    ratings.recompute_ratings_after_change(
+        from_datetime=instance.datetime_played,
+        until_datetime=instance.datetime_played,
+    )
+    ratings.update_provisional_ratings([instance.winner_id, instance.loser_id])
+    elo.replay_elo_ratings(
+        from_datetime=instance.datetime_played,
+        player_ids=[instance.winner_id, instance.loser_id],
+    )
+
+
+@receiver(post_save, sender=Player)
+def create_player_state(instance, created, **_):
+    """Create a state for each new player."""
     if created:
-        instance.process_game()
+        PlayerState.objects.create(player=instance)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+@receiver(post_save, sender=User)
+def bump_data_version_hook(update_fields=None, **_):
+    """Invalidate cached API responses once a change is committed.
+
+    Logging in saves the user's last login, which isn't worth
+    invalidating every cached response for, so those saves are skipped;
+    users' last logins are served as of the last other change.
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+
+    transaction.on_commit(cache.bump_data_version)
 
 
 @receiver(post_save, sender=User)
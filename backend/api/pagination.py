@@ -0,0 +1,28 @@
+"""Contains pagination classes for REST API viewsets.
+
+All list endpoints use keyset (cursor) pagination, so fetching a page
+costs the same no matter how deep into the results it is, and pages
+stay consistent when new rows are inserted while paginating.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Paginate from the most recently created object to the oldest."""
+
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class GameCursorPagination(IdCursorPagination):
+    """Paginate games from the most recently played to the oldest."""
+
+    ordering = ("-datetime_played", "-id")
+
+
+class RatingPeriodCursorPagination(IdCursorPagination):
+    """Paginate rating periods from the most recent to the oldest."""
+
+    ordering = "-end_datetime"
@@ -0,0 +1,189 @@
+"""Contains functions for predicting the outcomes of games.
+
+The probability of each player beating each other player is calculated
+in one go from the ratings of the latest rating period, and the
+resulting matrix is cached until that rating period's ratings change.
+Predictions for any pair or set of players are then read straight off
+the matrix, rather than being recalculated for every request.
+
+Each process also keeps the latest matrix it's read in memory, so that
+looking up a pair of players doesn't mean loading the whole matrix from
+the cache. Every matrix has a version, which is cached on its own, so
+a process only needs to fetch the version to know whether its matrix
+is still current.
+"""
+
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+import numpy as np
+from . import glicko
+from . import models
+
+# Cache keys
+PREDICTIONS_KEY_TEMPLATE = "fooskill:predictions:%s:%d"
+PREDICTIONS_VERSION_KEY_TEMPLATE = "fooskill:predictions_version:%s:%d"
+
+# The predictions this process last read, keyed by rating algorithm and
+# rating period ID
+_predictions = {}
+
+
+def get_predictions_key(rating_period_id):
+    """Returns the cache key of a rating period's predictions."""
+    return PREDICTIONS_KEY_TEMPLATE % (
+        settings.RATING_ALGORITHM,
+        rating_period_id,
+    )
+
+
+def get_predictions_version_key(rating_period_id):
+    """Returns the cache key of a rating period's predictions' version."""
+    return PREDICTIONS_VERSION_KEY_TEMPLATE % (
+        settings.RATING_ALGORITHM,
+        rating_period_id,
+    )
+
+
+def calculate_win_probabilities(rs, RDs):
+    """Calculate the probability of each player beating each other player.
+
+    Args:
+        rs: An array of floats representing each player's rating.
+        RDs: An array of floats representing each player's rating
+            deviation.
+
+    Returns:
+        A square array whose element in the ith row and jth column is
+        the probability of the ith player beating the jth player.
+    """
+    rs = np.asarray(rs, dtype=float)
+    RDs = np.asarray(RDs, dtype=float)
+
+    # Broadcast players down the rows against opponents across the
+    # columns
+    return glicko.win_probability(
+        rs[:, np.newaxis], RDs[:, np.newaxis], rs, RDs
+    )
+
+
+def calculate_predictions(rating_period):
+    """Calculate predictions from a rating period's ratings.
+
+    Args:
+        rating_period: The RatingPeriod model instance whose ratings to
+            predict games with.
+
+    Returns:
+        A dictionary containing a list of the IDs of the players rated
+        in the rating period, a dictionary mapping each of those IDs to
+        its index in the list, the matrix of win probabilities between
+        the players, indexed the same way (see
+        calculate_win_probabilities), and a version unique to these
+        predictions.
+    """
+    nodes = list(
+        models.PlayerRatingNode.objects.filter(
+            rating_period=rating_period, algorithm=settings.RATING_ALGORITHM
+        )
+        .order_by("player")
+        .values_list("player", "rating", "rating_deviation")
+    )
+
+    player_ids = [player_id for player_id, _, _ in nodes]
+
+    return dict(
+        player_ids=player_ids,
+        player_idxs={
+            player_id: idx for idx, player_id in enumerate(player_ids)
+        },
+        probabilities=calculate_win_probabilities(
+            [rating for _, rating, _ in nodes],
+            [rating_deviation for _, _, rating_deviation in nodes],
+        ),
+        version=uuid.uuid4().hex,
+    )
+
+
+def cache_predictions(rating_period_id, predictions):
+    """Cache a rating period's predictions along with their version."""
+    cache.set_many(
+        {
+            get_predictions_key(rating_period_id): predictions,
+            get_predictions_version_key(rating_period_id): predictions[
+                "version"
+            ],
+        },
+        timeout=None,
+    )
+
+
+def get_predictions(rating_period):
+    """Returns a rating period's predictions, calculating them if needed.
+
+    If this process already has the current predictions in memory, this
+    only reads their version from the cache.
+
+    Args:
+        rating_period: The RatingPeriod model instance whose ratings to
+            predict games with.
+
+    Returns:
+        A dictionary of predictions, as returned by
+        calculate_predictions.
+    """
+    global _predictions
+
+    memo_key = (settings.RATING_ALGORITHM, rating_period.id)
+    version = cache.get(get_predictions_version_key(rating_period.id))
+    predictions = _predictions.get(memo_key)
+
+    if predictions is not None and predictions["version"] == version:
+        return predictions
+
+    predictions = cache.get(get_predictions_key(rating_period.id))
+
+    # Recalculate the predictions if they're missing, or if their
+    # version is missing or doesn't match them
+    if (
+        version is None
+        or predictions is None
+        or predictions.get("version") != version
+    ):
+        predictions = calculate_predictions(rating_period)
+        cache_predictions(rating_period.id, predictions)
+
+    # Only the latest predictions read are kept
+    _predictions = {memo_key: predictions}
+
+    return predictions
+
+
+def cache_latest_predictions():
+    """Calculate and cache the latest rating period's predictions.
+
+    Call this once the latest rating period's ratings are committed, so
+    the first request for predictions doesn't have to calculate them.
+    """
+    latest_rating_period = models.RatingPeriod.objects.first()
+
+    if latest_rating_period is not None:
+        cache_predictions(
+            latest_rating_period.id,
+            calculate_predictions(latest_rating_period),
+        )
+
+
+def delete_predictions(rating_period_id):
+    """Delete a rating period's cached predictions.
+
+    Call this after committing any change to a rating period's ratings.
+    Other processes' predictions in memory are discarded once they see
+    the version is gone.
+    """
+    cache.delete_many(
+        [
+            get_predictions_key(rating_period_id),
+            get_predictions_version_key(rating_period_id),
+        ]
+    )
@@ -0,0 +1,281 @@
+"""Replays ratings over a game log without a database.
+
+This runs the same rating engines and rating period logic the backend
+does, but reads games from a file and writes each rating period's
+ratings and rankings as CSV to standard output. It doesn't need any
+Django settings or a database, so it's suited to analysis, benchmarks,
+and CI. Run it from the backend directory with
+
+    python -m api.rate_games games.csv
+
+The game log can be in any format import_games reads: a CSV or NDJSON
+file with datetime_played, winner, and loser fields (any other fields,
+such as scores, are ignored), or a NumPy .npz file with
+datetime_played, winner, and loser arrays.
+"""
+
+import argparse
+import collections
+import csv
+import datetime
+import inspect
+import sys
+from django.utils.dateparse import parse_date, parse_datetime
+from . import rating_engines
+from .game_files import FORMAT_EXTENSIONS, get_format, read_rows
+
+# The columns written for each player in each rating period
+OUTPUT_FIELDS = (
+    "period_start",
+    "period_end",
+    "algorithm",
+    "player",
+    "ranking",
+    "ranking_delta",
+    "rating",
+    "rating_deviation",
+    "rating_volatility",
+    "inactivity",
+    "is_active",
+)
+
+
+def parse_args(args=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m api.rate_games",
+        description=(
+            "Replays ratings over a game log and writes each rating"
+            " period's ratings and rankings as CSV to standard output."
+        ),
+    )
+    parser.add_argument(
+        "file",
+        help="Path of the game log, or - to read from standard input.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(FORMAT_EXTENSIONS),
+        help="Format of the game log. Inferred from the file extension if"
+        " not given.",
+    )
+    parser.add_argument(
+        "--algorithm",
+        action="append",
+        choices=sorted(rating_engines.RATING_ENGINES),
+        help="Rating algorithm to rate players with. Can be given more"
+        " than once. Defaults to glicko2.",
+    )
+    parser.add_argument(
+        "--base-rating",
+        type=float,
+        help="Rating of unrated players.",
+    )
+    parser.add_argument(
+        "--base-rd",
+        type=float,
+        help="Rating deviation of unrated players.",
+    )
+    parser.add_argument(
+        "--base-volatility",
+        type=float,
+        help="Rating volatility of unrated players (Glicko-2 only).",
+    )
+    parser.add_argument(
+        "--tau",
+        type=float,
+        help="System constant constraining volatility changes (Glicko-2"
+        " only).",
+    )
+    parser.add_argument(
+        "--period-days",
+        type=int,
+        default=rating_engines.RATING_PERIOD_DAYS,
+        help="Number of days in each rating period.",
+    )
+    parser.add_argument(
+        "--periods-missed-to-be-inactive",
+        type=int,
+        default=rating_engines.NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE,
+        help="Number of rating periods in a row a player needs to miss to"
+        " be considered inactive.",
+    )
+    parser.add_argument(
+        "--until",
+        type=parse_datetime_arg,
+        help="Only rate periods which have ended by this datetime. A date"
+        " on its own means the start of that day. Defaults to now.",
+    )
+    parser.add_argument(
+        "--latest-only",
+        action="store_true",
+        help="Only write the ratings of the latest rating period.",
+    )
+
+    return parser.parse_args(args)
+
+
+def to_aware_datetime(value):
+    """Parse a datetime, treating naive datetimes as UTC.
+
+    Raises:
+        ValueError: The value isn't a valid datetime.
+    """
+    if isinstance(value, datetime.datetime):
+        datetime_ = value
+    else:
+        datetime_ = parse_datetime(str(value))
+
+        if datetime_ is None:
+            raise ValueError("%r is not a valid datetime" % value)
+
+    if datetime_.tzinfo is None:
+        datetime_ = datetime_.replace(tzinfo=datetime.timezone.utc)
+
+    return datetime_
+
+
+def parse_datetime_arg(value):
+    """Parse a datetime or date command line argument.
+
+    A date is taken to mean midnight UTC at the start of the day.
+    """
+    try:
+        date = parse_date(value)
+
+        if date is None:
+            return to_aware_datetime(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+    return datetime.datetime.combine(
+        date, datetime.time(tzinfo=datetime.timezone.utc)
+    )
+
+
+def read_games(path, format_):
+    """Read a game log.
+
+    Players are referred to by name in game logs. They're given IDs in
+    the order they first appear in, like players created when games
+    are imported.
+
+    Args:
+        path: The path of the game log, or - for standard input.
+        format_: The format of the game log.
+
+    Returns:
+        A two-tuple containing a list of games, as three-tuples
+        containing the datetime played and the winner's and loser's
+        player IDs, sorted by when they were played, and a list of
+        player names indexed by player ID.
+
+    Raises:
+        ValueError: A game is malformed.
+    """
+    player_ids = {}
+    games = []
+
+    for row_number, row in enumerate(read_rows(path, format_), 1):
+        try:
+            datetime_played = to_aware_datetime(row["datetime_played"])
+            winner = str(row["winner"])
+            loser = str(row["loser"])
+        except KeyError as e:
+            raise ValueError("Game %d: missing %s" % (row_number, e))
+        except ValueError as e:
+            raise ValueError("Game %d: %s" % (row_number, e))
+
+        winner_id = player_ids.setdefault(winner, len(player_ids))
+        loser_id = player_ids.setdefault(loser, len(player_ids))
+
+        games.append((datetime_played, winner_id, loser_id))
+
+    # Sorting is stable, so games played at the same time stay in file
+    # order
+    games.sort(key=lambda game: game[0])
+
+    return games, list(player_ids)
+
+
+def get_engines(options):
+    """Returns the rating engines configured by the arguments."""
+    parameters = {
+        "base_rating": options.base_rating,
+        "base_RD": options.base_rd,
+        "base_volatility": options.base_volatility,
+        "tau": options.tau,
+    }
+    engines = []
+
+    for algorithm in options.algorithm or ["glicko2"]:
+        engine_class = rating_engines.RATING_ENGINES[algorithm]
+        engine_parameter_names = inspect.signature(engine_class).parameters
+
+        # Only pass parameters which were given and which the engine
+        # takes, so the rest keep their defaults
+        engine_parameters = {
+            parameter: value
+            for parameter, value in parameters.items()
+            if value is not None and parameter in engine_parameter_names
+        }
+
+        engines.append(engine_class(**engine_parameters))
+
+    return engines
+
+
+def write_rating_periods(file, rating_periods, player_names):
+    """Write rating periods' ratings and rankings as CSV."""
+    writer = csv.writer(file)
+    writer.writerow(OUTPUT_FIELDS)
+
+    for start_datetime, end_datetime, new_ratings in rating_periods:
+        for algorithm, ratings in new_ratings.items():
+            for player_id, rating in ratings.items():
+                writer.writerow(
+                    (
+                        start_datetime.isoformat(),
+                        end_datetime.isoformat(),
+                        algorithm,
+                        player_names[player_id],
+                        rating["ranking"],
+                        rating["ranking_delta"],
+                        rating["rating"],
+                        rating["rating_deviation"],
+                        rating["rating_volatility"],
+                        rating["inactivity"],
+                        rating["is_active"],
+                    )
+                )
+
+
+def main(args=None):
+    """Run the command line interface."""
+    options = parse_args(args)
+
+    try:
+        games, player_names = read_games(
+            options.file, get_format(options.file, options.format)
+        )
+    except (OSError, ValueError) as e:
+        sys.exit("error: %s" % e)
+
+    rating_periods = rating_engines.replay_games(
+        games=games,
+        player_ids=list(range(len(player_names))),
+        engines=get_engines(options),
+        now=options.until or datetime.datetime.now(tz=datetime.timezone.utc),
+        rating_period_days=options.period_days,
+        periods_missed_to_be_inactive=options.periods_missed_to_be_inactive,
+    )
+
+    if options.latest_only:
+        # Only the latest rating period is kept in memory
+        rating_periods = collections.deque(rating_periods, maxlen=1)
+
+    write_rating_periods(sys.stdout, rating_periods, player_names)
+
+
+if __name__ == "__main__":
+    main()
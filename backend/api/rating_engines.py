@@ -0,0 +1,595 @@
+"""Contains the rating engines players can be rated with.
+
+A rating engine wraps a rating algorithm behind a common interface, so
+that ratings can be calculated with any algorithm, or with several
+algorithms at once, without the rest of the backend knowing the
+details of each one. Engines are registered under the name of their
+algorithm, which is what the RATING_ALGORITHM and RATING_ALGORITHMS
+settings refer to.
+
+Nothing in this module depends on Django. The backend configures
+engines from its settings and feeds them games from the database, but
+the same code can replay ratings from a game log without any settings
+or database (see rate_games).
+"""
+
+from datetime import timedelta
+import numpy as np
+from . import glicko
+from . import glicko2
+
+# The registered rating engine classes, keyed by the name of their
+# algorithm
+RATING_ENGINES = {}
+
+# Default settings for rating periods
+RATING_PERIOD_DAYS = 7
+NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE = 5
+
+
+def register_rating_engine(engine_class):
+    """Register a rating engine under the name of its algorithm.
+
+    This is meant to be used as a class decorator.
+    """
+    RATING_ENGINES[engine_class.name] = engine_class
+
+    return engine_class
+
+
+def get_rating_engine(algorithm, settings=None):
+    """Returns a rating engine for a rating algorithm.
+
+    Args:
+        algorithm: The name of the rating algorithm.
+        settings: An optional object with the rating settings as
+            attributes, like Django's settings. If not given, the
+            engine's default parameters are used.
+
+    Raises:
+        KeyError: No rating engine is registered for the algorithm.
+    """
+    engine_class = RATING_ENGINES[algorithm]
+
+    if settings is None:
+        return engine_class()
+
+    return engine_class.from_settings(settings)
+
+
+class RatingEngine:
+    """The interface every rating engine implements.
+
+    A rating engine's state is the rating parameters of a list of
+    players, stored however suits its algorithm.
+    """
+
+    # The name of the rating algorithm
+    name = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Returns an engine configured from rating settings.
+
+        Args:
+            settings: An object with the rating settings as attributes,
+                named as in Django's settings.
+        """
+        raise NotImplementedError
+
+    def get_base_ratings(self):
+        """Returns the rating parameters of a player without any ratings.
+
+        Returns:
+            A dictionary containing the rating, rating deviation, and
+            rating volatility of an unrated player.
+        """
+        raise NotImplementedError
+
+    def load_state(self, old_ratings):
+        """Load players' rating parameters into a state.
+
+        Args:
+            old_ratings: A list of dictionaries containing each
+                player's rating, rating deviation, and rating
+                volatility.
+
+        Returns:
+            The engine's state for the players.
+        """
+        raise NotImplementedError
+
+    def update(self, state, players, opponents, scores):
+        """Calculate players' new ratings for a rating period.
+
+        Args:
+            state: The engine's state for the players before the rating
+                period, as returned by load_state.
+            players: An array containing the index of the player for
+                each game from the perspective of each of its players.
+            opponents: An array containing the index of the opponent
+                for each game from the perspective of each of its
+                players.
+            scores: An array containing the score of each game from the
+                perspective of each of its players: 1 for a win and 0
+                for a loss.
+
+        Returns:
+            The engine's state for the players after the rating period.
+        """
+        raise NotImplementedError
+
+    def serialize_state(self, state):
+        """Convert a state back into players' rating parameters.
+
+        Args:
+            state: The engine's state for the players.
+
+        Returns:
+            A list of dictionaries containing each player's rating,
+            rating deviation, and rating volatility, in the same order
+            as the players were loaded.
+        """
+        raise NotImplementedError
+
+
+@register_rating_engine
+class GlickoEngine(RatingEngine):
+    """A rating engine for the Glicko rating algorithm."""
+
+    name = "glicko"
+
+    def __init__(self, base_rating=glicko.BASE_RATING, base_RD=glicko.BASE_RD):
+        self.base_rating = base_rating
+        self.base_RD = base_RD
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            base_rating=settings.GLICKO_BASE_RATING,
+            base_RD=settings.GLICKO_BASE_RD,
+        )
+
+    def get_base_ratings(self):
+        return dict(
+            rating=self.base_rating,
+            rating_deviation=self.base_RD,
+            rating_volatility=None,
+        )
+
+    def load_state(self, old_ratings):
+        return dict(
+            rs=np.array(
+                [ratings["rating"] for ratings in old_ratings], dtype=float
+            ),
+            RDs=np.array(
+                [ratings["rating_deviation"] for ratings in old_ratings],
+                dtype=float,
+            ),
+        )
+
+    def update(self, state, players, opponents, scores):
+        new_rs, new_RDs = glicko.calculate_player_ratings(
+            players=players,
+            opponents=opponents,
+            scores=scores,
+            base_RD=self.base_RD,
+            **state,
+        )
+
+        return dict(rs=new_rs, RDs=new_RDs)
+
+    def serialize_state(self, state):
+        return [
+            dict(
+                rating=float(r),
+                rating_deviation=float(RD),
+                rating_volatility=None,
+            )
+            for r, RD in zip(state["rs"], state["RDs"])
+        ]
+
+
+@register_rating_engine
+class Glicko2Engine(RatingEngine):
+    """A rating engine for the Glicko-2 rating algorithm."""
+
+    name = "glicko2"
+
+    def __init__(
+        self,
+        base_rating=glicko2.BASE_RATING,
+        base_RD=glicko2.BASE_RD,
+        base_volatility=glicko2.BASE_VOLATILITY,
+        tau=glicko2.TAU,
+    ):
+        self.base_rating = base_rating
+        self.base_RD = base_RD
+        self.base_volatility = base_volatility
+        self.tau = tau
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            base_rating=settings.GLICKO2_BASE_RATING,
+            base_RD=settings.GLICKO2_BASE_RD,
+            base_volatility=settings.GLICKO2_BASE_VOLATILITY,
+            tau=settings.GLICKO2_SYSTEM_CONSTANT,
+        )
+
+    def get_base_ratings(self):
+        return dict(
+            rating=self.base_rating,
+            rating_deviation=self.base_RD,
+            rating_volatility=self.base_volatility,
+        )
+
+    def load_state(self, old_ratings):
+        return dict(
+            rs=np.array(
+                [ratings["rating"] for ratings in old_ratings], dtype=float
+            ),
+            RDs=np.array(
+                [ratings["rating_deviation"] for ratings in old_ratings],
+                dtype=float,
+            ),
+            sigmas=np.array(
+                [ratings["rating_volatility"] for ratings in old_ratings],
+                dtype=float,
+            ),
+        )
+
+    def update(self, state, players, opponents, scores):
+        new_rs, new_RDs, new_sigmas = glicko2.calculate_player_ratings(
+            players=players,
+            opponents=opponents,
+            scores=scores,
+            tau=self.tau,
+            base_rating=self.base_rating,
+            **state,
+        )
+
+        return dict(rs=new_rs, RDs=new_RDs, sigmas=new_sigmas)
+
+    def serialize_state(self, state):
+        return [
+            dict(
+                rating=float(r),
+                rating_deviation=float(RD),
+                rating_volatility=float(sigma),
+            )
+            for r, RD, sigma in zip(state["rs"], state["RDs"], state["sigmas"])
+        ]
+
+
+def get_base_ratings(engine):
+    """Returns the rating parameters for a player without any ratings.
+
+    Args:
+        engine: The rating engine to get base ratings from.
+
+    Returns:
+        A dictionary containing the ranking, rating, rating deviation,
+        rating volatility, and inactivity of an unrated player.
+    """
+    return dict(ranking=None, inactivity=0, **engine.get_base_ratings())
+
+
+def calculate_new_ratings(
+    engine,
+    player_ids,
+    previous_ratings,
+    games,
+    periods_missed_to_be_inactive=(
+        NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
+    ),
+):
+    """Calculate new ratings and rankings for a rating period.
+
+    This does all of its work in memory and doesn't touch the database.
+
+    Args:
+        engine: The rating engine to calculate ratings with.
+        player_ids: A list of IDs of the players to rate. This should
+            be all players who have played a game at or before the end
+            of the rating period.
+        previous_ratings: A dictionary containing player IDs as keys
+            and dictionaries containing the player's previous ranking,
+            rating, rating deviation, rating volatility, and inactivity
+            as values. Players absent from this dictionary are treated
+            as unrated.
+        games: A list of two-tuples containing the winner's and the
+            loser's player IDs for each game in the rating period.
+        periods_missed_to_be_inactive: An optional integer specifying
+            how many rating periods in a row a player needs to miss to
+            be considered inactive.
+
+    Returns:
+        A dictionary containing player IDs as keys and dictionaries
+        containing the player's new ranking, ranking delta, rating,
+        rating deviation, rating volatility, inactivity, and whether
+        they're active as values.
+    """
+    base_ratings = get_base_ratings(engine)
+    old_ratings = [
+        previous_ratings.get(player_id, base_ratings)
+        for player_id in player_ids
+    ]
+
+    # Build up arrays of every game from the perspective of each of its
+    # players
+    player_idxs = {player_id: idx for idx, player_id in enumerate(player_ids)}
+
+    winners = np.array(
+        [player_idxs[winner_id] for winner_id, _ in games], dtype=int
+    )
+    losers = np.array(
+        [player_idxs[loser_id] for _, loser_id in games], dtype=int
+    )
+
+    players = np.concatenate([winners, losers])
+    opponents = np.concatenate([losers, winners])
+    scores = np.concatenate([np.ones(len(games)), np.zeros(len(games))])
+
+    new_parameters = engine.serialize_state(
+        engine.update(
+            engine.load_state(old_ratings),
+            players=players,
+            opponents=opponents,
+            scores=scores,
+        )
+    )
+
+    games_played = np.bincount(players, minlength=len(player_ids))
+
+    new_ratings = {}
+
+    for idx, player_id in enumerate(player_ids):
+        # Calculate new inactivity
+        if games_played[idx]:
+            new_inactivity = 0
+        else:
+            new_inactivity = old_ratings[idx]["inactivity"] + 1
+
+        new_ratings[player_id] = dict(
+            ranking=None,
+            ranking_delta=None,
+            **new_parameters[idx],
+            inactivity=new_inactivity,
+            # Determine if the player is labelled as active
+            is_active=bool(new_inactivity < periods_missed_to_be_inactive),
+        )
+
+    # Filter all active players and sort by rating
+    new_active_player_ratings = [
+        (player_id, new_rating["rating"])
+        for player_id, new_rating in new_ratings.items()
+        if new_rating["is_active"]
+    ]
+    new_active_player_ratings.sort(key=lambda x: x[1], reverse=True)
+
+    # Process new rankings and ranking changes
+    num_active_players = len(new_active_player_ratings)
+
+    # Keep track of the previous player's integer rating for ranking
+    # ties
+    last_integer_rating = None
+    last_ranking = None
+
+    for idx, player_tuple in enumerate(new_active_player_ratings, 1):
+        # Unpack the player tuple
+        player_id, rating = player_tuple
+
+        integer_rating = round(rating)
+
+        if (
+            last_integer_rating is not None
+            and last_integer_rating == integer_rating
+        ):
+            # Tie
+            ranking = last_ranking
+        else:
+            last_integer_rating = integer_rating
+            last_ranking = idx
+            ranking = idx
+
+        # Ranking
+        new_ratings[player_id]["ranking"] = ranking
+
+        # Ranking delta
+        old_ranking = previous_ratings.get(player_id, base_ratings)["ranking"]
+
+        if old_ranking is None:
+            new_ratings[player_id]["ranking_delta"] = (
+                num_active_players - ranking + 1
+            )
+        else:
+            new_ratings[player_id]["ranking_delta"] = old_ranking - ranking
+
+    return new_ratings
+
+
+def get_rated_player_ids(player_ids, first_games_played, end_datetime):
+    """Returns the IDs of players to rate in a rating period.
+
+    Players whose first game is after the rating period aren't rated.
+
+    Args:
+        player_ids: A list of the IDs of all players.
+        first_games_played: A dictionary containing player IDs as keys
+            and the datetime of each player's first game as values.
+        end_datetime: The datetime for the end of the rating period.
+
+    Returns:
+        A list of the IDs of players to rate, in the same order as
+        player_ids.
+    """
+    return [
+        player_id
+        for player_id in player_ids
+        if player_id in first_games_played
+        and first_games_played[player_id] <= end_datetime
+    ]
+
+
+def get_rating_period_datetimes(
+    start_datetime, now, rating_period_days=RATING_PERIOD_DAYS
+):
+    """Returns the start and end datetimes of rating periods to process.
+
+    Args:
+        start_datetime: The datetime for the start of the first rating
+            period to process.
+        now: The current datetime. Only rating periods which have ended
+            by this datetime are returned.
+        rating_period_days: An optional integer specifying how many
+            days each rating period lasts.
+
+    Returns:
+        A list of two-tuples containing the start and end datetimes of
+        each rating period which has elapsed, from oldest to newest.
+    """
+    rating_period_length = timedelta(days=rating_period_days)
+    rating_period_datetimes = []
+
+    end_datetime = start_datetime + rating_period_length
+
+    while end_datetime <= now:
+        rating_period_datetimes.append((start_datetime, end_datetime))
+
+        start_datetime = end_datetime + timedelta.resolution
+        end_datetime = start_datetime + rating_period_length
+
+    return rating_period_datetimes
+
+
+def replay_rating_periods(
+    rating_period_datetimes,
+    games,
+    player_ids,
+    first_games_played,
+    previous_ratings,
+    engines,
+    periods_missed_to_be_inactive=(
+        NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
+    ),
+):
+    """Calculate the ratings of consecutive rating periods.
+
+    The games are consumed once, in order, and each engine's ratings
+    are carried over in memory from one rating period to the next.
+    Since this is a generator, the caller can save each rating period
+    as it's yielded.
+
+    Args:
+        rating_period_datetimes: A list of two-tuples containing the
+            start and end datetimes of each rating period, from oldest
+            to newest.
+        games: An iterable of three-tuples containing the datetime
+            played, the winner's player ID, and the loser's player ID
+            of each game, in the order they were played, starting from
+            the first rating period. This can be a stream.
+        player_ids: A list of the IDs of all players.
+        first_games_played: A dictionary containing player IDs as keys
+            and the datetime of each player's first game as values.
+        previous_ratings: A dictionary containing the names of the
+            engines' algorithms as keys and dictionaries of each
+            player's rating parameters before the first rating period
+            as values. See calculate_new_ratings.
+        engines: A list of rating engines to calculate ratings with.
+        periods_missed_to_be_inactive: An optional integer specifying
+            how many rating periods in a row a player needs to miss to
+            be considered inactive.
+
+    Yields:
+        A three-tuple for each rating period containing its start and
+        end datetimes and a dictionary containing the names of the
+        engines' algorithms as keys and dictionaries of each player's
+        new rating parameters, as returned by calculate_new_ratings, as
+        values.
+    """
+    games = iter(games)
+    next_game = next(games, None)
+
+    for start_datetime, end_datetime in rating_period_datetimes:
+        # Grab all games that are in this rating period
+        rating_period_games = []
+
+        while next_game is not None and next_game[0] <= end_datetime:
+            rating_period_games.append(next_game[1:])
+            next_game = next(games, None)
+
+        rated_player_ids = get_rated_player_ids(
+            player_ids=player_ids,
+            first_games_played=first_games_played,
+            end_datetime=end_datetime,
+        )
+        new_ratings = {
+            engine.name: calculate_new_ratings(
+                engine=engine,
+                player_ids=rated_player_ids,
+                previous_ratings=previous_ratings[engine.name],
+                games=rating_period_games,
+                periods_missed_to_be_inactive=periods_missed_to_be_inactive,
+            )
+            for engine in engines
+        }
+
+        yield start_datetime, end_datetime, new_ratings
+
+        previous_ratings = new_ratings
+
+
+def replay_games(
+    games,
+    player_ids,
+    engines,
+    now,
+    rating_period_days=RATING_PERIOD_DAYS,
+    periods_missed_to_be_inactive=(
+        NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
+    ),
+):
+    """Replay rating periods over games.
+
+    Rating periods start at the first game, like they do when the
+    backend processes ratings for the first time.
+
+    Args:
+        games: A list of three-tuples containing the datetime played
+            and the winner's and loser's player IDs of each game,
+            sorted by when they were played.
+        player_ids: A list of the IDs of all players.
+        engines: A list of rating engines to calculate ratings with.
+        now: The current datetime. Only rating periods which have ended
+            by this datetime are rated.
+        rating_period_days: An optional integer specifying how many
+            days each rating period lasts.
+        periods_missed_to_be_inactive: An optional integer specifying
+            how many rating periods in a row a player needs to miss to
+            be considered inactive.
+
+    Returns:
+        A generator yielding each rating period as described in
+        replay_rating_periods.
+    """
+    if not games:
+        return iter(())
+
+    first_games_played = {}
+
+    for datetime_played, winner_id, loser_id in games:
+        first_games_played.setdefault(winner_id, datetime_played)
+        first_games_played.setdefault(loser_id, datetime_played)
+
+    return replay_rating_periods(
+        rating_period_datetimes=get_rating_period_datetimes(
+            games[0][0], now, rating_period_days
+        ),
+        games=games,
+        player_ids=player_ids,
+        first_games_played=first_games_played,
+        previous_ratings={engine.name: {} for engine in engines},
+        engines=engines,
+        periods_missed_to_be_inactive=periods_missed_to_be_inactive,
+    )
@@ -1,183 +1,743 @@
 """Contains functions for calculating player ratings."""
 
+from functools import partial
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from . import cache
 from . import models
-from . import glicko
-from . import glicko2
+from . import predictions
+from . import rating_engines
 
-# The rating algorithm to use
+# The rating algorithm players are rated with
 RATING_ALGORITHM = settings.RATING_ALGORITHM
 
+# The rating algorithms ratings are calculated with, starting with the
+# one players are rated with
+RATING_ALGORITHMS = settings.RATING_ALGORITHMS
+
+# How many rows to insert per query when bulk creating rating nodes
+BULK_CREATE_BATCH_SIZE = 1000
 
-def calculate_new_rating_period(start_datetime, end_datetime):
-    """Calculate a new ratings and a corresponding new rating period.
+
+def get_rating_engine(algorithm=RATING_ALGORITHM):
+    """Returns a rating engine configured with the rating settings.
 
     Args:
-        start_datetime: The datetime for the start of the rating period.
-        end_datetime: The datetime for the end of the rating period.
+        algorithm: An optional string specifying the rating algorithm.
+            Defaults to the one players are rated with.
+    """
+    return rating_engines.get_rating_engine(algorithm, settings)
+
+
+def get_base_ratings(algorithm=RATING_ALGORITHM):
+    """Returns the rating parameters for a player without any ratings.
+
+    Args:
+        algorithm: An optional string specifying the rating algorithm.
+            Defaults to the one players are rated with.
+
+    Returns:
+        A dictionary containing the ranking, rating, rating deviation,
+        rating volatility, and inactivity of an unrated player.
+    """
+    return rating_engines.get_base_ratings(get_rating_engine(algorithm))
+
+
+def load_first_games_played():
+    """Load the datetime of each player's first game.
+
+    This takes a constant number of queries regardless of how many
+    players and games there are.
+
+    Returns:
+        A dictionary containing player IDs as keys and the datetime of
+        each player's first game as values. Players who haven't played
+        any games are absent.
+    """
+    first_games_played = {}
+
+    for field in ("winner", "loser"):
+        # Clear the default ordering, otherwise it ends up in the GROUP
+        # BY clause
+        rows = (
+            models.Game.objects.order_by()
+            .values(field)
+            .annotate(first_datetime_played=Min("datetime_played"))
+            .values_list(field, "first_datetime_played")
+        )
+
+        for player_id, datetime_played in rows:
+            if (
+                player_id not in first_games_played
+                or datetime_played < first_games_played[player_id]
+            ):
+                first_games_played[player_id] = datetime_played
+
+    return first_games_played
+
+
+def load_ratings(rating_period, player_ids=None, algorithm=RATING_ALGORITHM):
+    """Load each player's rating parameters from a rating period.
+
+    Args:
+        rating_period: A RatingPeriod model instance, or None.
+        player_ids: An optional list of the IDs of the players to load.
+            If not given, every player's rating parameters are loaded.
+        algorithm: An optional string specifying the rating algorithm
+            to load ratings for. Defaults to the one players are rated
+            with.
+
+    Returns:
+        A dictionary containing player IDs as keys and dictionaries
+        containing the player's ranking, rating, rating deviation,
+        rating volatility, and inactivity as values. Players who weren't
+        rated in the rating period are absent.
     """
-    # Create the rating period
-    rating_period = models.RatingPeriod.objects.create(
-        start_datetime=start_datetime, end_datetime=end_datetime
+    if rating_period is None:
+        return {}
+
+    nodes = models.PlayerRatingNode.objects.filter(
+        rating_period=rating_period, algorithm=algorithm
     )
 
-    # Grab all games that will be in this rating period
-    games = models.Game.objects.filter(
-        datetime_played__gte=start_datetime, datetime_played__lte=end_datetime
+    if player_ids is not None:
+        nodes = nodes.filter(player__in=player_ids)
+
+    nodes = nodes.values(
+        "player",
+        "ranking",
+        "rating",
+        "rating_deviation",
+        "rating_volatility",
+        "inactivity",
     )
 
-    # Mark all of the above games as belonging in this rating period
-    for game in games:
-        game.rating_period = rating_period
-        game.save()
-
-    # For each player, find all their matches, their scores in those
-    # matches; then calculate their ratings. The new_ratings dictionary
-    # contains players as keys, and dictionaries containing their new
-    # rating parameters as the dictionary values.
-    new_ratings = {}
-
-    for player in models.Player.objects.all():
-        # Don't calculate anything if they player's first game is prior
-        # to this rating period
-        first_game_played = player.get_first_game_played()
-
-        if (
-            first_game_played is None
-            or first_game_played.datetime_played > end_datetime
-        ):
-            continue
-
-        # Get the players rating parameters
-        player_rating = player.rating
-        player_rating_deviation = player.rating_deviation
-        player_inactivity = player.inactivity
-
-        if RATING_ALGORITHM == "glicko2":
-            player_rating_volatility = player.rating_volatility
-
-        # Build up the per-game rating parameters of opponents
-        opponent_ratings = []
-        opponent_rating_deviations = []
-        scores = []
-
-        for won_game in games.filter(winner=player):
-            opponent_ratings.append(won_game.loser.rating)
-            opponent_rating_deviations.append(won_game.loser.rating_deviation)
-            scores.append(1)
-
-        for lost_game in games.filter(loser=player):
-            opponent_ratings.append(lost_game.winner.rating)
-            opponent_rating_deviations.append(
-                lost_game.winner.rating_deviation
+    return {node.pop("player"): node for node in nodes}
+
+
+def load_ratings_for_algorithms(rating_period):
+    """Load each player's rating parameters for every rating algorithm.
+
+    Args:
+        rating_period: A RatingPeriod model instance, or None.
+
+    Returns:
+        A dictionary containing the names of the rating algorithms in
+        RATING_ALGORITHMS as keys and dictionaries of each player's
+        rating parameters, as returned by load_ratings, as values.
+    """
+    return {
+        algorithm: load_ratings(rating_period, algorithm=algorithm)
+        for algorithm in RATING_ALGORITHMS
+    }
+
+
+def load_latest_ratings():
+    """Load each player's rating parameters from the latest rating period.
+
+    Once a player has played their first game, they get a rating node
+    in every rating period after it, so the nodes from the latest
+    rating period are every player's latest nodes.
+
+    Returns:
+        A dictionary containing player IDs as keys and dictionaries
+        containing the player's ranking, rating, rating deviation,
+        rating volatility, and inactivity as values. Players who haven't
+        been rated are absent.
+    """
+    return load_ratings(models.RatingPeriod.objects.first())
+
+
+def calculate_new_ratings(
+    player_ids, previous_ratings, games, algorithm=RATING_ALGORITHM
+):
+    """Calculate new ratings and rankings for a rating period.
+
+    This does all of its work in memory and doesn't touch the database.
+    See rating_engines.calculate_new_ratings.
+
+    Args:
+        player_ids: A list of IDs of the players to rate. This should
+            be all players who have played a game at or before the end
+            of the rating period.
+        previous_ratings: A dictionary containing player IDs as keys
+            and dictionaries containing the player's previous ranking,
+            rating, rating deviation, rating volatility, and inactivity
+            as values. Players absent from this dictionary are treated
+            as unrated.
+        games: A list of two-tuples containing the winner's and the
+            loser's player IDs for each game in the rating period.
+        algorithm: An optional string specifying the rating algorithm
+            to calculate ratings with. Defaults to the one players are
+            rated with.
+
+    Returns:
+        A dictionary containing player IDs as keys and dictionaries
+        containing the player's new ranking, ranking delta, rating,
+        rating deviation, rating volatility, inactivity, and whether
+        they're active as values.
+    """
+    return rating_engines.calculate_new_ratings(
+        engine=get_rating_engine(algorithm),
+        player_ids=player_ids,
+        previous_ratings=previous_ratings,
+        games=games,
+        periods_missed_to_be_inactive=(
+            settings.NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
+        ),
+    )
+
+
+def calculate_new_ratings_for_algorithms(player_ids, previous_ratings, games):
+    """Calculate new ratings and rankings with every rating algorithm.
+
+    Each rating algorithm in RATING_ALGORITHMS is run over the same
+    games, so that a single pass over a rating period's games updates
+    the ratings of every algorithm.
+
+    Args:
+        player_ids: A list of IDs of the players to rate. See
+            calculate_new_ratings.
+        previous_ratings: A dictionary containing the names of rating
+            algorithms as keys and dictionaries of each player's
+            previous rating parameters as values. See
+            calculate_new_ratings.
+        games: A list of two-tuples containing the winner's and the
+            loser's player IDs for each game in the rating period.
+
+    Returns:
+        A dictionary containing the names of the rating algorithms as
+        keys and dictionaries of each player's new rating parameters,
+        as returned by calculate_new_ratings, as values.
+    """
+    return {
+        algorithm: calculate_new_ratings(
+            player_ids=player_ids,
+            previous_ratings=previous_ratings[algorithm],
+            games=games,
+            algorithm=algorithm,
+        )
+        for algorithm in RATING_ALGORITHMS
+    }
+
+
+def replay_rating_periods(rating_period_datetimes, previous_ratings):
+    """Calculate the ratings of consecutive rating periods.
+
+    Games are streamed from the database once and every rating
+    algorithm in RATING_ALGORITHMS is run over each rating period's
+    games. See rating_engines.replay_rating_periods, which this
+    configures with the rating settings.
+
+    Args:
+        rating_period_datetimes: A list of two-tuples containing the
+            start and end datetimes of each rating period, from oldest
+            to newest.
+        previous_ratings: A dictionary containing the names of rating
+            algorithms as keys and dictionaries of each player's rating
+            parameters before the first rating period as values, as
+            returned by load_ratings_for_algorithms.
+
+    Returns:
+        A generator yielding a three-tuple for each rating period
+        containing its start and end datetimes and its new ratings, as
+        returned by calculate_new_ratings_for_algorithms.
+    """
+    first_games_played = load_first_games_played()
+    player_ids = list(models.Player.objects.values_list("id", flat=True))
+
+    games = (
+        models.Game.objects.filter(
+            datetime_played__gte=rating_period_datetimes[0][0],
+            datetime_played__lte=rating_period_datetimes[-1][1],
+        )
+        .order_by("datetime_played")
+        .values_list("datetime_played", "winner", "loser")
+        .iterator()
+    )
+
+    return rating_engines.replay_rating_periods(
+        rating_period_datetimes=rating_period_datetimes,
+        games=games,
+        player_ids=player_ids,
+        first_games_played=first_games_played,
+        previous_ratings=previous_ratings,
+        engines=[
+            get_rating_engine(algorithm) for algorithm in RATING_ALGORITHMS
+        ],
+        periods_missed_to_be_inactive=(
+            settings.NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
+        ),
+    )
+
+
+def update_player_states(new_ratings):
+    """Copy new ratings into players' current states.
+
+    This also rebuilds the leaderboard index: each active player's
+    position on the leaderboard, ordered by rating, is stored in their
+    state so that slices of the leaderboard can be read straight off
+    an index.
+
+    Args:
+        new_ratings: A dictionary containing player IDs as keys and
+            dictionaries of the player's new rating parameters as
+            values, as returned by calculate_new_ratings.
+    """
+    states = models.PlayerState.objects.in_bulk(list(new_ratings))
+    new_states = []
+
+    # Order active players the same way they're ranked, breaking ties
+    # by name and then ID so positions don't depend on dictionary order
+    active_player_ids = [
+        player_id
+        for player_id, ratings_dict in new_ratings.items()
+        if ratings_dict["is_active"]
+    ]
+    player_names = dict(
+        models.Player.objects.filter(id__in=active_player_ids).values_list(
+            "id", "name"
+        )
+    )
+    leaderboard_player_ids = sorted(
+        active_player_ids,
+        key=lambda player_id: (
+            -new_ratings[player_id]["rating"],
+            player_names[player_id],
+            player_id,
+        ),
+    )
+    leaderboard_positions = {
+        player_id: position
+        for position, player_id in enumerate(leaderboard_player_ids, 1)
+    }
+
+    for player_id, ratings_dict in new_ratings.items():
+        state = states.get(player_id)
+
+        if state is None:
+            state = models.PlayerState(player_id=player_id)
+            new_states.append(state)
+
+        for field in models.PlayerState.RATING_FIELDS:
+            setattr(state, field, ratings_dict[field])
+
+        state.leaderboard_position = leaderboard_positions.get(player_id)
+
+    models.PlayerState.objects.bulk_update(
+        states.values(),
+        models.PlayerState.RATING_FIELDS + ("leaderboard_position",),
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+    models.PlayerState.objects.bulk_create(
+        new_states, batch_size=BULK_CREATE_BATCH_SIZE
+    )
+
+
+def update_provisional_ratings(player_ids=None):
+    """Update players' provisional ratings for the open rating period.
+
+    A player's provisional ratings are the ratings they'd get if the
+    open rating period ended now, calculated from the games played
+    since the latest rating period. These only depend on the player's
+    own games and on their opponents' ratings from the latest rating
+    period, so after a game only its two players need updating, which
+    takes a constant number of queries over just their games this
+    rating period.
+
+    Args:
+        player_ids: An optional list of the IDs of the players to
+            update. If not given, every player who's been rated or who
+            has played in the open rating period is updated.
+    """
+    with transaction.atomic():
+        latest_rating_period = models.RatingPeriod.objects.first()
+        games = models.Game.objects.all()
+
+        if latest_rating_period is not None:
+            games = games.filter(
+                datetime_played__gt=latest_rating_period.end_datetime
             )
-            scores.append(0)
-
-        # Convert empty lists (meaning no matches) to None types
-        if not opponent_ratings:
-            opponent_ratings = None
-            opponent_rating_deviations = None
-            scores = None
-
-        if RATING_ALGORITHM == "glicko":
-            new_player_rating, new_player_rating_deviation, = glicko.calculate_player_rating(
-                r=player_rating,
-                RD=player_rating_deviation,
-                opponent_rs=opponent_ratings,
-                opponent_RDs=opponent_rating_deviations,
-                scores=scores,
+
+        if player_ids is not None:
+            games = games.filter(
+                Q(winner__in=player_ids) | Q(loser__in=player_ids)
             )
 
-            new_player_rating_volatility = None
+        games = list(games.values_list("winner", "loser"))
+        game_player_ids = {player_id for game in games for player_id in game}
+
+        if player_ids is None:
+            previous_ratings = load_ratings(latest_rating_period)
+            player_ids = set(previous_ratings) | game_player_ids
         else:
-            # Glicko-2
-            new_player_rating, new_player_rating_deviation, new_player_rating_volatility = glicko2.calculate_player_rating(
-                r=player_rating,
-                RD=player_rating_deviation,
-                sigma=player_rating_volatility,
-                opponent_rs=opponent_ratings,
-                opponent_RDs=opponent_rating_deviations,
-                scores=scores,
+            player_ids = set(player_ids)
+            previous_ratings = load_ratings(
+                latest_rating_period, player_ids | game_player_ids
             )
 
-        # Calculate new inactivity
-        if opponent_ratings is None:
-            new_player_inactivity = player_inactivity + 1
-        else:
-            new_player_inactivity = 0
-
-        # Determine if the player is labelled as active
-        new_player_is_active = bool(
-            new_player_inactivity
-            < settings.NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE
-        )
-
-        new_ratings[player] = {
-            "player_ranking": None,
-            "player_ranking_delta": None,
-            "player_rating": new_player_rating,
-            "player_rating_deviation": new_player_rating_deviation,
-            "player_rating_volatility": new_player_rating_volatility,
-            "player_inactivity": new_player_inactivity,
-            "player_is_active": new_player_is_active,
-        }
-
-    # Filter all active players and sort by rating
-    new_active_player_ratings = [
-        (player, new_rating["player_rating"])
-        for player, new_rating in new_ratings.items()
-        if new_rating["player_is_active"]
-    ]
-    new_active_player_ratings.sort(key=lambda x: x[1], reverse=True)
+        # Opponents are rated along with the players being updated, but
+        # only with some of their games, so only the players being
+        # updated are saved
+        new_ratings = calculate_new_ratings(
+            player_ids=sorted(player_ids | game_player_ids),
+            previous_ratings=previous_ratings,
+            games=games,
+        )
+
+        states = models.PlayerState.objects.in_bulk(list(player_ids))
+        new_states = []
+
+        for player_id in player_ids:
+            state = states.get(player_id)
+
+            if state is None:
+                state = models.PlayerState(player_id=player_id)
+                new_states.append(state)
+
+            # Players who haven't played any games aren't rated
+            ratings_dict = new_ratings[player_id]
+
+            if (
+                player_id not in previous_ratings
+                and player_id not in game_player_ids
+            ):
+                ratings_dict = dict.fromkeys(ratings_dict)
+
+            state.provisional_rating = ratings_dict["rating"]
+            state.provisional_rating_deviation = ratings_dict[
+                "rating_deviation"
+            ]
+            state.provisional_rating_volatility = ratings_dict[
+                "rating_volatility"
+            ]
+
+        models.PlayerState.objects.bulk_update(
+            states.values(),
+            models.PlayerState.PROVISIONAL_RATING_FIELDS,
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        models.PlayerState.objects.bulk_create(
+            new_states, batch_size=BULK_CREATE_BATCH_SIZE
+        )
+
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
+
+
+def create_rating_period(start_datetime, end_datetime, new_ratings):
+    """Create a rating period and its rating nodes.
+
+    Games are assigned to the rating period with a single UPDATE,
+    rating nodes for every rating algorithm are inserted in bulk, and
+    players' current states are updated in bulk with the ratings of the
+    algorithm players are rated with. Everything happens in a single
+    transaction, so a failure part way through doesn't leave a
+    partially written rating period behind.
+
+    Args:
+        start_datetime: The datetime for the start of the rating period.
+        end_datetime: The datetime for the end of the rating period.
+        new_ratings: A dictionary containing the names of rating
+            algorithms as keys and dictionaries of each player's new
+            rating parameters as values, as returned by
+            calculate_new_ratings_for_algorithms.
+
+    Returns:
+        The new RatingPeriod model instance.
+    """
+    with transaction.atomic():
+        # Create the rating period
+        rating_period = models.RatingPeriod.objects.create(
+            start_datetime=start_datetime, end_datetime=end_datetime
+        )
+
+        # Mark all games in the rating period as belonging to it
+        models.Game.objects.filter(
+            datetime_played__gte=start_datetime,
+            datetime_played__lte=end_datetime,
+        ).update(rating_period=rating_period)
 
-    # Process new rankings and ranking changes
-    num_active_players = len(new_active_player_ratings)
+        # Now save all ratings
+        models.PlayerRatingNode.objects.bulk_create(
+            [
+                models.PlayerRatingNode(
+                    player_id=player_id,
+                    rating_period=rating_period,
+                    algorithm=algorithm,
+                    **ratings_dict,
+                )
+                for algorithm, algorithm_ratings in new_ratings.items()
+                for player_id, ratings_dict in algorithm_ratings.items()
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+
+        # Update each rated player's current ratings
+        update_player_states(new_ratings[RATING_ALGORITHM])
+
+        # Invalidate cached predictions and API responses once this is
+        # committed. Rating period IDs can be reused after all ratings
+        # are reprocessed, so stale predictions may exist.
+        transaction.on_commit(
+            partial(predictions.delete_predictions, rating_period.id)
+        )
+        transaction.on_commit(cache.bump_data_version)
+
+    return rating_period
+
+
+def calculate_new_rating_period(start_datetime, end_datetime):
+    """Calculate a new ratings and a corresponding new rating period.
+
+    This loads everything it needs up front with a constant number of
+    queries, calculates the new ratings in memory, then writes the
+    results with bulk queries, all in a single transaction.
+
+    Args:
+        start_datetime: The datetime for the start of the rating period.
+        end_datetime: The datetime for the end of the rating period.
+    """
+    with transaction.atomic():
+        # Load the previous ratings and the datetimes of each player's
+        # first game
+        previous_ratings = load_ratings_for_algorithms(
+            models.RatingPeriod.objects.first()
+        )
+        first_games_played = load_first_games_played()
+
+        # Grab all games that will be in this rating period
+        games = models.Game.objects.filter(
+            datetime_played__gte=start_datetime,
+            datetime_played__lte=end_datetime,
+        )
 
-    # Keep track of the previous player's integer rating for ranking
-    # ties
-    last_integer_rating = None
-    last_ranking = None
+        # Calculate the new ratings
+        new_ratings = calculate_new_ratings_for_algorithms(
+            player_ids=rating_engines.get_rated_player_ids(
+                player_ids=models.Player.objects.values_list("id", flat=True),
+                first_games_played=first_games_played,
+                end_datetime=end_datetime,
+            ),
+            previous_ratings=previous_ratings,
+            games=list(games.values_list("winner", "loser")),
+        )
+
+        # Save the new rating period
+        create_rating_period(start_datetime, end_datetime, new_ratings)
+
+        # Provisional ratings now build on the new rating period
+        update_provisional_ratings()
 
-    for idx, player_tuple in enumerate(new_active_player_ratings, 1):
-        # Unpack the player tuple
-        player, rating = player_tuple
+        # Predictions do too
+        transaction.on_commit(predictions.cache_latest_predictions)
 
-        integer_rating = round(rating)
 
-        if (
-            last_integer_rating is not None
-            and last_integer_rating == integer_rating
+def update_rating_period(rating_period, new_ratings):
+    """Update an existing rating period's rating nodes in place.
+
+    Only the nodes of players whose ratings changed are written. Games
+    are reassigned to the rating period too, since games may have
+    moved in or out of it.
+
+    Args:
+        rating_period: The RatingPeriod model instance to update.
+        new_ratings: A dictionary containing the names of rating
+            algorithms as keys and dictionaries of each player's new
+            rating parameters as values, as returned by
+            calculate_new_ratings_for_algorithms. Nodes of other rating
+            algorithms are left alone.
+
+    Returns:
+        The number of rating nodes which changed.
+    """
+    models.Game.objects.filter(
+        datetime_played__gte=rating_period.start_datetime,
+        datetime_played__lte=rating_period.end_datetime,
+    ).exclude(rating_period=rating_period).update(rating_period=rating_period)
+
+    nodes = {
+        (node.algorithm, node.player_id): node
+        for node in models.PlayerRatingNode.objects.filter(
+            rating_period=rating_period, algorithm__in=list(new_ratings)
+        )
+    }
+    changed_nodes = []
+    new_nodes = []
+
+    for algorithm, algorithm_ratings in new_ratings.items():
+        for player_id, ratings_dict in algorithm_ratings.items():
+            node = nodes.pop((algorithm, player_id), None)
+
+            if node is None:
+                new_nodes.append(
+                    models.PlayerRatingNode(
+                        player_id=player_id,
+                        rating_period=rating_period,
+                        algorithm=algorithm,
+                        **ratings_dict,
+                    )
+                )
+            elif any(
+                getattr(node, field) != value
+                for field, value in ratings_dict.items()
+            ):
+                for field, value in ratings_dict.items():
+                    setattr(node, field, value)
+
+                changed_nodes.append(node)
+
+    models.PlayerRatingNode.objects.bulk_update(
+        changed_nodes,
+        models.PlayerState.RATING_FIELDS,
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+    models.PlayerRatingNode.objects.bulk_create(
+        new_nodes, batch_size=BULK_CREATE_BATCH_SIZE
+    )
+
+    # Players who are no longer rated in this rating period
+    models.PlayerRatingNode.objects.filter(
+        id__in=[node.id for node in nodes.values()]
+    ).delete()
+
+    if changed_nodes or new_nodes or nodes:
+        transaction.on_commit(
+            partial(predictions.delete_predictions, rating_period.id)
+        )
+
+    return len(changed_nodes) + len(new_nodes) + len(nodes)
+
+
+def recompute_ratings(from_rating_period, until_datetime=None):
+    """Recompute existing rating periods from a rating period on.
+
+    Ratings are restored from the rating period before the given one,
+    then each rating period from the given one on is recalculated and
+    its rating nodes are updated in place. This makes correcting games
+    cost only the rating periods from the correction on, rather than a
+    full reprocess_all_ratings.
+
+    Args:
+        from_rating_period: The RatingPeriod model instance of the
+            first rating period to recompute.
+        until_datetime: An optional datetime after which games are
+            known not to have changed. Once a rating period ending
+            after it is recomputed without any changes, later rating
+            periods are left alone, since they'd come out the same.
+
+    Returns:
+        The number of rating periods recomputed.
+    """
+    rating_periods = list(
+        models.RatingPeriod.objects.filter(
+            end_datetime__gte=from_rating_period.end_datetime
+        ).order_by("end_datetime")
+    )
+    num_rating_periods = 0
+
+    with transaction.atomic():
+        previous_ratings = load_ratings_for_algorithms(
+            models.RatingPeriod.objects.filter(
+                end_datetime__lt=from_rating_period.end_datetime
+            ).first()
+        )
+        replayed_rating_periods = replay_rating_periods(
+            [
+                (rating_period.start_datetime, rating_period.end_datetime)
+                for rating_period in rating_periods
+            ],
+            previous_ratings,
+        )
+
+        for rating_period, (_, _, new_ratings) in zip(
+            rating_periods, replayed_rating_periods
         ):
-            # Tie
-            ranking = last_ranking
+            num_changed = update_rating_period(rating_period, new_ratings)
+            num_rating_periods += 1
+
+            if (
+                until_datetime is not None
+                and num_changed == 0
+                and rating_period.end_datetime > until_datetime
+            ):
+                break
         else:
-            last_integer_rating = integer_rating
-            last_ranking = idx
-            ranking = idx
+            # Games played after the latest rating period are unrated
+            models.Game.objects.filter(
+                datetime_played__gt=rating_periods[-1].end_datetime
+            ).update(rating_period=None)
 
-        # Ranking
-        new_ratings[player]["player_ranking"] = ranking
+            # Update each rated player's current ratings
+            update_player_states(new_ratings[RATING_ALGORITHM])
 
-        # Ranking delta
-        if player.ranking is None:
-            new_ratings[player]["player_ranking_delta"] = (
-                num_active_players - ranking + 1
-            )
-        else:
-            new_ratings[player]["player_ranking_delta"] = (
-                player.ranking - ranking
-            )
+            # Provisional ratings and predictions build on the latest
+            # rating period
+            update_provisional_ratings()
+            transaction.on_commit(predictions.cache_latest_predictions)
 
-    # Now save all ratings
-    for player, ratings_dict in new_ratings.items():
-        models.PlayerRatingNode.objects.create(
-            player=player,
-            rating_period=rating_period,
-            ranking=ratings_dict["player_ranking"],
-            ranking_delta=ratings_dict["player_ranking_delta"],
-            rating=ratings_dict["player_rating"],
-            rating_deviation=ratings_dict["player_rating_deviation"],
-            rating_volatility=ratings_dict["player_rating_volatility"],
-            inactivity=ratings_dict["player_inactivity"],
-            is_active=ratings_dict["player_is_active"],
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
+
+    return num_rating_periods
+
+
+def recompute_ratings_after_change(from_datetime, until_datetime):
+    """Recompute rating periods affected by changed games.
+
+    Args:
+        from_datetime: The earliest datetime played of any changed game.
+        until_datetime: The latest datetime played of any changed game.
+    """
+    rating_period = (
+        models.RatingPeriod.objects.filter(end_datetime__gte=from_datetime)
+        .order_by("end_datetime")
+        .first()
+    )
+
+    # Games played after the latest rating period don't affect any
+    # ratings yet
+    if rating_period is not None:
+        recompute_ratings(rating_period, until_datetime=until_datetime)
+
+
+def refresh_player_states():
+    """Copy the latest ratings of the served algorithm into states.
+
+    Ratings are calculated and stored for every rating algorithm in
+    RATING_ALGORITHMS, so after RATING_ALGORITHM is switched to another
+    one of them, this is all that's needed to start serving its
+    ratings: players' current and provisional ratings are reloaded
+    from its rating nodes, without reprocessing any rating periods.
+
+    Returns:
+        False if there are rating periods but none of them have ratings
+        from the served algorithm, in which case nothing is changed,
+        otherwise True.
+    """
+    latest_rating_period = models.RatingPeriod.objects.first()
+    nodes = models.PlayerRatingNode.objects.filter(
+        rating_period=latest_rating_period, algorithm=RATING_ALGORITHM
+    ).values("player", *models.PlayerState.RATING_FIELDS)
+
+    if latest_rating_period is not None and not nodes:
+        return False
+
+    with transaction.atomic():
+        # Players without ratings from the served algorithm are reset
+        models.PlayerState.objects.update(
+            leaderboard_position=None,
+            **{
+                field: getattr(models.PlayerState(), field)
+                for field in models.PlayerState.RATING_FIELDS
+            },
         )
+        update_player_states({node.pop("player"): node for node in nodes})
+        update_provisional_ratings()
+        transaction.on_commit(predictions.cache_latest_predictions)
+
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
+
+    return True
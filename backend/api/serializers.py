@@ -56,7 +56,10 @@ class PlayerSerializer(serializers.ModelSerializer):
             "ranking_delta",
             "rating",
             "rating_deviation",
+            "provisional_rating",
+            "provisional_rating_deviation",
             "inactivity",
+            "elo_rating",
             "games",
             "wins",
             "losses",
@@ -71,7 +74,10 @@ class PlayerSerializer(serializers.ModelSerializer):
             "ranking_delta",
             "rating",
             "rating_deviation",
+            "provisional_rating",
+            "provisional_rating_deviation",
             "inactivity",
+            "elo_rating",
             "games",
             "wins",
             "losses",
@@ -82,9 +88,19 @@ class PlayerSerializer(serializers.ModelSerializer):
 
         # Only show rating volatility if rating algorithm is Glicko-2
         if settings.RATING_ALGORITHM == "glicko2":
-            fields = fields[:8] + ("rating_volatility",) + fields[8:]
+            fields = (
+                fields[:8]
+                + ("rating_volatility",)
+                + fields[8:10]
+                + ("provisional_rating_volatility",)
+                + fields[10:]
+            )
             read_only_fields = (
-                fields[:6] + ("rating_volatility",) + read_only_fields[6:]
+                read_only_fields[:6]
+                + ("rating_volatility",)
+                + read_only_fields[6:8]
+                + ("provisional_rating_volatility",)
+                + read_only_fields[8:]
             )
 
 
@@ -172,6 +188,7 @@ class PlayerRatingNodeSerializer(serializers.ModelSerializer):
             "id",
             "player",
             "rating_period",
+            "algorithm",
             "ranking",
             "ranking_delta",
             "rating",
@@ -181,7 +198,72 @@ class PlayerRatingNodeSerializer(serializers.ModelSerializer):
 
         # Only show rating volatility if rating algorithm is Glicko-2
         if settings.RATING_ALGORITHM == "glicko2":
-            fields = fields[:7] + ("rating_volatility",) + fields[7:]
+            fields = fields[:8] + ("rating_volatility",) + fields[8:]
+
+
+class PreloadedRelatedFieldMixin:
+    """Look up related objects preloaded by a parent list serializer.
+
+    Objects which weren't preloaded are queried for as usual.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            return self.parent.parent.preloaded_objects[self.field_name][
+                str(data)
+            ]
+        except (AttributeError, KeyError):
+            return super().to_internal_value(data)
+
+
+class PreloadedPrimaryKeyRelatedField(
+    PreloadedRelatedFieldMixin, serializers.PrimaryKeyRelatedField
+):
+    """A primary key related field which can use preloaded objects."""
+
+
+class PreloadedSlugRelatedField(
+    PreloadedRelatedFieldMixin, serializers.SlugRelatedField
+):
+    """A slug related field which can use preloaded objects."""
+
+
+class GameListSerializer(serializers.ListSerializer):
+    """A serializer for a list of games.
+
+    The players and users the games refer to are loaded in bulk before
+    validating the games, so validating a list of games takes a
+    constant number of queries.
+    """
+
+    def to_internal_value(self, data):
+        """Preload related objects, then validate each game."""
+        if isinstance(data, list):
+            items = [item for item in data if isinstance(item, dict)]
+
+            player_ids = {
+                str(item.get(field))
+                for item in items
+                for field in ("winner", "loser")
+                if str(item.get(field)).isdigit()
+            }
+            usernames = {
+                str(item["submitted_by"])
+                for item in items
+                if "submitted_by" in item
+            }
+
+            players = {
+                str(pk): player
+                for pk, player in Player.objects.in_bulk(player_ids).items()
+            }
+            users = User.objects.in_bulk(usernames, field_name="username")
+
+            self.preloaded_objects = dict(
+                winner=players, loser=players, submitted_by=users
+            )
+
+        return super().to_internal_value(data)
 
 
 class GameSerializer(serializers.ModelSerializer):
@@ -191,14 +273,21 @@ class GameSerializer(serializers.ModelSerializer):
     field for post methods.
     """
 
+    winner = PreloadedPrimaryKeyRelatedField(
+        queryset=Player.objects.all(), help_text="The game's winner."
+    )
+    loser = PreloadedPrimaryKeyRelatedField(
+        queryset=Player.objects.all(), help_text="The game's loser."
+    )
     winner_score = serializers.IntegerField(min_value=0, initial=8)
     loser_score = serializers.IntegerField(min_value=0, initial=0)
-    submitted_by = serializers.SlugRelatedField(
+    submitted_by = PreloadedSlugRelatedField(
         queryset=User.objects.all(), slug_field="username"
     )
 
     class Meta:
         model = Game
+        list_serializer_class = GameListSerializer
         fields = (
             "id",
             "datetime_played",
@@ -1,7 +1,14 @@
 """Contains functions for calculating player and matchup statistics."""
 
+from functools import partial
+from django.db import transaction
+from django.db.models import Max, Q
+from . import cache
 from . import models
 
+# How many rows to insert per query when bulk creating stats nodes
+BULK_CREATE_BATCH_SIZE = 1000
+
 
 def calculate_new_average(avg, N, new_val):
     """Calculate new average given a new value and an existing average.
@@ -84,7 +91,7 @@ def calculate_new_common_stats(
 
 
 def create_player_stats_node(player, game, previous_node=None):
-    """Create a stats node for a player.
+    """Create a stats node for a player and update their current stats.
 
     Args:
         player: An instance of the Player model corresponding to the
@@ -118,7 +125,7 @@ def create_player_stats_node(player, game, previous_node=None):
         opponent_score = game.winner_score
 
     # Create the node
-    models.PlayerStatsNode.objects.create(
+    node = models.PlayerStatsNode.objects.create(
         player=player,
         game=game,
         **calculate_new_common_stats(
@@ -133,6 +140,11 @@ def create_player_stats_node(player, game, previous_node=None):
         ),
     )
 
+    # Update the player's current stats
+    state = player.get_state()
+    state.set_stats(node)
+    state.save(update_fields=models.PlayerState.STATS_FIELDS)
+
 
 def create_matchup_stats_node(player1, player2, game, previous_node=None):
     """Create a stats node for a player.
@@ -187,3 +199,426 @@ def create_matchup_stats_node(player1, player2, game, previous_node=None):
             opponent_score=opponent_score,
         ),
     )
+
+
+def get_empty_stats():
+    """Returns the common stats of a player or matchup without games.
+
+    Returns:
+        A dictionary containing the number of games, wins, losses,
+        average goals per game, average goals against per game, and win
+        rate, all zero.
+    """
+    return dict(
+        games=0,
+        wins=0,
+        losses=0,
+        average_goals_per_game=0,
+        average_goals_against_per_game=0,
+        win_rate=0,
+    )
+
+
+def load_latest_player_stats(player_ids):
+    """Load players' latest stats from their current states.
+
+    This takes a single query.
+
+    Args:
+        player_ids: A list of IDs of the players to load stats for.
+
+    Returns:
+        A dictionary containing player IDs as keys and dictionaries of
+        each player's latest common stats as values.
+    """
+    states = models.PlayerState.objects.filter(player__in=player_ids).values(
+        "player", *models.PlayerState.STATS_FIELDS
+    )
+
+    return {state.pop("player"): state for state in states}
+
+
+def load_latest_matchup_stats(player_ids):
+    """Load the latest stats of every matchup between some players.
+
+    This takes a single query.
+
+    Args:
+        player_ids: A list of IDs of the players to load matchup stats
+            for.
+
+    Returns:
+        A dictionary containing two-tuples of player IDs—with the
+        player whose perspective is taken first—as keys and dictionaries
+        of the matchup's latest common stats as values. Matchups which
+        haven't been played are absent.
+    """
+    # Clear the default ordering, otherwise it ends up in the GROUP BY
+    # clause
+    latest_node_ids = (
+        models.MatchupStatsNode.objects.order_by()
+        .filter(player1__in=player_ids, player2__in=player_ids)
+        .values("player1", "player2")
+        .annotate(latest_id=Max("id"))
+        .values("latest_id")
+    )
+    nodes = models.MatchupStatsNode.objects.filter(
+        id__in=latest_node_ids
+    ).values("player1", "player2", *models.PlayerState.STATS_FIELDS)
+
+    return {(node.pop("player1"), node.pop("player2")): node for node in nodes}
+
+
+def calculate_next_stats(old_stats, game, player_id):
+    """Calculate a player's or matchup's common stats after a game.
+
+    Args:
+        old_stats: A dictionary of the common stats before the game, or
+            None if no games have been played before it.
+        game: The game to adjust stats from. It needs winner_id,
+            winner_score, and loser_score attributes.
+        player_id: The ID of the player whose perspective to take.
+
+    Returns:
+        A dictionary containing the new common stats.
+    """
+    if old_stats is None:
+        old_stats = get_empty_stats()
+
+    if game.winner_id == player_id:
+        player_score = game.winner_score
+        opponent_score = game.loser_score
+    else:
+        player_score = game.loser_score
+        opponent_score = game.winner_score
+
+    return calculate_new_common_stats(
+        old_games=old_stats["games"],
+        old_wins=old_stats["wins"],
+        old_losses=old_stats["losses"],
+        old_average_goals_per_game=old_stats["average_goals_per_game"],
+        old_average_goals_against_per_game=old_stats[
+            "average_goals_against_per_game"
+        ],
+        player_is_winner=game.winner_id == player_id,
+        player_score=player_score,
+        opponent_score=opponent_score,
+    )
+
+
+def generate_stats_nodes(games, player_stats, matchup_stats, elo_ratings=None):
+    """Generate the stats nodes for a sequence of games in memory.
+
+    Nodes are generated in the same order Game.process_game creates
+    them: the winner's player stats node, the loser's player stats
+    node, the winner's matchup stats node, then the loser's matchup
+    stats node.
+
+    Args:
+        games: An iterable of games, in the order they were played.
+            Each game needs id, winner_id, loser_id, winner_score, and
+            loser_score attributes.
+        player_stats: A dictionary containing player IDs as keys and
+            dictionaries of each player's latest common stats as
+            values. Players absent from this dictionary are treated as
+            not having played any games. This is updated in place.
+        matchup_stats: A dictionary like player_stats, but keyed by
+            two-tuples of player IDs—with the player whose perspective
+            is taken first—for each matchup. This is updated in place.
+        elo_ratings: An optional dictionary containing player IDs as
+            keys and each player's Elo rating as values, kept up to
+            date with the games as they're generated (see
+            elo.track_elo_ratings). If this is provided, player stats
+            nodes record their player's Elo rating.
+
+    Yields:
+        Unsaved PlayerStatsNode and MatchupStatsNode model instances.
+    """
+    for game in games:
+        matchup_nodes = []
+
+        for player_id, opponent_id in (
+            (game.winner_id, game.loser_id),
+            (game.loser_id, game.winner_id),
+        ):
+            player_stats[player_id] = calculate_next_stats(
+                player_stats.get(player_id), game, player_id
+            )
+            matchup_stats[(player_id, opponent_id)] = calculate_next_stats(
+                matchup_stats.get((player_id, opponent_id)), game, player_id
+            )
+
+            player_stats_node = models.PlayerStatsNode(
+                player_id=player_id, game_id=game.id, **player_stats[player_id]
+            )
+
+            if elo_ratings is not None:
+                player_stats_node.elo_rating = elo_ratings[player_id]
+
+            yield player_stats_node
+            matchup_nodes.append(
+                models.MatchupStatsNode(
+                    player1_id=player_id,
+                    player2_id=opponent_id,
+                    game_id=game.id,
+                    **matchup_stats[(player_id, opponent_id)],
+                )
+            )
+
+        yield from matchup_nodes
+
+
+def bulk_create_stats_nodes(nodes):
+    """Save stats nodes with chunked bulk inserts.
+
+    Args:
+        nodes: An iterable of unsaved PlayerStatsNode and
+            MatchupStatsNode model instances, as generated by
+            generate_stats_nodes.
+    """
+    player_stats_nodes = []
+    matchup_stats_nodes = []
+
+    for node in nodes:
+        if isinstance(node, models.PlayerStatsNode):
+            player_stats_nodes.append(node)
+        else:
+            matchup_stats_nodes.append(node)
+
+        # Insert in chunks so memory use doesn't grow with the number
+        # of games
+        if len(player_stats_nodes) >= BULK_CREATE_BATCH_SIZE:
+            models.PlayerStatsNode.objects.bulk_create(player_stats_nodes)
+            player_stats_nodes = []
+
+        if len(matchup_stats_nodes) >= BULK_CREATE_BATCH_SIZE:
+            models.MatchupStatsNode.objects.bulk_create(matchup_stats_nodes)
+            matchup_stats_nodes = []
+
+    models.PlayerStatsNode.objects.bulk_create(player_stats_nodes)
+    models.MatchupStatsNode.objects.bulk_create(matchup_stats_nodes)
+
+
+def create_stats_nodes(games, player_stats, matchup_stats, elo_ratings=None):
+    """Create the stats nodes for a sequence of games with bulk inserts.
+
+    Args:
+        games: An iterable of games, in the order they were played, as
+            accepted by generate_stats_nodes.
+        player_stats: A dictionary of each player's latest common stats,
+            as accepted by generate_stats_nodes. This is updated in
+            place.
+        matchup_stats: A dictionary of each matchup's latest common
+            stats, as accepted by generate_stats_nodes. This is updated
+            in place.
+        elo_ratings: An optional dictionary of players' Elo ratings,
+            as accepted by generate_stats_nodes.
+    """
+    bulk_create_stats_nodes(
+        generate_stats_nodes(games, player_stats, matchup_stats, elo_ratings)
+    )
+
+
+def update_player_states(player_stats):
+    """Copy players' latest stats into their current states.
+
+    Args:
+        player_stats: A dictionary containing player IDs as keys and
+            dictionaries of each player's latest common stats as values.
+    """
+    states = models.PlayerState.objects.in_bulk(list(player_stats))
+    new_states = []
+
+    for player_id, stats in player_stats.items():
+        state = states.get(player_id)
+
+        if state is None:
+            state = models.PlayerState(player_id=player_id)
+            new_states.append(state)
+
+        for field in models.PlayerState.STATS_FIELDS:
+            setattr(state, field, stats[field])
+
+    models.PlayerState.objects.bulk_update(
+        states.values(),
+        models.PlayerState.STATS_FIELDS,
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+    models.PlayerState.objects.bulk_create(
+        new_states, batch_size=BULK_CREATE_BATCH_SIZE
+    )
+
+
+def process_new_games(games):
+    """Update player and matchup stats for a batch of new games.
+
+    This is the batched equivalent of calling Game.process_game for
+    each game: every stats node is calculated in memory and inserted in
+    bulk, so it takes a constant number of queries regardless of how
+    many games there are. The games must be more recent than every
+    other game their players have played.
+
+    Args:
+        games: A list of saved Game model instances, in the order they
+            were played.
+    """
+    player_ids = {game.winner_id for game in games} | {
+        game.loser_id for game in games
+    }
+
+    with transaction.atomic():
+        player_stats = load_latest_player_stats(player_ids)
+        matchup_stats = load_latest_matchup_stats(player_ids)
+
+        create_stats_nodes(games, player_stats, matchup_stats)
+        update_player_states(player_stats)
+
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
+
+
+def repair_stats_history(nodes, games, player_id, create_node, from_datetime):
+    """Recalculate a player's or matchup's stats nodes from a datetime on.
+
+    Stats nodes are in the order their games were played up until the
+    first game played at or after the given datetime. From there on,
+    the existing nodes are reassigned to the games in the order they
+    were played, in place, with their stats recalculated; nodes are
+    created or deleted at the end as needed. This only touches the
+    games and nodes from the datetime on.
+
+    Args:
+        nodes: A QuerySet of all of the player's or matchup's stats
+            nodes.
+        games: A QuerySet of all of the player's or matchup's games.
+        player_id: The ID of the player whose perspective to take.
+        create_node: A function which returns a new, unsaved stats node
+            given its game ID and common stats as keyword arguments.
+        from_datetime: The datetime to recalculate stats from.
+
+    Returns:
+        A dictionary containing the latest common stats, or None if
+        there are no games.
+    """
+    previous_node = (
+        nodes.filter(game__datetime_played__lt=from_datetime)
+        .order_by("-id")
+        .first()
+    )
+
+    if previous_node is None:
+        latest_stats = None
+    else:
+        latest_stats = {
+            field: getattr(previous_node, field)
+            for field in models.PlayerState.STATS_FIELDS
+        }
+        nodes = nodes.filter(id__gt=previous_node.id)
+
+    old_nodes = list(nodes.order_by("id"))
+    games = (
+        games.filter(datetime_played__gte=from_datetime)
+        .order_by("datetime_played", "id")
+        .values_list(
+            "id",
+            "winner_id",
+            "loser_id",
+            "winner_score",
+            "loser_score",
+            named=True,
+        )
+    )
+
+    updated_nodes = []
+    new_nodes = []
+
+    for idx, game in enumerate(games):
+        latest_stats = calculate_next_stats(latest_stats, game, player_id)
+
+        if idx < len(old_nodes):
+            node = old_nodes[idx]
+            node.game_id = game.id
+
+            for field, value in latest_stats.items():
+                setattr(node, field, value)
+
+            updated_nodes.append(node)
+        else:
+            new_nodes.append(create_node(game_id=game.id, **latest_stats))
+
+    nodes.model.objects.bulk_update(
+        updated_nodes,
+        ("game",) + models.PlayerState.STATS_FIELDS,
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+    nodes.model.objects.bulk_create(
+        new_nodes, batch_size=BULK_CREATE_BATCH_SIZE
+    )
+    nodes.model.objects.filter(
+        id__in=[node.id for node in old_nodes[len(updated_nodes) :]]
+    ).delete()
+
+    return latest_stats
+
+
+def repair_stats(matchups, from_datetime):
+    """Repair stats after games are backdated, edited, or deleted.
+
+    Only the stats nodes of the given matchups and their players from
+    the datetime on are recalculated, so this costs as much as the
+    number of games they've played since, rather than a full
+    reprocess_all_stats.
+
+    Args:
+        matchups: An iterable of two-tuples of player IDs for each
+            matchup whose games changed.
+        from_datetime: The earliest datetime played of any changed game.
+    """
+    matchups = {
+        (player1_id, player2_id)
+        for player_id, opponent_id in matchups
+        for player1_id, player2_id in (
+            (player_id, opponent_id),
+            (opponent_id, player_id),
+        )
+    }
+    player_ids = {player_id for player_id, _ in matchups}
+    player_stats = {}
+
+    with transaction.atomic():
+        for player_id in player_ids:
+            latest_stats = repair_stats_history(
+                nodes=models.PlayerStatsNode.objects.filter(player=player_id),
+                games=models.Game.objects.filter(
+                    Q(winner=player_id) | Q(loser=player_id)
+                ),
+                player_id=player_id,
+                create_node=partial(
+                    models.PlayerStatsNode, player_id=player_id
+                ),
+                from_datetime=from_datetime,
+            )
+            player_stats[player_id] = latest_stats or get_empty_stats()
+
+        for player1_id, player2_id in matchups:
+            repair_stats_history(
+                nodes=models.MatchupStatsNode.objects.filter(
+                    player1=player1_id, player2=player2_id
+                ),
+                games=models.Game.objects.filter(
+                    Q(winner=player1_id, loser=player2_id)
+                    | Q(winner=player2_id, loser=player1_id)
+                ),
+                player_id=player1_id,
+                create_node=partial(
+                    models.MatchupStatsNode,
+                    player1_id=player1_id,
+                    player2_id=player2_id,
+                ),
+                from_datetime=from_datetime,
+            )
+
+        update_player_states(player_stats)
+
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
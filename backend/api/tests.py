@@ -0,0 +1,1141 @@
+"""Tests for the API."""
+
+import csv
+from datetime import timedelta
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import types
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+import numpy as np
+from . import cache
+from . import glicko
+from . import glicko2
+from . import predictions
+from . import rating_engines
+from . import tuning
+from .models import (
+    Game,
+    MatchupStatsNode,
+    Player,
+    PlayerRatingNode,
+    PlayerState,
+    PlayerStatsNode,
+    RatingPeriod,
+    User,
+)
+from .ratings import (
+    get_base_ratings,
+    update_player_states,
+    update_provisional_ratings,
+)
+from .util import (
+    process_new_ratings,
+    reprocess_all_ratings,
+    reprocess_all_stats,
+)
+
+# The ratings, rating deviations, and rating volatilities of players in
+# a rating period
+PLAYER_RATINGS = (
+    (1500, 350, 0.06),
+    (1720, 80, 0.05),
+    (1380, 150, 0.09),
+    (1610, 200, 0.06),
+    (1450, 60, 0.04),
+    (1550, 120, 0.07),
+)
+
+# The games played in the rating period, as two-tuples containing the
+# indices of the winner and the loser. The last player doesn't play.
+GAMES = ((0, 1), (1, 2), (1, 3), (3, 0), (2, 4), (4, 1), (1, 0), (0, 2))
+
+
+# Tests get their own in-memory cache, rather than writing to the
+# deployment's cache
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IsolatedCacheTestCase(TestCase):
+    """A test case which starts each test with an empty cache."""
+
+    def setUp(self):
+        """Clear the cache."""
+        django_cache.clear()
+
+
+def get_game_perspectives(games):
+    """Returns the players, opponents, and scores of games.
+
+    Each game is taken from the perspective of both of its players, as
+    the batch rating calculations expect.
+    """
+    perspectives = []
+
+    for winner, loser in games:
+        perspectives += [(winner, loser, 1), (loser, winner, 0)]
+
+    return tuple(zip(*perspectives))
+
+
+def get_opponent_ratings(player, rs, RDs, games):
+    """Returns the opponent_* and scores arguments for a player.
+
+    These are the arguments the single player rating calculations
+    expect, and are None if the player didn't play.
+    """
+    players, opponents, scores = get_game_perspectives(games)
+    own_games = [
+        idx for idx, player_ in enumerate(players) if player_ == player
+    ]
+
+    if not own_games:
+        return dict(opponent_rs=None, opponent_RDs=None, scores=None)
+
+    return dict(
+        opponent_rs=[rs[opponents[idx]] for idx in own_games],
+        opponent_RDs=[RDs[opponents[idx]] for idx in own_games],
+        scores=[scores[idx] for idx in own_games],
+    )
+
+
+class LatestRatingNodeTests(IsolatedCacheTestCase):
+    """Tests for finding players' latest rating nodes."""
+
+    def setUp(self):
+        """Rate some games, then add a game to an old rating period."""
+        super().setUp()
+
+        self.user = User.objects.create(username="user")
+        self.players = [
+            Player.objects.create(name=name) for name in ("a", "b", "c")
+        ]
+        a, b, c = self.players
+
+        now = timezone.now()
+
+        self.create_game(a, b, now - timedelta(days=50))
+        self.create_game(b, a, now - timedelta(days=40))
+        self.create_game(c, a, now - timedelta(days=20))
+        process_new_ratings()
+
+        # Player c's first game is now in an older rating period, so
+        # their nodes for it are created after their latest node
+        self.create_game(c, b, now - timedelta(days=55))
+
+    def create_game(self, winner, loser, datetime_played):
+        """Create a game between two players."""
+        return Game.objects.create(
+            winner=winner,
+            loser=loser,
+            winner_score=8,
+            loser_score=5,
+            datetime_played=datetime_played,
+            submitted_by=self.user,
+        )
+
+    def test_backdated_game(self):
+        """Latest nodes come from the latest rating period."""
+        latest_rating_period = RatingPeriod.objects.first()
+        c = self.players[2]
+
+        # Make sure the game actually created nodes out of order
+        self.assertNotEqual(
+            c.get_all_player_rating_nodes().first().rating_period,
+            latest_rating_period,
+        )
+
+        for player in self.players:
+            node = player.get_latest_player_rating_node()
+            annotated_player = Player.objects.with_current_values().get(
+                pk=player.pk
+            )
+
+            self.assertEqual(node.rating_period, latest_rating_period)
+            self.assertEqual(annotated_player.current_rating, node.rating)
+            self.assertEqual(annotated_player.current_ranking, node.ranking)
+
+
+class PlayerRatingNodeTests(IsolatedCacheTestCase):
+    """Tests for player rating nodes."""
+
+    def test_str_per_algorithm(self):
+        """Nodes show the rating parameters of their own algorithm."""
+        player = Player.objects.create(name="a")
+        rating_period = RatingPeriod.objects.create(
+            start_datetime=timezone.now(), end_datetime=timezone.now()
+        )
+        node = PlayerRatingNode(
+            player=player,
+            rating_period=rating_period,
+            rating=1500,
+            rating_deviation=350,
+            inactivity=0,
+            is_active=True,
+        )
+
+        node.algorithm = "glicko"
+        self.assertNotIn("σ", str(node))
+
+        node.algorithm = "glicko2"
+        node.rating_volatility = 0.06
+        self.assertIn("σ=0.06", str(node))
+
+
+class LeaderboardPositionTests(IsolatedCacheTestCase):
+    """Tests for players' leaderboard positions."""
+
+    def test_tied_ratings(self):
+        """Players with the same rating are ordered by name."""
+        players = [
+            Player.objects.create(name=name) for name in ("b", "d", "a", "c")
+        ]
+        ratings_dict = dict(
+            get_base_ratings(), ranking_delta=None, is_active=True
+        )
+        new_ratings = {player.id: ratings_dict for player in players}
+
+        # Player c is ahead of everyone and player b is inactive
+        new_ratings[players[3].id] = dict(ratings_dict, rating=2000)
+        new_ratings[players[0].id] = dict(ratings_dict, is_active=False)
+
+        update_player_states(new_ratings)
+
+        self.assertEqual(
+            [
+                PlayerState.objects.get(player=player).leaderboard_position
+                for player in players
+            ],
+            [None, 3, 2, 1],
+        )
+
+
+class PlayerListQueryTests(IsolatedCacheTestCase):
+    """Tests for the number of queries listing players takes."""
+
+    def setUp(self):
+        """Create a thousand players."""
+        super().setUp()
+
+        Player.objects.bulk_create(
+            Player(name="player %04d" % idx) for idx in range(1000)
+        )
+        PlayerState.objects.bulk_create(
+            PlayerState(player=player) for player in Player.objects.all()
+        )
+
+    def test_constant_queries(self):
+        """A page of players takes the same queries whatever its size."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/players/?page_size=10")
+
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get("/players/?page_size=1000")
+
+        self.assertEqual(len(response.json()["results"]), 1000)
+
+
+class Glicko2BatchTests(SimpleTestCase):
+    """Tests for calculating Glicko-2 ratings for all players at once."""
+
+    def test_matches_single_player_calculation(self):
+        """Batch ratings match rating each player on their own."""
+        rs, RDs, sigmas = zip(*PLAYER_RATINGS)
+
+        new_ratings = glicko2.calculate_player_ratings(
+            rs, RDs, sigmas, *get_game_perspectives(GAMES)
+        )
+
+        for player, (r, RD, sigma) in enumerate(PLAYER_RATINGS):
+            expected_ratings = glicko2.calculate_player_rating(
+                r, RD, sigma, **get_opponent_ratings(player, rs, RDs, GAMES)
+            )
+
+            for values, expected_value in zip(new_ratings, expected_ratings):
+                self.assertAlmostEqual(values[player], expected_value)
+
+
+class GlickoBatchTests(SimpleTestCase):
+    """Tests for calculating Glicko ratings for all players at once."""
+
+    def test_matches_single_player_calculation(self):
+        """Batch ratings match rating each player on their own."""
+        rs, RDs, _ = zip(*PLAYER_RATINGS)
+
+        new_ratings = glicko.calculate_player_ratings(
+            rs, RDs, *get_game_perspectives(GAMES)
+        )
+
+        for player, (r, RD, _) in enumerate(PLAYER_RATINGS):
+            expected_ratings = glicko.calculate_player_rating(
+                r, RD, **get_opponent_ratings(player, rs, RDs, GAMES)
+            )
+
+            for values, expected_value in zip(new_ratings, expected_ratings):
+                self.assertAlmostEqual(values[player], expected_value)
+
+
+class RatingEngineTests(SimpleTestCase):
+    """Tests for the rating engines."""
+
+    def get_old_ratings(self, engine):
+        """Returns PLAYER_RATINGS as an engine's rating parameters."""
+        return [
+            dict(
+                rating=r,
+                rating_deviation=RD,
+                rating_volatility=sigma if engine.name == "glicko2" else None,
+            )
+            for r, RD, sigma in PLAYER_RATINGS
+        ]
+
+    def test_registry(self):
+        """Engines are registered and configured by algorithm."""
+        self.assertEqual(
+            set(rating_engines.RATING_ENGINES), {"glicko", "glicko2"}
+        )
+
+        engine = rating_engines.get_rating_engine(
+            "glicko2",
+            types.SimpleNamespace(
+                GLICKO2_BASE_RATING=1200,
+                GLICKO2_BASE_RD=300,
+                GLICKO2_BASE_VOLATILITY=0.05,
+                GLICKO2_SYSTEM_CONSTANT=0.5,
+            ),
+        )
+
+        self.assertIsInstance(engine, rating_engines.Glicko2Engine)
+        self.assertEqual(
+            engine.get_base_ratings(),
+            dict(rating=1200, rating_deviation=300, rating_volatility=0.05),
+        )
+        self.assertEqual(engine.tau, 0.5)
+
+        with self.assertRaises(KeyError):
+            rating_engines.get_rating_engine("elo")
+
+    def test_state_round_trip(self):
+        """Loading and serializing a state gives back the ratings."""
+        for algorithm in rating_engines.RATING_ENGINES:
+            with self.subTest(algorithm=algorithm):
+                engine = rating_engines.get_rating_engine(algorithm)
+                old_ratings = self.get_old_ratings(engine)
+
+                self.assertEqual(
+                    engine.serialize_state(engine.load_state(old_ratings)),
+                    old_ratings,
+                )
+
+    def test_update(self):
+        """Engines rate players like their algorithm's batch functions."""
+        rs, RDs, sigmas = zip(*PLAYER_RATINGS)
+        perspectives = get_game_perspectives(GAMES)
+        expected_ratings = dict(
+            glicko=glicko.calculate_player_ratings(rs, RDs, *perspectives)
+            + (None,),
+            glicko2=glicko2.calculate_player_ratings(
+                rs, RDs, sigmas, *perspectives
+            ),
+        )
+
+        for algorithm, (
+            new_rs,
+            new_RDs,
+            new_sigmas,
+        ) in expected_ratings.items():
+            with self.subTest(algorithm=algorithm):
+                engine = rating_engines.get_rating_engine(algorithm)
+                new_ratings = engine.serialize_state(
+                    engine.update(
+                        engine.load_state(self.get_old_ratings(engine)),
+                        *map(np.array, perspectives),
+                    )
+                )
+
+                for player, ratings in enumerate(new_ratings):
+                    self.assertAlmostEqual(ratings["rating"], new_rs[player])
+                    self.assertAlmostEqual(
+                        ratings["rating_deviation"], new_RDs[player]
+                    )
+
+                    if new_sigmas is None:
+                        self.assertIsNone(ratings["rating_volatility"])
+                    else:
+                        self.assertAlmostEqual(
+                            ratings["rating_volatility"], new_sigmas[player]
+                        )
+
+
+class StatsRebuildTests(IsolatedCacheTestCase):
+    """Tests for rebuilding all stats at once."""
+
+    def setUp(self):
+        """Create games, which are processed one at a time."""
+        super().setUp()
+
+        self.user = User.objects.create(username="user")
+        self.players = [
+            Player.objects.create(name=name) for name in ("a", "b", "c", "d")
+        ]
+        now = timezone.now()
+
+        for idx, (winner, loser, loser_score) in enumerate(
+            (
+                (0, 1, 3),
+                (1, 2, 7),
+                (0, 2, 0),
+                (3, 0, 5),
+                (2, 1, 6),
+                (1, 0, 2),
+                (3, 2, 4),
+                (0, 3, 7),
+                (2, 3, 1),
+            )
+        ):
+            Game.objects.create(
+                winner=self.players[winner],
+                loser=self.players[loser],
+                winner_score=8,
+                loser_score=loser_score,
+                datetime_played=now - timedelta(days=10 - idx),
+                submitted_by=self.user,
+            )
+
+    def get_stats(self):
+        """Returns all stats nodes and players' stats and Elo ratings."""
+        return (
+            list(
+                PlayerStatsNode.objects.order_by("id").values_list(
+                    "player", "game", "elo_rating", *PlayerState.STATS_FIELDS
+                )
+            ),
+            list(
+                MatchupStatsNode.objects.order_by("id").values_list(
+                    "player1", "player2", "game", *PlayerState.STATS_FIELDS
+                )
+            ),
+            list(
+                PlayerState.objects.order_by("player").values_list(
+                    "player", "elo_rating", *PlayerState.STATS_FIELDS
+                )
+            ),
+        )
+
+    def test_matches_processing_games(self):
+        """Rebuilt stats match the stats from processing each game."""
+        processed_stats = self.get_stats()
+
+        # Each game has a player stats node for each of its players
+        self.assertEqual(len(processed_stats[0]), 2 * Game.objects.count())
+
+        reprocess_all_stats(reset_id_counter=False)
+
+        self.assertEqual(self.get_stats(), processed_stats)
+
+    def test_matches_after_changing_games(self):
+        """Rebuilt stats match the stats repaired after changing games."""
+        games = list(Game.objects.order_by("datetime_played"))
+
+        # Edit, delete, and backdate games
+        games[2].winner, games[2].loser = games[2].loser, games[2].winner
+        games[2].save()
+        games[4].delete()
+        Game.objects.create(
+            winner=self.players[3],
+            loser=self.players[1],
+            winner_score=8,
+            loser_score=4,
+            datetime_played=games[0].datetime_played + timedelta(hours=1),
+            submitted_by=self.user,
+        )
+
+        # Repairing stats reuses nodes, so their IDs aren't in the order
+        # they'd be rebuilt in
+        repaired_stats = [sorted(values) for values in self.get_stats()]
+
+        reprocess_all_stats(reset_id_counter=False)
+
+        self.assertEqual(
+            [sorted(values) for values in self.get_stats()], repaired_stats
+        )
+
+    def test_game_stats_node_ids(self):
+        """A game's stats nodes are found with or without prefetching."""
+        game = Game.objects.order_by("datetime_played")[3]
+        player_node = PlayerStatsNode.objects.get(
+            game=game, player=game.winner_id
+        )
+        matchup_node = MatchupStatsNode.objects.get(
+            game=game, player1=game.loser_id, player2=game.winner_id
+        )
+
+        with self.assertNumQueries(2):
+            self.assertEqual(game.winner_player_stats_node, player_node.id)
+            self.assertEqual(game.loser_matchup_stats_node, matchup_node.id)
+
+        game = Game.objects.prefetch_related(
+            "playerstatsnode_set", "matchupstatsnode_set"
+        ).get(id=game.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(game.winner_player_stats_node, player_node.id)
+            self.assertEqual(game.loser_matchup_stats_node, matchup_node.id)
+
+
+class RecomputeRatingsTests(IsolatedCacheTestCase):
+    """Tests for recomputing rating periods from a rating period on."""
+
+    def setUp(self):
+        """Rate games over several rating periods."""
+        super().setUp()
+
+        user = User.objects.create(username="user")
+        players = [
+            Player.objects.create(name=name) for name in ("a", "b", "c", "d")
+        ]
+        now = timezone.now()
+
+        for idx, (winner, loser) in enumerate(
+            ((0, 1), (2, 3), (1, 2), (3, 0), (0, 2), (1, 3), (2, 0), (3, 1))
+        ):
+            Game.objects.create(
+                winner=players[winner],
+                loser=players[loser],
+                winner_score=8,
+                loser_score=5,
+                datetime_played=now - timedelta(days=40 - 5 * idx),
+                submitted_by=user,
+            )
+
+        process_new_ratings()
+
+    def get_ratings(self):
+        """Returns all rating nodes and players' current ratings."""
+        return (
+            sorted(
+                PlayerRatingNode.objects.values_list(
+                    "player",
+                    "rating_period__start_datetime",
+                    "algorithm",
+                    "ranking",
+                    "ranking_delta",
+                    "rating",
+                    "rating_deviation",
+                    "rating_volatility",
+                    "inactivity",
+                    "is_active",
+                )
+            ),
+            list(
+                PlayerState.objects.order_by("player").values_list(
+                    "player",
+                    "leaderboard_position",
+                    *PlayerState.RATING_FIELDS,
+                    *PlayerState.PROVISIONAL_RATING_FIELDS,
+                )
+            ),
+        )
+
+    def test_matches_reprocessing_all_ratings(self):
+        """Recomputed ratings match reprocessing all ratings."""
+        # Reverse the result of a game without triggering any updates
+        game = Game.objects.order_by("datetime_played")[2]
+        Game.objects.filter(pk=game.pk).update(
+            winner=game.loser, loser=game.winner
+        )
+
+        call_command(
+            "recompute_ratings",
+            from_period=game.rating_period_id,
+            stdout=io.StringIO(),
+        )
+        recomputed_ratings = self.get_ratings()
+
+        reprocess_all_ratings(reset_id_counter=False)
+
+        self.assertEqual(self.get_ratings(), recomputed_ratings)
+
+
+class ProvisionalRatingsTests(IsolatedCacheTestCase):
+    """Tests for players' provisional ratings."""
+
+    def setUp(self):
+        """Rate a rating period of games."""
+        super().setUp()
+
+        self.user = User.objects.create(username="user")
+        self.players = [
+            Player.objects.create(name=name) for name in ("a", "b", "c", "d")
+        ]
+        now = timezone.now()
+
+        for winner, loser in ((0, 1), (2, 3), (1, 2), (3, 0)):
+            self.create_game(winner, loser, now - timedelta(days=10))
+
+        process_new_ratings()
+
+    def create_game(self, winner, loser, datetime_played):
+        """Create a game between two players."""
+        return Game.objects.create(
+            winner=self.players[winner],
+            loser=self.players[loser],
+            winner_score=8,
+            loser_score=5,
+            datetime_played=datetime_played,
+            submitted_by=self.user,
+        )
+
+    def get_provisional_ratings(self):
+        """Returns every player's provisional ratings."""
+        return list(
+            PlayerState.objects.order_by("player").values_list(
+                "player", *PlayerState.PROVISIONAL_RATING_FIELDS
+            )
+        )
+
+    def test_matches_updating_everyone(self):
+        """Updating a game's players matches updating every player."""
+        now = timezone.now()
+
+        # Each game only updates its own players
+        game = self.create_game(0, 2, now - timedelta(hours=3))
+        self.create_game(1, 0, now - timedelta(hours=2))
+        self.create_game(2, 3, now - timedelta(hours=1))
+        game.delete()
+
+        provisional_ratings = self.get_provisional_ratings()
+        update_provisional_ratings()
+
+        self.assertEqual(self.get_provisional_ratings(), provisional_ratings)
+
+        # Players who've played in the open rating period have moved
+        # away from their ratings
+        for state in PlayerState.objects.all():
+            self.assertNotEqual(state.provisional_rating, state.rating)
+
+
+class RateGamesTests(SimpleTestCase):
+    """Tests for the rate_games command line interface."""
+
+    # Games played over a couple of rating periods
+    GAMES = (
+        ("2019-05-01T12:00:00Z", "a", "b"),
+        ("2019-05-03T12:00:00Z", "b", "c"),
+        ("2019-05-09T12:00:00Z", "c", "a"),
+        ("2019-05-12T12:00:00Z", "a", "b"),
+    )
+
+    def setUp(self):
+        """Write the games as CSV and NDJSON files."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.csv_path = os.path.join(directory.name, "games.csv")
+        self.ndjson_path = os.path.join(directory.name, "games.ndjson")
+
+        with open(self.csv_path, "w") as file:
+            file.write("datetime_played,winner,loser\n")
+            file.writelines("%s,%s,%s\n" % game for game in self.GAMES)
+
+        with open(self.ndjson_path, "w") as file:
+            file.writelines(
+                json.dumps(
+                    dict(
+                        datetime_played=datetime_played,
+                        winner=winner,
+                        loser=loser,
+                    )
+                )
+                + "\n"
+                for datetime_played, winner, loser in self.GAMES
+            )
+
+    def rate_games(self, *args):
+        """Run the command line interface and return its output rows.
+
+        It's run in its own process without any Django settings, since
+        it shouldn't need them.
+        """
+        env = dict(os.environ)
+        env.pop("DJANGO_SETTINGS_MODULE", None)
+
+        output = subprocess.run(
+            [sys.executable, "-m", "api.rate_games", *args],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=env,
+            stdout=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        ).stdout
+
+        return list(csv.DictReader(io.StringIO(output)))
+
+    def test_formats(self):
+        """CSV and NDJSON game logs are rated the same."""
+        rows = self.rate_games(self.csv_path)
+
+        self.assertEqual({row["player"] for row in rows}, {"a", "b", "c"})
+        self.assertEqual(self.rate_games(self.ndjson_path), rows)
+
+    def test_until_date(self):
+        """A date for --until means midnight UTC at its start."""
+        rows = self.rate_games(self.csv_path, "--until", "2019-05-16")
+
+        self.assertEqual(
+            self.rate_games(
+                self.csv_path, "--until", "2019-05-16T00:00:00+00:00"
+            ),
+            rows,
+        )
+        self.assertEqual(len({row["period_end"] for row in rows}), 2)
+
+        # The second rating period ends during the day before
+        rows = self.rate_games(self.csv_path, "--until", "2019-05-15")
+
+        self.assertEqual(len({row["period_end"] for row in rows}), 1)
+
+
+class TuningTests(SimpleTestCase):
+    """Tests for scoring rating settings."""
+
+    def setUp(self):
+        """Make up a game history over a few rating periods."""
+        self.now = timezone.now()
+        self.player_ids = [1, 2, 3, 4]
+        self.settings = {
+            setting: getattr(settings, setting)
+            for setting in tuning.RATING_SETTINGS
+        }
+
+        # Lower player IDs usually win
+        self.games = []
+
+        for day in range(40):
+            player1, player2 = day % 4 + 1, (day + 1 + day // 4) % 4 + 1
+
+            if player1 == player2:
+                continue
+
+            winner, loser = sorted((player1, player2))
+
+            if day % 7 == 0:
+                winner, loser = loser, winner
+
+            self.games.append(
+                (self.now - timedelta(days=40 - day), winner, loser)
+            )
+
+    def test_score_games(self):
+        """Games are scored from the ratings of their players."""
+        base_ratings = rating_engines.get_base_ratings(
+            rating_engines.get_rating_engine("glicko2")
+        )
+        ratings = {
+            1: dict(ranking=1, rating=1600, rating_deviation=50),
+            2: dict(ranking=2, rating=1400, rating_deviation=50),
+        }
+        games = [
+            (self.now, 1, 2),
+            (self.now, 2, 1),
+            (self.now, 3, 1),
+        ]
+
+        scores = tuning.score_games(games, ratings, base_ratings)
+
+        probability = glicko.win_probability(1600, 50, 1400, 50)
+        unrated_probability = glicko.win_probability(
+            base_ratings["rating"], base_ratings["rating_deviation"], 1600, 50
+        )
+
+        self.assertGreater(probability, 0.5)
+        self.assertAlmostEqual(
+            scores["log_likelihood"],
+            np.log(probability)
+            + np.log(1 - probability)
+            + np.log(unrated_probability),
+        )
+        self.assertAlmostEqual(
+            scores["brier_score"],
+            (1 - probability) ** 2
+            + probability ** 2
+            + (1 - unrated_probability) ** 2,
+        )
+
+        # The game with an unranked player doesn't count for ranking
+        self.assertEqual(scores["ranked_games"], 2)
+        self.assertEqual(scores["correctly_ranked_games"], 1)
+
+    def test_score_parameters(self):
+        """Games are predicted without the ratings they produce."""
+        # Games in the first rating period are predicted from base
+        # ratings, which make every game a coin flip
+        first_games = [
+            game
+            for game in self.games
+            if game[0] < self.games[0][0] + timedelta(days=1)
+        ]
+        scores = tuning.score_parameters(
+            games=first_games,
+            player_ids=self.player_ids,
+            algorithm="glicko2",
+            settings=self.settings,
+            score_from=first_games[0][0],
+            now=self.now,
+        )
+
+        self.assertEqual(scores["games"], len(first_games))
+        self.assertAlmostEqual(scores["log_likelihood"], np.log(0.5))
+        self.assertAlmostEqual(scores["brier_score"], 0.25)
+        self.assertTrue(np.isnan(scores["ranking_accuracy"]))
+
+        # Only games from score_from on are scored
+        score_from = self.now - timedelta(days=20)
+        scores = tuning.score_parameters(
+            games=self.games,
+            player_ids=self.player_ids,
+            algorithm="glicko2",
+            settings=self.settings,
+            score_from=score_from,
+            now=self.now,
+        )
+
+        self.assertEqual(
+            scores["games"],
+            sum(1 for game in self.games if game[0] >= score_from),
+        )
+
+        # By then, players are ranked and the ratings have learnt that
+        # lower player IDs usually win
+        self.assertGreater(scores["log_likelihood"], np.log(0.5))
+        self.assertGreater(scores["ranking_accuracy"], 0.5)
+
+    def test_tune_parameters(self):
+        """A grid is scored the same in parallel, best first."""
+        parameter_grid = tuning.get_parameter_grid(
+            dict(GLICKO2_SYSTEM_CONSTANT=[0.3, 1.2], GLICKO2_BASE_RD=[350])
+        )
+
+        self.assertEqual(
+            parameter_grid,
+            [
+                dict(GLICKO2_SYSTEM_CONSTANT=0.3, GLICKO2_BASE_RD=350),
+                dict(GLICKO2_SYSTEM_CONSTANT=1.2, GLICKO2_BASE_RD=350),
+            ],
+        )
+
+        score_from = self.now - timedelta(days=20)
+        results = tuning.tune_parameters(
+            games=self.games,
+            player_ids=self.player_ids,
+            algorithm="glicko2",
+            settings=self.settings,
+            parameter_grid=parameter_grid,
+            score_from=score_from,
+            now=self.now,
+            workers=2,
+        )
+        expected_results = [
+            (
+                parameters,
+                tuning.score_parameters(
+                    games=self.games,
+                    player_ids=self.player_ids,
+                    algorithm="glicko2",
+                    settings=dict(self.settings, **parameters),
+                    score_from=score_from,
+                    now=self.now,
+                ),
+            )
+            for parameters in parameter_grid
+        ]
+        expected_results.sort(
+            key=lambda result: result[1]["log_likelihood"], reverse=True
+        )
+
+        self.assertEqual(results, expected_results)
+
+
+class CachedResponseTests(IsolatedCacheTestCase):
+    """Tests for cached API responses."""
+
+    def test_change_within_a_second(self):
+        """A change in the same second as a client's last fetch is served."""
+        Player.objects.create(name="a")
+        cache.bump_data_version()
+
+        # The client last fetched players just now, to the second
+        response = self.client.get(
+            "/players/", HTTP_IF_MODIFIED_SINCE=http_date()
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_not_modified(self):
+        """Polling for unchanged data gets a 304 response."""
+        response = self.client.get("/players/")
+
+        response = self.client.get(
+            "/players/", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES=TEST_CACHES)
+@skipUnlessDBFeature("can_return_ids_from_bulk_insert")
+class BulkGameTests(TransactionTestCase):
+    """Tests for submitting games in bulk.
+
+    Cached responses are invalidated once the games are committed, so
+    these tests need real transactions. Processing the games needs
+    their IDs, so they need a database which returns the IDs of rows
+    inserted in bulk, like PostgreSQL.
+    """
+
+    def setUp(self):
+        """Clear the cache and create some players."""
+        django_cache.clear()
+
+        self.user = User.objects.create(username="user")
+        self.players = [
+            Player.objects.create(name=name) for name in ("a", "b", "c")
+        ]
+
+    def test_bulk_submission(self):
+        """Bulk games are processed like games submitted one at a time."""
+        a, b, c = self.players
+        now = timezone.now()
+        games = [
+            (a, b, 3, now - timedelta(hours=3)),
+            (b, c, 6, now - timedelta(hours=2)),
+            (a, c, 0, now - timedelta(hours=1)),
+        ]
+
+        # Play the games one at a time for comparison
+        for winner, loser, loser_score, datetime_played in games:
+            Game.objects.create(
+                winner=winner,
+                loser=loser,
+                winner_score=8,
+                loser_score=loser_score,
+                datetime_played=datetime_played,
+                submitted_by=self.user,
+            )
+
+        expected_states = list(PlayerState.objects.order_by("player").values())
+        expected_nodes = list(
+            PlayerStatsNode.objects.order_by("id").values_list(
+                "player", "elo_rating", *PlayerState.STATS_FIELDS
+            )
+        )
+
+        Game.objects.all().delete()
+        etag = self.client.get("/games/")["ETag"]
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/games/bulk/",
+            [
+                dict(
+                    winner=winner.id,
+                    loser=loser.id,
+                    winner_score=8,
+                    loser_score=loser_score,
+                    datetime_played=datetime_played.isoformat(),
+                    submitted_by=self.user.username,
+                )
+                for winner, loser, loser_score, datetime_played in games
+            ],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Game.objects.count(), len(games))
+        self.assertEqual(
+            list(PlayerState.objects.order_by("player").values()),
+            expected_states,
+        )
+        self.assertEqual(
+            list(
+                PlayerStatsNode.objects.order_by("id").values_list(
+                    "player", "elo_rating", *PlayerState.STATS_FIELDS
+                )
+            ),
+            expected_nodes,
+        )
+
+        # The cached list of games is stale
+        response = self.client.get("/games/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), len(games))
+
+
+class ImportGamesTests(IsolatedCacheTestCase):
+    """Tests for the import_games command."""
+
+    def setUp(self):
+        """Create a user and a player."""
+        super().setUp()
+
+        User.objects.create(username="user")
+        Player.objects.create(name="a")
+
+    def import_games(self, rows):
+        """Import games from CSV rows."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write(
+                "winner,loser,winner_score,loser_score,datetime_played\n"
+            )
+            file.writelines("%s,%s,%s,%s,%s\n" % row for row in rows)
+            file.flush()
+
+            call_command(
+                "import_games",
+                file.name,
+                submitted_by="user",
+                stdout=io.StringIO(),
+            )
+
+    def test_import(self):
+        """Imported games are created along with any new players."""
+        self.import_games(
+            [
+                ("a", "b", 8, 3, "2019-05-01T12:00:00Z"),
+                ("b", "c", 8, 6, "2019-05-02T12:00:00Z"),
+                ("a", "c", 8, 0, "2019-05-03T12:00:00Z"),
+            ]
+        )
+
+        self.assertEqual(Game.objects.count(), 3)
+        self.assertEqual(
+            list(
+                PlayerState.objects.order_by("player__name").values_list(
+                    "player__name", "games", "wins", "losses"
+                )
+            ),
+            [("a", 2, 2, 0), ("b", 2, 1, 1), ("c", 2, 0, 2)],
+        )
+        self.assertFalse(
+            PlayerState.objects.filter(elo_rating__isnull=True).exists()
+        )
+
+    def test_invalid_game(self):
+        """An invalid game leaves nothing behind."""
+        with self.assertRaisesMessage(CommandError, "Game 2"):
+            self.import_games(
+                [
+                    ("a", "b", 8, 3, "2019-05-01T12:00:00Z"),
+                    ("b", "c", 5, 6, "2019-05-02T12:00:00Z"),
+                ]
+            )
+
+        self.assertFalse(Game.objects.exists())
+        self.assertEqual(
+            list(Player.objects.values_list("name", flat=True)), ["a"]
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DataVersionTests(TransactionTestCase):
+    """Tests for bumping the data version when data changes.
+
+    The data version is bumped once changes are committed, so these
+    tests need real transactions.
+    """
+
+    def setUp(self):
+        """Clear the cache and create a user."""
+        django_cache.clear()
+
+        self.user = User.objects.create(username="user")
+
+    def test_user_change(self):
+        """Changing a user invalidates cached responses."""
+        data_version = cache.get_data_version()
+
+        self.user.is_staff = True
+        self.user.save()
+
+        self.assertNotEqual(cache.get_data_version(), data_version)
+
+    def test_login(self):
+        """Logging in doesn't invalidate cached responses."""
+        data_version = cache.get_data_version()
+
+        update_last_login(None, self.user)
+
+        self.assertEqual(cache.get_data_version(), data_version)
+
+
+class PredictionsTests(IsolatedCacheTestCase):
+    """Tests for predicting games."""
+
+    def setUp(self):
+        """Rate some games."""
+        super().setUp()
+
+        user = User.objects.create(username="user")
+        a, b, c = [
+            Player.objects.create(name=name) for name in ("a", "b", "c")
+        ]
+        now = timezone.now()
+
+        for winner, loser, days_ago in ((a, b, 30), (b, c, 20), (a, c, 10)):
+            Game.objects.create(
+                winner=winner,
+                loser=loser,
+                winner_score=8,
+                loser_score=5,
+                datetime_played=now - timedelta(days=days_ago),
+                submitted_by=user,
+            )
+
+        process_new_ratings()
+
+        self.rating_period = RatingPeriod.objects.first()
+
+    def test_predictions_kept_in_memory(self):
+        """Predictions are only loaded again once they change."""
+        rating_period_predictions = predictions.get_predictions(
+            self.rating_period
+        )
+
+        # Only the predictions' version is read from the cache
+        predictions.cache.delete(
+            predictions.get_predictions_key(self.rating_period.id)
+        )
+        self.assertIs(
+            predictions.get_predictions(self.rating_period),
+            rating_period_predictions,
+        )
+
+        # Another process changing the predictions invalidates them
+        predictions.delete_predictions(self.rating_period.id)
+        self.assertIsNot(
+            predictions.get_predictions(self.rating_period),
+            rating_period_predictions,
+        )
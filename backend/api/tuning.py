@@ -0,0 +1,282 @@
+"""Contains functions for tuning rating settings.
+
+Parameter sets are scored by how well the ratings they produce predict
+games: each game is predicted from the ratings of the latest rating
+period which ended before it, so ratings are always judged on games
+they haven't seen. Everything is replayed in memory, so tuning never
+touches stored ratings.
+
+Like rating_engines, nothing here depends on Django.
+"""
+
+import itertools
+import math
+import multiprocessing
+import types
+import numpy as np
+from . import glicko
+from . import rating_engines
+
+# The names of the settings that affect ratings
+RATING_SETTINGS = (
+    "GLICKO_BASE_RATING",
+    "GLICKO_BASE_RD",
+    "GLICKO2_BASE_RATING",
+    "GLICKO2_BASE_RD",
+    "GLICKO2_BASE_VOLATILITY",
+    "GLICKO2_SYSTEM_CONSTANT",
+    "GLICKO2_RATING_PERIOD_DAYS",
+    "NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE",
+)
+
+# Predictions are clipped to this distance from 0 and 1 so a confident
+# wrong prediction doesn't make the log-likelihood infinite
+EPSILON = 1e-12
+
+# The game history shared with worker processes
+_games = None
+_player_ids = None
+
+
+def get_parameter_grid(parameter_values):
+    """Returns every combination of values of settings.
+
+    Args:
+        parameter_values: A dictionary containing setting names as keys
+            and lists of values to try for each setting as values.
+
+    Returns:
+        A list of dictionaries containing setting names as keys and
+        setting values as values.
+    """
+    names = list(parameter_values)
+
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*parameter_values.values())
+    ]
+
+
+def score_games(games, ratings, base_ratings):
+    """Score predictions of games from players' ratings.
+
+    Args:
+        games: A list of three-tuples containing the datetime played
+            and the winner's and loser's player IDs of each game.
+        ratings: A dictionary containing player IDs as keys and
+            dictionaries of each player's rating parameters as values,
+            as returned by rating_engines.calculate_new_ratings.
+        base_ratings: A dictionary of the rating parameters of players
+            absent from ratings.
+
+    Returns:
+        A dictionary containing the sums of the log-likelihood and the
+        Brier score of the games, the number of games between ranked
+        players and how many of them the better ranked player won
+        (ties counting as half a win).
+    """
+    winner_ratings = [
+        ratings.get(winner, base_ratings) for _, winner, _ in games
+    ]
+    loser_ratings = [ratings.get(loser, base_ratings) for _, _, loser in games]
+
+    probabilities = glicko.win_probability(
+        r=np.array([rating["rating"] for rating in winner_ratings]),
+        RD=np.array([rating["rating_deviation"] for rating in winner_ratings]),
+        r_j=np.array([rating["rating"] for rating in loser_ratings]),
+        RD_j=np.array(
+            [rating["rating_deviation"] for rating in loser_ratings]
+        ),
+    )
+    probabilities = np.clip(probabilities, EPSILON, 1 - EPSILON)
+
+    ranked_games = 0
+    correctly_ranked_games = 0
+
+    for winner_rating, loser_rating in zip(winner_ratings, loser_ratings):
+        if winner_rating["ranking"] is None or loser_rating["ranking"] is None:
+            continue
+
+        ranked_games += 1
+
+        if winner_rating["ranking"] < loser_rating["ranking"]:
+            correctly_ranked_games += 1
+        elif winner_rating["ranking"] == loser_rating["ranking"]:
+            correctly_ranked_games += 0.5
+
+    return dict(
+        log_likelihood=float(np.log(probabilities).sum()),
+        brier_score=float(np.square(1 - probabilities).sum()),
+        ranked_games=ranked_games,
+        correctly_ranked_games=correctly_ranked_games,
+    )
+
+
+def score_parameters(games, player_ids, algorithm, settings, score_from, now):
+    """Score the ratings produced by a set of rating settings.
+
+    Args:
+        games: A list of three-tuples containing the datetime played
+            and the winner's and loser's player IDs of each game,
+            sorted by when they were played.
+        player_ids: A list of the IDs of all players.
+        algorithm: The name of the rating algorithm to rate players
+            with.
+        settings: A dictionary containing the names of all settings in
+            RATING_SETTINGS as keys and their values as values.
+        score_from: Only games played at or after this datetime are
+            scored. This should be the same for every parameter set
+            being compared, so that they're scored on the same games.
+        now: The current datetime. Games after the last rating period
+            which has ended by this datetime are predicted from that
+            rating period's ratings.
+
+    Returns:
+        A dictionary containing the number of games scored, the mean
+        log-likelihood and Brier score of the predictions, and the
+        fraction of games between ranked players which the better
+        ranked player won.
+    """
+    engine = rating_engines.get_rating_engine(
+        algorithm, types.SimpleNamespace(**settings)
+    )
+    base_ratings = rating_engines.get_base_ratings(engine)
+
+    rating_periods = rating_engines.replay_games(
+        games=games,
+        player_ids=player_ids,
+        engines=[engine],
+        now=now,
+        rating_period_days=settings["GLICKO2_RATING_PERIOD_DAYS"],
+        periods_missed_to_be_inactive=settings[
+            "NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE"
+        ],
+    )
+
+    totals = dict(
+        log_likelihood=0,
+        brier_score=0,
+        ranked_games=0,
+        correctly_ranked_games=0,
+    )
+    previous_ratings = {}
+    idx = 0
+
+    def add_scores(end_idx):
+        scored_games = [
+            game for game in games[idx:end_idx] if game[0] >= score_from
+        ]
+
+        if not scored_games:
+            return
+
+        for key, value in score_games(
+            scored_games, previous_ratings, base_ratings
+        ).items():
+            totals[key] += value
+
+    # Predict each rating period's games from the ratings of the rating
+    # period before it
+    for _, end_datetime, new_ratings in rating_periods:
+        end_idx = idx
+
+        while end_idx < len(games) and games[end_idx][0] <= end_datetime:
+            end_idx += 1
+
+        add_scores(end_idx)
+
+        idx = end_idx
+        previous_ratings = new_ratings[engine.name]
+
+    # Predict the games of the rating period in progress
+    add_scores(len(games))
+
+    num_games = sum(1 for game in games if game[0] >= score_from)
+
+    return dict(
+        games=num_games,
+        log_likelihood=totals["log_likelihood"] / max(num_games, 1),
+        brier_score=totals["brier_score"] / max(num_games, 1),
+        ranking_accuracy=(
+            totals["correctly_ranked_games"] / totals["ranked_games"]
+            if totals["ranked_games"]
+            else math.nan
+        ),
+    )
+
+
+def _init_worker(games, player_ids):
+    global _games, _player_ids
+
+    _games = games
+    _player_ids = player_ids
+
+
+def _score_parameters_in_worker(args):
+    parameters, algorithm, settings, score_from, now = args
+
+    return (
+        parameters,
+        score_parameters(
+            games=_games,
+            player_ids=_player_ids,
+            algorithm=algorithm,
+            settings=dict(settings, **parameters),
+            score_from=score_from,
+            now=now,
+        ),
+    )
+
+
+def tune_parameters(
+    games,
+    player_ids,
+    algorithm,
+    settings,
+    parameter_grid,
+    score_from,
+    now,
+    workers=None,
+):
+    """Score a grid of rating settings in parallel.
+
+    The game history is handed to each worker process once when it
+    starts, rather than with every parameter set.
+
+    Args:
+        games: A list of three-tuples containing the datetime played
+            and the winner's and loser's player IDs of each game,
+            sorted by when they were played.
+        player_ids: A list of the IDs of all players.
+        algorithm: The name of the rating algorithm to rate players
+            with.
+        settings: A dictionary containing the names of all settings in
+            RATING_SETTINGS as keys and their current values as values.
+        parameter_grid: A list of dictionaries of settings to override,
+            as returned by get_parameter_grid.
+        score_from: Only games played at or after this datetime are
+            scored. See score_parameters.
+        now: The current datetime. See score_parameters.
+        workers: An optional integer specifying how many processes to
+            use. Defaults to the number of CPUs.
+
+    Returns:
+        A list of two-tuples containing each parameter set and its
+        scores, as returned by score_parameters, from best to worst
+        log-likelihood.
+    """
+    with multiprocessing.get_context("fork").Pool(
+        workers, initializer=_init_worker, initargs=(games, player_ids)
+    ) as pool:
+        results = pool.map(
+            _score_parameters_in_worker,
+            [
+                (parameters, algorithm, settings, score_from, now)
+                for parameters in parameter_grid
+            ],
+            chunksize=1,
+        )
+
+    results.sort(key=lambda result: result[1]["log_likelihood"], reverse=True)
+
+    return results
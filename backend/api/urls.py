@@ -9,10 +9,12 @@ from .views import (
     current_user,
     ObtainAuthTokenView,
     GameViewSet,
+    LeaderboardView,
     MatchupStatsNodeViewSet,
     PlayerViewSet,
     PlayerRatingNodeViewSet,
     PlayerStatsNodeViewSet,
+    PredictionsView,
     RatingPeriodViewSet,
     UserViewSet,
 )
@@ -56,6 +58,8 @@ urlpatterns = [
     path(r"auth/", include("rest_framework.urls")),
     path(r"api-token-obtain/", ObtainAuthTokenView.as_view()),
     path(r"api-token-current-user/<str:token>/", current_user),
+    re_path(r"^leaderboard/?$", LeaderboardView.as_view()),
+    re_path(r"^predictions/?$", PredictionsView.as_view()),
     path(
         r"redoc/",
         schema_view.with_ui("redoc", cache_timeout=None),
@@ -1,41 +1,417 @@
 """Helper functions."""
 
+import collections
 from datetime import timedelta
+import itertools
+import multiprocessing
+import time
 from django.conf import settings
-from django.db import connection
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
 from django.utils import timezone
-from .models import Game, MatchupStatsNode, PlayerStatsNode, RatingPeriod
-from .ratings import calculate_new_rating_period
+from . import cache
+from . import elo
+from . import predictions
+from . import rating_engines
+from . import ratings
+from . import stats
+from .models import (
+    Game,
+    MatchupStatsNode,
+    Player,
+    PlayerState,
+    PlayerStatsNode,
+    RatingPeriod,
+    User,
+)
 
+# How many games to insert per query when importing games
+IMPORT_BATCH_SIZE = 1000
 
-def reprocess_all_stats(reset_id_counter=True):
-    """Wipes all existing stats nodes and creates new stats nodes.
+# Creates all player or matchup stats nodes straight from the games
+# table. Each game is taken from the perspective of both of its
+# players, and the stats are running totals over the player's (or the
+# matchup's) games in the order they were played. Rows are inserted
+# winner first for each game, which is the same order the nodes are
+# otherwise created in.
+STATS_NODES_SQL = """
+INSERT INTO %(node_table)s (
+    %(insert_columns)s,
+    game_id,
+    games,
+    wins,
+    losses,
+    win_rate,
+    average_goals_per_game,
+    average_goals_against_per_game
+)
+SELECT
+    %(select_columns)s,
+    game_id,
+    games,
+    wins,
+    games - wins,
+    CAST(wins AS DOUBLE PRECISION) / games,
+    CAST(goals AS DOUBLE PRECISION) / games,
+    CAST(goals_against AS DOUBLE PRECISION) / games
+FROM (
+    SELECT
+        perspectives.*,
+        COUNT(*) OVER running AS games,
+        SUM(won) OVER running AS wins,
+        SUM(player_score) OVER running AS goals,
+        SUM(opponent_score) OVER running AS goals_against
+    FROM (
+        SELECT
+            id AS game_id,
+            datetime_played,
+            winner_id AS player1_id,
+            loser_id AS player2_id,
+            1 AS won,
+            winner_score AS player_score,
+            loser_score AS opponent_score
+        FROM %(game_table)s
+        UNION ALL
+        SELECT
+            id,
+            datetime_played,
+            loser_id,
+            winner_id,
+            0,
+            loser_score,
+            winner_score
+        FROM %(game_table)s
+    ) AS perspectives
+    WINDOW running AS (
+        PARTITION BY %(partition_columns)s
+        ORDER BY datetime_played, game_id
+        ROWS UNBOUNDED PRECEDING
+    )
+) AS running_stats
+ORDER BY datetime_played, game_id, won DESC
+"""
+
+# Selects the stats-related fields of the games with at least one
+# player in a partition of players (see rebuild_stats_partition), in
+# the order they were played. Games are numbered by their position in
+# the order all games were played before the partition is filtered, so
+# positions are the same in every partition.
+PARTITION_GAMES_SQL = """
+SELECT position, id, winner_id, loser_id, winner_score, loser_score
+FROM (
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY datetime_played, id) - 1 AS position,
+        id,
+        winner_id,
+        loser_id,
+        winner_score,
+        loser_score
+    FROM %(game_table)s
+) AS numbered_games
+WHERE
+    winner_id %% %(num_partitions)d = %(partition)d
+    OR loser_id %% %(num_partitions)d = %(partition)d
+ORDER BY position
+"""
+
+# A game streamed by stream_partition_games_for_stats
+PartitionGame = collections.namedtuple(
+    "PartitionGame",
+    ("position", "id", "winner_id", "loser_id", "winner_score", "loser_score"),
+)
+
+
+def stream_games_for_stats():
+    """Stream every game's stats-related fields in the order played.
+
+    Returns:
+        An iterator of named tuples containing each game's ID, winner
+        ID, loser ID, winner score, and loser score.
+    """
+    return (
+        Game.objects.order_by("datetime_played", "id")
+        .values_list(
+            "id",
+            "winner_id",
+            "loser_id",
+            "winner_score",
+            "loser_score",
+            named=True,
+        )
+        .iterator()
+    )
+
+
+def stream_partition_games_for_stats(num_partitions, partition):
+    """Stream the stats-related fields of a partition's games.
+
+    Only games with at least one player in the partition are read from
+    the database. See rebuild_stats_partition.
 
     Args:
-        reset_id_counter: An optional boolean specifying whether to
-            reset to ID counter for stats nodes back to 1.
+        num_partitions: The number of partitions players are split
+            into.
+        partition: The index of the partition whose games to stream.
+
+    Returns:
+        An iterator of named tuples containing each game's position in
+        the order all games were played, ID, winner ID, loser ID,
+        winner score, and loser score, in the order played.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            PARTITION_GAMES_SQL
+            % dict(
+                game_table=Game._meta.db_table,
+                num_partitions=num_partitions,
+                partition=partition,
+            )
+        )
+
+        for row in cursor:
+            yield PartitionGame(*row)
+
+
+def rebuild_stats_partition(num_partitions, partition):
+    """Create the stats nodes for a partition of players.
+
+    Players are partitioned by their IDs modulo the number of
+    partitions. This creates the player stats nodes of the partition's
+    players and the matchup stats nodes taken from their perspective.
+    Since a player's stats depend only on their own games, partitions
+    can be rebuilt independently of one another.
+
+    Each node's ID is derived from its game's position in the order
+    games were played, so nodes get the same IDs they would get from
+    rebuilding all stats in a single pass with the ID counter reset.
+
+    Args:
+        num_partitions: The number of partitions players are split
+            into.
+        partition: The index of the partition to rebuild.
+
+    Returns:
+        A dictionary containing the IDs of the partition's players as
+        keys and dictionaries of each player's latest common stats as
+        values.
     """
-    # Wipe existing nodes
+    player_stats = {}
+    matchup_stats = {}
+
+    def generate_partition_nodes():
+        for game in stream_partition_games_for_stats(
+            num_partitions, partition
+        ):
+            for node in stats.generate_stats_nodes(
+                [game], player_stats, matchup_stats
+            ):
+                if isinstance(node, PlayerStatsNode):
+                    player_id = node.player_id
+                else:
+                    player_id = node.player1_id
+
+                if player_id % num_partitions != partition:
+                    continue
+
+                # Each game has one player stats node and one matchup
+                # stats node for each of its players, winner first
+                if player_id == game.winner_id:
+                    node.id = 2 * game.position + 1
+                else:
+                    node.id = 2 * game.position + 2
+
+                yield node
+
+    with transaction.atomic():
+        stats.bulk_create_stats_nodes(generate_partition_nodes())
+
+    return {
+        player_id: player_stats_dict
+        for player_id, player_stats_dict in player_stats.items()
+        if player_id % num_partitions == partition
+    }
+
+
+def delete_all_stats():
+    """Wipes all existing stats nodes and players' current stats."""
     PlayerStatsNode.objects.all().delete()
     MatchupStatsNode.objects.all().delete()
+    PlayerState.objects.update(**stats.get_empty_stats())
 
-    # Reset ID counter
-    if reset_id_counter:
+
+def reprocess_all_stats_in_parallel(workers):
+    """Wipes all existing stats nodes and creates new stats nodes.
+
+    This partitions players across a pool of processes which each
+    rebuild the stats nodes of their own players (see
+    rebuild_stats_partition). The ID counter for stats nodes is always
+    reset. Unlike reprocess_all_stats, this isn't done in a single
+    transaction, so if it's interrupted it should be run again.
+
+    Args:
+        workers: An integer specifying how many processes to use.
+    """
+    with transaction.atomic():
+        delete_all_stats()
+
+    # Forked processes mustn't share the parent's database connections,
+    # so close them and let each process open its own
+    connections.close_all()
+
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        partition_player_stats = pool.starmap(
+            rebuild_stats_partition,
+            [(workers, partition) for partition in range(workers)],
+        )
+
+    with transaction.atomic():
+        # Move the ID counters past the IDs assigned by the workers
         with connection.cursor() as cursor:
-            cursor.execute(
-                "ALTER SEQUENCE api_playerstatsnode_id_seq RESTART with 1"
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [PlayerStatsNode, MatchupStatsNode]
+            ):
+                cursor.execute(sql)
+
+        # Update players' current stats
+        for player_stats in partition_player_stats:
+            stats.update_player_states(player_stats)
+
+        # Elo ratings depend on every player's games, so they can't be
+        # rebuilt by partition
+        elo.replay_elo_ratings()
+
+
+def create_all_stats_nodes_with_sql():
+    """Create all stats nodes inside the database.
+
+    The stats are calculated with window functions in a couple of
+    INSERT ... SELECT statements, so no games or nodes pass through
+    Python. This needs PostgreSQL. Averages are calculated from running
+    sums rather than incrementally, so they can differ from the ones
+    calculated in Python by floating point rounding.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            STATS_NODES_SQL
+            % dict(
+                node_table=PlayerStatsNode._meta.db_table,
+                game_table=Game._meta.db_table,
+                insert_columns="player_id",
+                select_columns="player1_id",
+                partition_columns="player1_id",
             )
-            cursor.execute(
-                "ALTER SEQUENCE api_matchupstatsnode_id_seq RESTART with 1"
+        )
+        cursor.execute(
+            STATS_NODES_SQL
+            % dict(
+                node_table=MatchupStatsNode._meta.db_table,
+                game_table=Game._meta.db_table,
+                insert_columns="player1_id, player2_id",
+                select_columns="player1_id, player2_id",
+                partition_columns="player1_id, player2_id",
             )
+        )
 
-    # Recreate nodes
-    for game in Game.objects.order_by("datetime_played"):
-        game.process_game()
+    # Update players' current stats from their latest nodes
+    latest_node_ids = (
+        PlayerStatsNode.objects.order_by()
+        .values("player")
+        .annotate(latest_id=Max("id"))
+        .values("latest_id")
+    )
+    nodes = PlayerStatsNode.objects.filter(id__in=latest_node_ids).values(
+        "player", *PlayerState.STATS_FIELDS
+    )
+
+    stats.update_player_states({node.pop("player"): node for node in nodes})
+
+
+def reprocess_all_stats(reset_id_counter=True, workers=1, use_sql=False):
+    """Wipes all existing stats nodes and creates new stats nodes.
+
+    The new stats nodes are created in a single pass over all games:
+    each player's and each matchup's latest stats are kept in memory
+    while the games are streamed in the order they were played, and
+    the nodes are written with bulk inserts. Players' Elo ratings are
+    rebuilt in the same pass.
+
+    Args:
+        reset_id_counter: An optional boolean specifying whether to
+            reset to ID counter for stats nodes back to 1.
+        workers: An optional integer specifying how many processes to
+            rebuild stats with. With more than one, the rebuild is
+            done by reprocess_all_stats_in_parallel, which always
+            resets the ID counter.
+        use_sql: An optional boolean specifying whether to create the
+            stats nodes inside the database with
+            create_all_stats_nodes_with_sql. This is ignored unless the
+            database is PostgreSQL; workers is ignored if it's used.
+    """
+    use_sql = use_sql and connection.vendor == "postgresql"
+
+    if workers > 1 and not use_sql:
+        reprocess_all_stats_in_parallel(workers)
+    else:
+        with transaction.atomic():
+            delete_all_stats()
 
+            # Reset ID counter
+            if reset_id_counter:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "ALTER SEQUENCE api_playerstatsnode_id_seq RESTART"
+                        " with 1"
+                    )
+                    cursor.execute(
+                        "ALTER SEQUENCE api_matchupstatsnode_id_seq RESTART"
+                        " with 1"
+                    )
 
-def process_new_ratings():
-    """Calculates any new potential rating periods."""
+            # Recreate nodes and update players' current stats. Elo
+            # ratings depend on the order games were played in, so
+            # they're rebuilt along with stats.
+            if use_sql:
+                create_all_stats_nodes_with_sql()
+                elo.replay_elo_ratings()
+            else:
+                player_stats = {}
+                matchup_stats = {}
+                elo_ratings = {}
+
+                stats.create_stats_nodes(
+                    elo.track_elo_ratings(
+                        stream_games_for_stats(), elo_ratings
+                    ),
+                    player_stats,
+                    matchup_stats,
+                    elo_ratings,
+                )
+                stats.update_player_states(player_stats)
+                elo.save_elo_ratings(elo_ratings)
+
+    # Invalidate cached API responses
+    cache.bump_data_version()
+
+
+def process_new_ratings(periods_per_checkpoint=1, progress_callback=None):
+    """Calculates any new potential rating periods.
+
+    All rating periods that have elapsed are caught up on in a single
+    pass: the league's ratings are kept in memory from one rating
+    period to the next and the games are streamed once. Progress is
+    committed in checkpoints, so if this is interrupted, calling it
+    again resumes from the last committed rating period.
+
+    Args:
+        periods_per_checkpoint: An optional integer specifying how many
+            rating periods to commit per transaction.
+        progress_callback: An optional function to call after each
+            checkpoint. It's passed the number of rating periods
+            processed so far, the number of rating periods remaining,
+            and the number of seconds elapsed.
+    """
     # Find first datetime where there exists unrated games. Recall that
     # rating periods and games are ordered from newest to oldest.
     latest_rating_period = RatingPeriod.objects.first()
@@ -54,35 +430,83 @@ def process_new_ratings():
 
         start_datetime = earliest_game.datetime_played
 
-    # Find out whether there's been enough time elapsed to make a new
-    # rating period
-    end_datetime = start_datetime + timedelta(
-        days=settings.GLICKO2_RATING_PERIOD_DAYS
+    # Find out which rating periods have elapsed
+    rating_period_datetimes = rating_engines.get_rating_period_datetimes(
+        start_datetime, timezone.now(), settings.GLICKO2_RATING_PERIOD_DAYS
     )
 
-    # Not enough time elapsed: return.
-    if end_datetime > timezone.now():
+    # Not enough time elapsed: only provisional ratings can be out of
+    # date
+    if not rating_period_datetimes:
+        ratings.update_provisional_ratings()
         return
 
-    # Calculate the new rating period and call this function again
-    calculate_new_rating_period(start_datetime, end_datetime)
+    # Load the state of the league once. From here on out it's kept up
+    # to date in memory.
+    replayed_rating_periods = ratings.replay_rating_periods(
+        rating_period_datetimes,
+        ratings.load_ratings_for_algorithms(latest_rating_period),
+    )
+
+    num_rating_periods = len(rating_period_datetimes)
+    start_time = time.monotonic()
+
+    for checkpoint_start in range(
+        0, num_rating_periods, periods_per_checkpoint
+    ):
+        checkpoint_rating_periods = list(
+            itertools.islice(replayed_rating_periods, periods_per_checkpoint)
+        )
+
+        with transaction.atomic():
+            for (
+                start_datetime,
+                end_datetime,
+                new_ratings,
+            ) in checkpoint_rating_periods:
+                ratings.create_rating_period(
+                    start_datetime, end_datetime, new_ratings
+                )
+
+        if progress_callback is not None:
+            periods_done = checkpoint_start + len(checkpoint_rating_periods)
 
-    # Go again
-    process_new_ratings()
+            progress_callback(
+                periods_done,
+                num_rating_periods - periods_done,
+                time.monotonic() - start_time,
+            )
+
+    # Provisional ratings and predictions build on the latest rating
+    # period
+    ratings.update_provisional_ratings()
+    predictions.cache_latest_predictions()
 
 
-def reprocess_all_ratings(reset_id_counter=True):
+def reprocess_all_ratings(reset_id_counter=True, progress_callback=None):
     """Wipes existing rating periods and rating nodes and creates new ones.
 
     Args:
         reset_id_counter: An optional boolean specifying whether to
             reset to ID counter for stats nodes back to 1.
+        progress_callback: An optional function to report progress to.
+            See process_new_ratings.
     """
     # Wipe all existing rating periods and rating nodes. Note that
     # manually deleting player rating nodes isn't strictly necessary,
     # since they should all be deleted when their corresponding rating
-    # periods are deleted.
+    # periods are deleted. Players' current ratings are reset too.
     RatingPeriod.objects.all().delete()
+    PlayerState.objects.update(
+        ranking=None,
+        ranking_delta=None,
+        rating=None,
+        rating_deviation=None,
+        rating_volatility=None,
+        inactivity=0,
+        is_active=False,
+        leaderboard_position=None,
+    )
 
     # Reset ID counter
     if reset_id_counter:
@@ -95,4 +519,104 @@ def reprocess_all_ratings(reset_id_counter=True):
             )
 
     # Recalculate ratings
-    process_new_ratings()
+    process_new_ratings(progress_callback=progress_callback)
+
+    # Invalidate cached API responses
+    cache.bump_data_version()
+
+
+def import_games(games, batch_size=IMPORT_BATCH_SIZE, progress_callback=None):
+    """Create games in bulk from a record of past games.
+
+    Players who don't exist yet are created along the way. Games are
+    inserted in chunks with bulk inserts, which don't send the
+    post_save signal, so no stats are processed while loading; call
+    reprocess_all_stats once the games are in. Everything happens in a
+    single transaction, so an invalid game leaves nothing behind.
+
+    Args:
+        games: An iterable of dictionaries containing each game's
+            winner's name, loser's name, winner score, loser score,
+            datetime played, and the username of the user who
+            submitted it, keyed by "winner", "loser", "winner_score",
+            "loser_score", "datetime_played", and "submitted_by".
+        batch_size: An optional integer specifying how many games to
+            insert per query.
+        progress_callback: An optional function to call after each
+            chunk of games is inserted. It's passed the number of games
+            imported so far and the number of seconds elapsed.
+
+    Returns:
+        A two-tuple containing the number of games imported and the
+        earliest datetime played among them (or None if no games were
+        imported).
+
+    Raises:
+        ValidationError: A game is invalid or refers to a user that
+            doesn't exist.
+    """
+    num_games = 0
+    earliest_datetime_played = None
+    start_time = time.monotonic()
+
+    with transaction.atomic():
+        players = Player.objects.in_bulk(field_name="name")
+        users = User.objects.in_bulk(field_name="username")
+
+        chunk = []
+
+        for idx, game_dict in enumerate(games, 1):
+            for field in ("winner", "loser"):
+                name = game_dict[field]
+
+                if name not in players:
+                    players[name] = Player.objects.create(name=name)
+
+            try:
+                submitted_by = users[game_dict["submitted_by"]]
+            except KeyError:
+                raise ValidationError(
+                    "Game %d: user %s doesn't exist"
+                    % (idx, game_dict["submitted_by"])
+                )
+
+            game = Game(
+                winner=players[game_dict["winner"]],
+                loser=players[game_dict["loser"]],
+                winner_score=game_dict["winner_score"],
+                loser_score=game_dict["loser_score"],
+                datetime_played=game_dict["datetime_played"],
+                submitted_by=submitted_by,
+            )
+
+            try:
+                game.clean()
+            except ValidationError as e:
+                raise ValidationError("Game %d: %s" % (idx, e.messages[0]))
+
+            chunk.append(game)
+
+            if (
+                earliest_datetime_played is None
+                or game.datetime_played < earliest_datetime_played
+            ):
+                earliest_datetime_played = game.datetime_played
+
+            if len(chunk) >= batch_size:
+                Game.objects.bulk_create(chunk)
+                num_games += len(chunk)
+                chunk = []
+
+                if progress_callback is not None:
+                    progress_callback(num_games, time.monotonic() - start_time)
+
+        Game.objects.bulk_create(chunk)
+        num_games += len(chunk)
+
+        # Invalidate cached API responses once this is committed
+        transaction.on_commit(cache.bump_data_version)
+
+    if progress_callback is not None:
+        progress_callback(num_games, time.monotonic() - start_time)
+
+    return num_games, earliest_datetime_played
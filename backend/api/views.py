@@ -1,16 +1,37 @@
 """Contains view(sets) for the API."""
 
+from functools import partial
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from drf_yasg.openapi import Schema, TYPE_OBJECT, TYPE_STRING
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from drf_yasg.openapi import (
+    IN_QUERY,
+    Items,
+    Parameter,
+    Schema,
+    TYPE_ARRAY,
+    TYPE_INTEGER,
+    TYPE_NUMBER,
+    TYPE_OBJECT,
+    TYPE_STRING,
+)
 from drf_yasg.utils import swagger_auto_schema
+import numpy as np
 from rest_framework import viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.serializers import AuthTokenSerializer
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
+from .cache import (
+    CachedResponseMixin,
+    bump_data_version,
+    get_cached_response,
+)
+from .elo import update_elo_ratings
 from .filters import (
     GameFilter,
     MatchupStatsNodeFilter,
@@ -25,10 +46,18 @@ from .models import (
     MatchupStatsNode,
     Player,
     PlayerRatingNode,
+    PlayerState,
     PlayerStatsNode,
     RatingPeriod,
     User,
 )
+from .pagination import (
+    GameCursorPagination,
+    IdCursorPagination,
+    RatingPeriodCursorPagination,
+)
+from .predictions import get_predictions
+from .ratings import update_provisional_ratings
 from .serializers import (
     GameSerializer,
     MatchupStatsNodeSerializer,
@@ -38,6 +67,12 @@ from .serializers import (
     RatingPeriodSerializer,
     UserReadOnlySerializer,
 )
+from .stats import process_new_games
+
+
+# Default and maximum number of players to return from the leaderboard
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 1000
 
 
 @swagger_auto_schema(
@@ -83,7 +118,233 @@ class ObtainAuthTokenView(APIView):
         return Response({"token": token.key})
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class LeaderboardView(APIView):
+    """Return active players in order of their ranking.
+
+    This returns either a slice of the leaderboard starting from the
+    top, or, if a player is given, a window of the leaderboard centred
+    on that player. Either way it's read straight off the leaderboard
+    index built when rating periods are processed.
+    """
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            Parameter(
+                "limit",
+                IN_QUERY,
+                type=TYPE_INTEGER,
+                description="The number of players to return.",
+            ),
+            Parameter(
+                "offset",
+                IN_QUERY,
+                type=TYPE_INTEGER,
+                description="The number of players to skip from the top.",
+            ),
+            Parameter(
+                "player",
+                IN_QUERY,
+                type=TYPE_INTEGER,
+                description="The ID of a player to centre the leaderboard on. This overrides offset.",
+            ),
+        ],
+        responses={status.HTTP_200_OK: PlayerSerializer(many=True)},
+    )
+    def get(self, request):
+        return get_cached_response(
+            request, partial(self.get_leaderboard, request)
+        )
+
+    def get_leaderboard(self, request):
+        """Return the requested slice of the leaderboard."""
+        try:
+            limit = int(
+                request.query_params.get("limit", LEADERBOARD_DEFAULT_LIMIT)
+            )
+            offset = int(request.query_params.get("offset", 0))
+            player_id = request.query_params.get("player")
+
+            if player_id is not None:
+                player_id = int(player_id)
+        except ValueError:
+            return Response(
+                {"Bad request": "limit, offset, and player must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not 1 <= limit <= LEADERBOARD_MAX_LIMIT or offset < 0:
+            return Response(
+                {
+                    "Bad request": "limit must be between 1 and %d and offset must be non-negative"
+                    % LEADERBOARD_MAX_LIMIT
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Centre the window on the player if one was given
+        if player_id is not None:
+            position = (
+                PlayerState.objects.filter(player=player_id)
+                .values_list("leaderboard_position", flat=True)
+                .first()
+            )
+
+            if position is None:
+                return Response(
+                    {"Bad request": "Player is not on the leaderboard"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            offset = max(position - 1 - (limit - 1) // 2, 0)
+
+        players = (
+            Player.objects.select_related("state", "user")
+            .filter(
+                state__leaderboard_position__gt=offset,
+                state__leaderboard_position__lte=offset + limit,
+            )
+            .order_by("state__leaderboard_position")
+        )
+
+        return Response(
+            PlayerSerializer(
+                players, many=True, context={"request": request}
+            ).data
+        )
+
+
+class PredictionsView(APIView):
+    """Return the probabilities of players beating each other.
+
+    This returns either the probability of a player beating an
+    opponent, or a matrix of the probabilities of each of a set of
+    players beating each other, where the element in the ith row and
+    jth column is the probability of the ith player beating the jth
+    player. Either way they're read off the matrix of win probabilities
+    cached for the latest rating period, so only players rated in it
+    can be predicted.
+    """
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            Parameter(
+                "player",
+                IN_QUERY,
+                type=TYPE_INTEGER,
+                description="The ID of a player to predict a game against the opponent for.",
+            ),
+            Parameter(
+                "opponent",
+                IN_QUERY,
+                type=TYPE_INTEGER,
+                description="The ID of the player's opponent.",
+            ),
+            Parameter(
+                "players",
+                IN_QUERY,
+                type=TYPE_ARRAY,
+                items=Items(type=TYPE_INTEGER),
+                description="The IDs of players to predict games between. Defaults to all players rated in the latest rating period.",
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: Schema(
+                type=TYPE_OBJECT,
+                properties={
+                    "rating_period": Schema(type=TYPE_INTEGER),
+                    "player": Schema(type=TYPE_INTEGER),
+                    "opponent": Schema(type=TYPE_INTEGER),
+                    "probability": Schema(type=TYPE_NUMBER),
+                    "players": Schema(
+                        type=TYPE_ARRAY, items=Schema(type=TYPE_INTEGER)
+                    ),
+                    "probabilities": Schema(
+                        type=TYPE_ARRAY,
+                        items=Schema(
+                            type=TYPE_ARRAY, items=Schema(type=TYPE_NUMBER)
+                        ),
+                    ),
+                },
+            )
+        },
+    )
+    def get(self, request):
+        return get_cached_response(
+            request, partial(self.get_predictions, request)
+        )
+
+    def get_predictions(self, request):
+        """Return the requested predictions."""
+        try:
+            player_id = request.query_params.get("player")
+            opponent_id = request.query_params.get("opponent")
+            player_ids = request.query_params.get("players")
+
+            if player_id is not None or opponent_id is not None:
+                player_ids = [int(player_id), int(opponent_id)]
+            elif player_ids is not None:
+                player_ids = [int(value) for value in player_ids.split(",")]
+        except (TypeError, ValueError):
+            return Response(
+                {
+                    "Bad request": "player and opponent must both be integers and players must be comma-separated integers"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rating_period = RatingPeriod.objects.first()
+
+        if rating_period is None:
+            return Response(
+                {"Bad request": "No rating periods have been processed"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        predictions = get_predictions(rating_period)
+
+        if player_ids is None:
+            player_ids = predictions["player_ids"]
+
+        try:
+            player_idxs = [
+                predictions["player_idxs"][player_id]
+                for player_id in player_ids
+            ]
+        except KeyError as e:
+            return Response(
+                {
+                    "Bad request": "Player %d isn't rated in the latest rating period"
+                    % e.args[0]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        probabilities = predictions["probabilities"]
+
+        if player_id is not None:
+            return Response(
+                {
+                    "rating_period": rating_period.id,
+                    "player": player_ids[0],
+                    "opponent": player_ids[1],
+                    "probability": probabilities[
+                        player_idxs[0], player_idxs[1]
+                    ],
+                }
+            )
+
+        return Response(
+            {
+                "rating_period": rating_period.id,
+                "players": player_ids,
+                "probabilities": probabilities[
+                    np.ix_(player_idxs, player_idxs)
+                ].tolist(),
+            }
+        )
+
+
+class UserViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for users."""
 
     queryset = User.objects.all()
@@ -91,60 +352,85 @@ class UserViewSet(viewsets.ModelViewSet):
     http_method_names = ["get"]
     serializer_class = UserReadOnlySerializer
     filter_class = UserFilter
+    pagination_class = IdCursorPagination
 
 
-class RatingPeriodViewSet(viewsets.ModelViewSet):
+class RatingPeriodViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for rating periods."""
 
     queryset = RatingPeriod.objects.all()
     http_method_names = ["get"]
     serializer_class = RatingPeriodSerializer
     filter_class = RatingPeriodFilter
+    pagination_class = RatingPeriodCursorPagination
 
 
-class PlayerViewSet(viewsets.ModelViewSet):
+class PlayerViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for players."""
 
-    queryset = Player.objects.all()
+    queryset = Player.objects.with_current_values().select_related("user")
     http_method_names = ["get", "post", "patch"]
     serializer_class = PlayerSerializer
     filter_class = PlayerFilter
+    pagination_class = IdCursorPagination
 
 
-class PlayerStatsNodeViewSet(viewsets.ModelViewSet):
+class PlayerStatsNodeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for player stats nodes."""
 
     queryset = PlayerStatsNode.objects.all()
     http_method_names = ["get"]
     serializer_class = PlayerStatsNodeSerializer
     filter_class = PlayerStatsNodeFilter
+    pagination_class = IdCursorPagination
 
 
-class MatchupStatsNodeViewSet(viewsets.ModelViewSet):
+class MatchupStatsNodeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for matchup stats nodes."""
 
     queryset = MatchupStatsNode.objects.all()
     http_method_names = ["get"]
     serializer_class = MatchupStatsNodeSerializer
     filter_class = MatchupStatsNodeFilter
+    pagination_class = IdCursorPagination
 
 
-class PlayerRatingNodeViewSet(viewsets.ModelViewSet):
+class PlayerRatingNodeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for player rating nodes."""
 
     queryset = PlayerRatingNode.objects.all()
     http_method_names = ["get"]
     serializer_class = PlayerRatingNodeSerializer
     filter_class = PlayerRatingNodeFilter
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        """Only include nodes of the rating algorithm players are rated by.
 
+        Nodes of other rating algorithms are included when filtering by
+        algorithm.
+        """
+        queryset = super().get_queryset()
 
-class GameViewSet(viewsets.ModelViewSet):
+        if not any(
+            param.startswith("algorithm")
+            for param in self.request.query_params
+        ):
+            queryset = queryset.filter(algorithm=settings.RATING_ALGORITHM)
+
+        return queryset
+
+
+class GameViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """A viewset for games."""
 
-    queryset = Game.objects.all()
+    queryset = Game.objects.select_related(
+        "winner", "loser", "submitted_by", "rating_period"
+    ).prefetch_related("playerstatsnode_set", "matchupstatsnode_set")
     http_method_names = ["get", "post"]
     serializer_class = GameSerializer
     filter_class = GameFilter
+    pagination_class = GameCursorPagination
 
     def get_serializer(self, *args, **kwargs):
         """Inject the user into the serializer if logged in."""
@@ -159,3 +445,45 @@ class GameViewSet(viewsets.ModelViewSet):
             ].initial = self.request.user.username
 
         return serializer
+
+    @swagger_auto_schema(
+        request_body=GameSerializer(many=True),
+        responses={status.HTTP_201_CREATED: GameSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Submit a list of games at once.
+
+        The games should be in the order they were played. They're all
+        created in a single transaction and their stats are processed
+        in bulk, along with their players' provisional and Elo ratings,
+        so submitting a batch of games takes a constant number of
+        queries.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # Creating games in bulk doesn't send the post_save signal,
+            # so the games' stats are processed here instead
+            games = Game.objects.bulk_create(
+                Game(**attrs) for attrs in serializer.validated_data
+            )
+            process_new_games(games)
+            update_provisional_ratings(
+                {game.winner_id for game in games}
+                | {game.loser_id for game in games}
+            )
+            update_elo_ratings(games)
+
+            # Invalidate cached API responses once this is committed
+            transaction.on_commit(bump_data_version)
+
+        prefetch_related_objects(
+            games, "playerstatsnode_set", "matchupstatsnode_set"
+        )
+
+        return Response(
+            self.get_serializer(games, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
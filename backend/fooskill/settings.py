@@ -105,6 +105,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+#
+# Responses from the API's read-only endpoints are cached here. A
+# file-based cache is used so that every worker process and management
+# command shares the same cache.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "CACHE_LOCATION", os.path.join(BASE_DIR, "cache/")
+        ),
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -158,6 +177,8 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
     ),
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.IdCursorPagination",
+    "PAGE_SIZE": int(os.environ.get("API_PAGE_SIZE", 100)),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
@@ -200,6 +221,21 @@ RATING_ALGORITHM = os.environ["RATING_ALGORITHM"].lower()
 if RATING_ALGORITHM not in {"glicko", "glicko2"}:
     raise ValueError("RATING_ALGORITHM must be 'GLICKO' or 'GLICKO2'")
 
+# Rating algorithms to calculate ratings with in addition to the one
+# players are rated with. Each algorithm's ratings are stored
+# separately.
+RATING_ALGORITHMS = [RATING_ALGORITHM] + [
+    algorithm
+    for algorithm in os.environ.get("RATING_ALGORITHMS", "")
+    .lower()
+    .replace("'", "")
+    .split(",")
+    if algorithm and algorithm != RATING_ALGORITHM
+]
+
+if not set(RATING_ALGORITHMS) <= {"glicko", "glicko2"}:
+    raise ValueError("RATING_ALGORITHMS must be 'GLICKO' and/or 'GLICKO2'")
+
 GLICKO_BASE_RATING = float(os.environ["GLICKO_BASE_RATING"])
 GLICKO_BASE_RD = float(os.environ["GLICKO_BASE_RD"])
 GLICKO_RATING_PERIOD_DAYS = int(os.environ["GLICKO_RATING_PERIOD_DAYS"])
@@ -210,6 +246,9 @@ GLICKO2_BASE_VOLATILITY = float(os.environ["GLICKO2_BASE_VOLATILITY"])
 GLICKO2_SYSTEM_CONSTANT = float(os.environ["GLICKO2_SYSTEM_CONSTANT"])
 GLICKO2_RATING_PERIOD_DAYS = int(os.environ["GLICKO2_RATING_PERIOD_DAYS"])
 
+ELO_BASE_RATING = float(os.environ.get("ELO_BASE_RATING", 1500))
+ELO_K_FACTOR = float(os.environ.get("ELO_K_FACTOR", 32))
+
 # Other rating settings
 NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE = int(
     os.environ["NUMBER_OF_RATING_PERIODS_MISSED_TO_BE_INACTIVE"]
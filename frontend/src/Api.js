@@ -48,22 +48,17 @@ class Api {
       }
     );
 
-  // Get players
-  getPlayers = () =>
-    fetch(`${this.baseApiUrl}/players`)
+  // Get a page of players. Pass the next or previous link of a page
+  // already fetched to get the page next to it.
+  getPlayers = (pageUrl = `${this.baseApiUrl}/players`) =>
+    fetch(pageUrl)
       .then(response => response.json())
       .catch(error => error);
 
-  // Get the top N <= 10 active players
+  // Get the top N active players
   getTopNPlayers = (nMax = 10) =>
-    fetch(`${this.baseApiUrl}/players`)
+    fetch(`${this.baseApiUrl}/leaderboard?limit=${nMax}`)
       .then(response => response.json())
-      .then(players =>
-        players
-          .filter(p => p.is_active)
-          .sort((p1, p2) => p1.rating < p2.rating)
-          .slice(0, nMax)
-      )
       .catch(error => error);
 }
 
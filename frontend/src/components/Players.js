@@ -1,21 +1,47 @@
 import React, { useContext, useEffect, useState } from "react";
 
+import Button from "react-bootstrap/Button";
+
 import { ApiContext } from "./App";
 
-const updatePlayers = async (api, setPlayers) => {
-  const players = await api.getPlayers();
-  setPlayers(players);
+const updatePlayers = async (api, setPage, pageUrl) => {
+  const page = await api.getPlayers(pageUrl);
+  setPage(page);
 };
 
+// Show a page of players, with buttons to move between pages
 function Players() {
   const api = useContext(ApiContext);
-  const [players, setPlayers] = useState(null);
+  const [pageUrl, setPageUrl] = useState(undefined);
+  const [page, setPage] = useState(null);
 
+  // Only the page being shown is fetched
   useEffect(() => {
-    updatePlayers(api, setPlayers);
-  }, [api]);
+    updatePlayers(api, setPage, pageUrl);
+  }, [api, pageUrl]);
+
+  return (
+    <div>
+      {page && JSON.stringify(page.results)}
 
-  return <div>{players && JSON.stringify(players)}</div>;
+      <div>
+        <Button
+          variant="secondary"
+          disabled={!(page && page.previous)}
+          onClick={() => setPageUrl(page.previous)}
+        >
+          Previous
+        </Button>{" "}
+        <Button
+          variant="secondary"
+          disabled={!(page && page.next)}
+          onClick={() => setPageUrl(page.next)}
+        >
+          Next
+        </Button>
+      </div>
+    </div>
+  );
 }
 
 export default Players;